@@ -126,6 +126,15 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Cache (количество квартир по фильтрам). Для нескольких процессов
+# укажите общий backend (Redis/Memcached), чтобы версия каталога была одна.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'apartments',
+    }
+}
+
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
@@ -136,6 +145,15 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Уведомление бота о новых квартирах (пустой URL отключает push)
+BOT_NOTIFY_URL = os.getenv('BOT_NOTIFY_URL', '')
+BOT_NOTIFY_SECRET = os.getenv('NOTIFY_SECRET', '')
+BOT_NOTIFY_TIMEOUT = 2
+
+# Уменьшенные копии фото для Telegram готовятся в отдельных процессах
+# (0 — синхронно при сохранении, например для отладки)
+IMAGE_VARIANT_WORKERS = int(os.getenv('IMAGE_VARIANT_WORKERS', '2'))
+
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOWED_ORIGINS = [
@@ -46,9 +46,10 @@ class ApartmentImageInline(admin.TabularInline):
 
     def image_preview(self, obj):
         if obj.image:
+            # Превью легче оригинала; пока оно не готово, показываем оригинал
             return format_html(
                 '<img src="{}" width="100" height="100" style="object-fit: cover;" />',
-                obj.image.url
+                (obj.thumbnail or obj.image).url
             )
         return "Нет изображения"
     image_preview.short_description = 'Превью'
@@ -117,7 +118,7 @@ class ApartmentImageAdmin(admin.ModelAdmin):
 
     def image_preview(self, obj):
         if obj.image:
-            return format_html('<img src="{}" width="100" height="100" style="object-fit: cover;" />', obj.image.url)
+            return format_html('<img src="{}" width="100" height="100" style="object-fit: cover;" />', (obj.thumbnail or obj.image).url)
         return "Нет изображения"
     image_preview.short_description = 'Превью'
 
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class EstateConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'estate'
+    verbose_name = 'Недвижимость'
+
+    def ready(self):
+        from . import signals  # noqa: F401
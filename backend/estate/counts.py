@@ -0,0 +1,92 @@
+"""
+Кэш количества квартир по набору фильтров.
+
+Ключ — версия каталога и каноничная подпись фильтров. Версия хранится
+в БД и меняется при любой записи квартир в любом процессе, поэтому
+старые значения просто перестают читаться и вытесняются по TTL.
+"""
+import hashlib
+import json
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, Max
+
+from .models import Apartment, CatalogState
+
+CATALOG_STATE_ID = 1
+COUNT_CACHE_TTL = 300
+
+# Параметры, которые не влияют на набор найденных квартир
+NON_FILTER_PARAMS = frozenset({
+    'page', 'page_size', 'cursor', 'pagination', 'with_count', 'ordering', 'format',
+})
+
+
+class CatalogVersion(NamedTuple):
+    """Версия каталога: последний updated_at, число квартир и счётчик изменений"""
+    last_modified: Optional[datetime]
+    total: int
+    changes: int
+
+    def __str__(self) -> str:
+        last_modified = self.last_modified.isoformat() if self.last_modified else ''
+        return f'{last_modified}:{self.total}:{self.changes}'
+
+
+def get_catalog_version() -> CatalogVersion:
+    """
+    Текущая версия каталога квартир, общая для всех процессов
+
+    На SQLite читается строка CatalogState (одна выборка по первичному
+    ключу); триггеры меняют её в транзакции записи, поэтому счётчик
+    учитывает и update() без updated_at. На других СУБД версия —
+    MAX(updated_at) и COUNT(*) по всей таблице.
+    """
+    if connection.vendor == 'sqlite':
+        row = (
+            CatalogState.objects.filter(pk=CATALOG_STATE_ID)
+            .values_list('last_modified', 'apartments_count', 'changes')
+            .first()
+        )
+        if row is not None:
+            return CatalogVersion(*row)
+    totals = Apartment.objects.order_by().aggregate(last_modified=Max('updated_at'), total=Count('id'))
+    return CatalogVersion(totals['last_modified'], totals['total'], 0)
+
+
+def filter_signature(query_params) -> str:
+    """
+    Каноничная подпись фильтров запроса
+
+    Порядок параметров и значений не важен; параметры пагинации
+    и сортировки в подпись не входят.
+    """
+    items = sorted(
+        (key, sorted(query_params.getlist(key)))
+        for key in query_params.keys()
+        if key not in NON_FILTER_PARAMS
+    )
+    raw = json.dumps(items, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def cached_count(queryset, request) -> int:
+    """
+    Количество квартир в отфильтрованном queryset с кэшированием
+
+    Args:
+        queryset: Queryset после применения всех фильтров запроса
+        request: Запрос, по параметрам которого строится подпись
+
+    Returns:
+        Количество записей
+    """
+    key = f'apartments:count:{get_catalog_version()}:{filter_signature(request.query_params)}'
+    count = cache.get(key)
+    if count is None:
+        count = queryset.order_by().count()
+        cache.set(key, count, COUNT_CACHE_TTL)
+    return count
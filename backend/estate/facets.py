@@ -0,0 +1,71 @@
+"""
+Фасетные счётчики для клавиатур бота: сколько квартир даст каждый вариант
+"""
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .counts import filter_signature, get_catalog_version
+from .models import Apartment
+
+FACETS_CACHE_TTL = 30
+
+FACET_ROOMS = (1, 2, 3, 4, 5)
+
+# Диапазоны совпадают с кнопками бота (min:max, как в параметрах area_range/price_range)
+FACET_AREA_BUCKETS = ('0:40', '40:66', '67:85', '85:105', '105:130', '131:160', '161:200', '200:9999')
+FACET_PRICE_BUCKETS = ('0:70000', '70000:100000', '100000:150000', '150000:200000', '200000:999999')
+
+
+def _range_q(field: str, bucket: str, cast) -> Q:
+    low, high = bucket.split(':')
+    return Q(**{f'{field}__gte': cast(low), f'{field}__lte': cast(high)})
+
+
+def _facet_conditions():
+    """(фасет, значение, условие) для всех вариантов всех фасетов"""
+    conditions = []
+    for value, _ in Apartment.TYPE_CHOICES:
+        conditions.append(('type', value, Q(type=value)))
+    for value, _ in Apartment.DISTRICT_CHOICES:
+        conditions.append(('district', value, Q(district=value)))
+    for value, _ in Apartment.CONDITION_CHOICES:
+        conditions.append(('condition', value, Q(condition=value)))
+    for rooms in FACET_ROOMS:
+        conditions.append(('rooms', str(rooms), Q(rooms=rooms)))
+    for bucket in FACET_AREA_BUCKETS:
+        conditions.append(('area_range', bucket, _range_q('area', bucket, float)))
+    for bucket in FACET_PRICE_BUCKETS:
+        conditions.append(('price_range', bucket, _range_q('price', bucket, int)))
+    return conditions
+
+
+def compute_facets(queryset) -> dict:
+    """
+    Посчитать все фасеты одним проходом по выборке
+
+    Каждый вариант — COUNT(*) FILTER (WHERE ...) в одном агрегирующем запросе,
+    а не отдельный запрос на вариант.
+
+    Returns:
+        {'total': N, 'district': {'Мирабадский': n, ...}, 'rooms': {'1': n, ...}, ...}
+    """
+    conditions = _facet_conditions()
+    # Значения фасетов содержат пробелы, поэтому псевдонимы в SQL — по номеру
+    aggregates = {f'f{i}': Count('id', filter=condition) for i, (_, _, condition) in enumerate(conditions)}
+    aggregates['total'] = Count('id')
+    row = queryset.order_by().aggregate(**aggregates)
+
+    facets = {'total': row['total']}
+    for i, (facet, value, _) in enumerate(conditions):
+        facets.setdefault(facet, {})[value] = row[f'f{i}']
+    return facets
+
+
+def cached_facets(queryset, request) -> dict:
+    """Фасеты для отфильтрованной выборки с коротким кэшем по подписи фильтров"""
+    key = f'apartments:facets:{get_catalog_version()}:{filter_signature(request.query_params)}'
+    facets = cache.get(key)
+    if facets is None:
+        facets = compute_facets(queryset)
+        cache.set(key, facets, FACETS_CACHE_TTL)
+    return facets
@@ -0,0 +1,153 @@
+"""
+Фоновая подготовка копий фото для Telegram.
+
+После сохранения ApartmentImage оригинал читается из хранилища и
+отправляется в пул процессов (estate.image_processing), поэтому
+сохранение в админке не ждёт декодирования многомегабайтных фото.
+Готовые JPEG сохраняются через то же хранилище, запись фото обновляется,
+а updated_at квартиры сдвигается: ответ API с новыми URL получает новый ETag.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Optional
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .image_processing import render_variants
+from .models import Apartment, ApartmentImage
+
+TELEGRAM_SUFFIX = ''
+THUMBNAIL_SUFFIX = '_thumb'
+VARIANT_FIELDS = ('telegram_image', 'thumbnail')
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """Общий пул процессов, создаётся при первом фото"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn: дочерние процессы не наследуют потоки и соединения с БД сервера
+            _executor = ProcessPoolExecutor(
+                max_workers=max(1, settings.IMAGE_VARIANT_WORKERS),
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _executor
+
+
+def read_source(source_name: str) -> bytes:
+    """Байты оригинала из хранилища поля image"""
+    storage = ApartmentImage._meta.get_field('image').storage
+    with storage.open(source_name, 'rb') as source:
+        return source.read()
+
+
+def delete_variant_files(names: dict):
+    """
+    Удаляет файлы копий после фиксации транзакции (при откате они ещё нужны)
+
+    Args:
+        names: Имена файлов по полям, например {'telegram_image': ..., 'thumbnail': ...}
+    """
+    names = {field: name for field, name in names.items() if name}
+    if not names:
+        return
+
+    def delete():
+        for field, name in names.items():
+            try:
+                ApartmentImage._meta.get_field(field).storage.delete(name)
+            except OSError as e:
+                print(f"[IMAGES] Не удалось удалить копию {name}: {e}")
+
+    transaction.on_commit(delete)
+
+
+def _variant_name(source_name: str, suffix: str) -> str:
+    stem = os.path.splitext(os.path.basename(source_name))[0]
+    return f'{stem}{suffix}.jpg'
+
+
+def save_variants(image_id: int, source_name: str, telegram_data: bytes, thumbnail_data: bytes) -> bool:
+    """
+    Сохраняет готовые копии фото
+
+    Args:
+        image_id: ID ApartmentImage
+        source_name: Имя оригинала, из которого сделаны копии
+        telegram_data: JPEG для Telegram
+        thumbnail_data: JPEG-превью
+
+    Returns:
+        False, если фото удалили или заменили, пока готовились копии
+    """
+    image = ApartmentImage.objects.filter(pk=image_id, image=source_name).first()
+    if image is None:
+        return False
+    previous = {field: getattr(image, field).name for field in VARIANT_FIELDS}
+
+    image.telegram_image.save(_variant_name(source_name, TELEGRAM_SUFFIX), ContentFile(telegram_data), save=False)
+    image.thumbnail.save(_variant_name(source_name, THUMBNAIL_SUFFIX), ContentFile(thumbnail_data), save=False)
+    # update() вместо save(): сигналы ApartmentImage не должны снова запускать обработку
+    updated = ApartmentImage.objects.filter(pk=image_id, image=source_name).update(
+        telegram_image=image.telegram_image.name,
+        thumbnail=image.thumbnail.name,
+    )
+    if not updated:
+        image.telegram_image.storage.delete(image.telegram_image.name)
+        image.thumbnail.storage.delete(image.thumbnail.name)
+        return False
+    # Пересоздание копий (build_image_variants --all): прежние файлы больше не нужны
+    delete_variant_files({field: name for field, name in previous.items() if name != getattr(image, field).name})
+
+    Apartment.objects.filter(pk=image.apartment_id).update(updated_at=timezone.now())
+    return True
+
+
+def build_variants(image: ApartmentImage) -> bool:
+    """Готовит копии фото в текущем процессе"""
+    telegram_data, thumbnail_data = render_variants(read_source(image.image.name))
+    return save_variants(image.pk, image.image.name, telegram_data, thumbnail_data)
+
+
+def _finish(image_id: int, source_name: str, future: Future):
+    """Сохраняет результат пула (вызывается в служебном потоке пула)"""
+    close_old_connections()
+    try:
+        telegram_data, thumbnail_data = future.result()
+        save_variants(image_id, source_name, telegram_data, thumbnail_data)
+    except Exception as e:
+        # Бот отправит оригинал; копии можно построить командой build_image_variants
+        print(f"[IMAGES] Не удалось подготовить копии фото {image_id} ({source_name}): {e}")
+    finally:
+        close_old_connections()
+
+
+def schedule_variants(image_id: int, source_name: str):
+    """
+    Ставит подготовку копий в очередь после фиксации транзакции
+
+    Args:
+        image_id: ID ApartmentImage
+        source_name: Имя оригинала в хранилище
+    """
+
+    def submit():
+        try:
+            if settings.IMAGE_VARIANT_WORKERS <= 0:
+                save_variants(image_id, source_name, *render_variants(read_source(source_name)))
+                return
+            future = get_executor().submit(render_variants, read_source(source_name))
+        except Exception as e:
+            print(f"[IMAGES] Не удалось поставить фото {image_id} ({source_name}) в обработку: {e}")
+            return
+        future.add_done_callback(lambda done: _finish(image_id, source_name, done))
+
+    transaction.on_commit(submit)
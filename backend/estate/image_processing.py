@@ -0,0 +1,63 @@
+"""
+Подготовка фото квартир для Telegram.
+
+Модуль не импортирует Django: функции выполняются в дочерних процессах
+пула, которые получают байты оригинала и возвращают байты JPEG.
+"""
+from io import BytesIO
+from typing import Tuple
+
+from PIL import Image, ImageOps
+
+# Telegram всё равно уменьшает фото до 1280 px по большей стороне
+TELEGRAM_MAX_SIDE = 1280
+TELEGRAM_JPEG_QUALITY = 85
+THUMBNAIL_MAX_SIDE = 320
+THUMBNAIL_JPEG_QUALITY = 75
+
+# Фото с телефона до ~50 Мп; больше — скорее всего не фотография
+Image.MAX_IMAGE_PIXELS = 60_000_000
+
+
+def _to_rgb(image: Image.Image) -> Image.Image:
+    """JPEG без прозрачности: прозрачные области заливаются белым"""
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    if image.mode != 'RGB':
+        return image.convert('RGB')
+    return image
+
+
+def _encode_jpeg(image: Image.Image, max_side: int, quality: int) -> bytes:
+    resized = image.copy()
+    resized.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+    buffer = BytesIO()
+    # exif и icc_profile не передаются: метаданные (в том числе геопозиция) не сохраняются
+    resized.save(buffer, 'JPEG', quality=quality, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def render_variants(data: bytes) -> Tuple[bytes, bytes]:
+    """
+    Готовит копию для Telegram и превью
+
+    Поворот из EXIF применяется к пикселям до удаления метаданных,
+    поэтому фото, снятые вертикально, не ложатся набок.
+
+    Args:
+        data: Байты оригинального изображения
+
+    Returns:
+        (JPEG не больше TELEGRAM_MAX_SIDE, JPEG-превью не больше THUMBNAIL_MAX_SIDE)
+    """
+    with Image.open(BytesIO(data)) as source:
+        # draft ускоряет декодирование JPEG сразу в уменьшенном масштабе
+        source.draft('RGB', (TELEGRAM_MAX_SIDE, TELEGRAM_MAX_SIDE))
+        image = _to_rgb(ImageOps.exif_transpose(source))
+    return (
+        _encode_jpeg(image, TELEGRAM_MAX_SIDE, TELEGRAM_JPEG_QUALITY),
+        _encode_jpeg(image, THUMBNAIL_MAX_SIDE, THUMBNAIL_JPEG_QUALITY),
+    )
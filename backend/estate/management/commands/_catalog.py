@@ -0,0 +1,88 @@
+"""
+Общие помощники бенчмарков: временная БД и синтетический каталог квартир
+"""
+import random
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+from django.utils import timezone
+
+from estate.models import Apartment, ApartmentImage
+
+STREETS = [
+    'Амира Темура', 'Мустакиллик', 'Шота Руставели', 'Бабура', 'Навои',
+    'Мирзо Улугбека', 'Осиё', 'Буюк Ипак Йули', 'Чиланзар', 'Юнусабад',
+]
+LANDMARKS = [
+    'метро Минор', 'Мега Планет', 'ТЦ Самарканд Дарвоза', 'парк Бабура',
+    'Госпиталь', 'Ташкент Сити', 'Алайский базар', 'Юнусабадский рынок',
+]
+
+
+@contextmanager
+def synthetic_test_db():
+    """Создаёт отдельную тестовую БД с миграциями и удаляет её после замера"""
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def populate_catalog(rows: int, images_per_apartment: int = 3, seed: int = 42, batch_size: int = 5000):
+    """Заполняет БД синтетическими квартирами с реалистичным распределением полей"""
+    rng = random.Random(seed)
+    types = [choice for choice, _ in Apartment.TYPE_CHOICES]
+    districts = [choice for choice, _ in Apartment.DISTRICT_CHOICES]
+    conditions = [choice for choice, _ in Apartment.CONDITION_CHOICES]
+    now = timezone.now()
+
+    for start in range(0, rows, batch_size):
+        batch = []
+        for i in range(start, min(start + batch_size, rows)):
+            rooms = rng.choice([1, 2, 2, 3, 3, 4, 5])
+            area = round(rng.uniform(25, 60) + rooms * rng.uniform(10, 30), 1)
+            batch.append(Apartment(
+                type=rng.choice(types),
+                district=rng.choice(districts),
+                condition=rng.choice(conditions),
+                area=area,
+                rooms=rooms,
+                price=int(area * rng.uniform(700, 2200)),
+                address=f"ул. {rng.choice(STREETS)}, {rng.randint(1, 120)}",
+                orientation=rng.choice(LANDMARKS),
+                floor=rng.randint(1, 16),
+                floors_total=16,
+                description=' '.join(rng.choice(STREETS + LANDMARKS) for _ in range(rng.randint(5, 30))),
+                contact_name='Агент',
+                contact_phone='+998900000000',
+            ))
+        created = Apartment.objects.bulk_create(batch)
+        images = [
+            ApartmentImage(apartment=apartment, image=f"apartments/synthetic-{apartment.id}-{n}.jpg", order=n)
+            for apartment in created
+            for n in range(images_per_apartment)
+        ]
+        ApartmentImage.objects.bulk_create(images)
+
+    with connection.cursor() as cursor:
+        # auto_now_add не даёт задать дату при создании: разносим даты по минуте на квартиру
+        cursor.execute(
+            "UPDATE estate_apartment SET created_at = datetime(%s, '-' || (%s - id) || ' minutes')",
+            [now.strftime('%Y-%m-%d %H:%M:%S'), rows],
+        )
+        cursor.execute("UPDATE estate_apartment SET updated_at = created_at")
+        cursor.execute('ANALYZE')
+
+
+def timed(func, repeat: int):
+    """Возвращает медианное время выполнения func в миллисекундах и последний результат"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2], result
@@ -0,0 +1,83 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from estate.models import Apartment
+from estate.views import ApartmentViewSet
+
+from ._catalog import populate_catalog, synthetic_test_db, timed
+
+# Типичные запросы бота: (название, параметры запроса)
+SCENARIOS = [
+    ('Без фильтров, первая страница', {}),
+    ('Район + комнаты + цена', {
+        'district': ['Юнусабадский', 'Мирабадский'],
+        'rooms': ['2', '3'],
+        'price_range': ['70000:100000', '100000:150000'],
+    }),
+    ('Только цена', {'price_range': ['150000:200000']}),
+    ('Только площадь', {'area_range': ['40:66']}),
+    ('Тип + состояние + площадь', {
+        'type': ['Новостройка'],
+        'condition': ['С ремонтом'],
+        'area_range': ['67:85', '85:105'],
+    }),
+]
+
+
+class Command(BaseCommand):
+    help = 'Замер запросов списка квартир на синтетическом каталоге с индексами и без них'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100_000, help='Количество квартир в каталоге')
+        parser.add_argument('--repeat', type=int, default=5, help='Повторов каждого запроса')
+
+    def _queryset(self, params):
+        factory = APIRequestFactory()
+        view = ApartmentViewSet()
+        view.request = Request(factory.get('/api/apartments/', params))
+        view.format_kwarg = None
+        return view.filter_queryset(view.get_queryset())
+
+    def _run(self, title, repeat):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\n=== {title} ==='))
+        results = {}
+        for name, params in SCENARIOS:
+            queryset = self._queryset(params)
+            page_ms, _ = timed(lambda: list(queryset[:10]), repeat)
+            count_ms, count = timed(queryset.count, repeat)
+            results[name] = (page_ms, count_ms)
+            self.stdout.write(f'{name}: страница {page_ms:.2f} мс, COUNT {count_ms:.2f} мс (найдено {count})')
+            plan = queryset.order_by('-created_at')[:10].explain()
+            for line in plan.splitlines():
+                self.stdout.write(f'    {line}')
+        return results
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        repeat = options['repeat']
+        indexes = Apartment._meta.indexes
+
+        with synthetic_test_db():
+            self.stdout.write(f'Создаю синтетический каталог: {rows} квартир...')
+            populate_catalog(rows)
+
+            with connection.schema_editor() as editor:
+                for index in indexes:
+                    editor.remove_index(Apartment, index)
+            before = self._run('Без индексов', repeat)
+
+            with connection.schema_editor() as editor:
+                for index in indexes:
+                    editor.add_index(Apartment, index)
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+            after = self._run('С индексами', repeat)
+
+        self.stdout.write(self.style.MIGRATE_HEADING('\n=== Итог (страница / COUNT, мс) ==='))
+        for name, _ in SCENARIOS:
+            (page_before, count_before), (page_after, count_after) = before[name], after[name]
+            self.stdout.write(
+                f'{name}: {page_before:.2f} → {page_after:.2f} / {count_before:.2f} → {count_after:.2f}'
+            )
@@ -0,0 +1,75 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F, Value
+from django.db.models.functions import Concat
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from estate.models import Apartment
+from estate.views import ApartmentViewSet
+
+from ._catalog import populate_catalog, synthetic_test_db, timed
+
+# Частые слова: в синтетическом каталоге встречаются в 40–85% квартир
+COMMON_QUERIES = [
+    'Бабура',
+    'Мустак',
+    'метро Минор',
+    'Ташкент Сити Навои',
+    'Алайский',
+]
+# Редкие слова: их дописывает в описание каждой RARE_EVERY-й квартиры
+RARE_WORDS = 'пентхаус с террасой'
+RARE_EVERY = 1000
+RARE_QUERIES = [
+    'пентхаус',
+    'террас Бабура',
+    'дуплекс',
+]
+
+
+class Command(BaseCommand):
+    help = 'Замер поиска по тексту: SearchFilter (search=, LIKE) против FTS5 (q=)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100_000, help='Количество квартир в каталоге')
+        parser.add_argument('--repeat', type=int, default=5, help='Повторов каждого запроса')
+
+    def _queryset(self, params):
+        factory = APIRequestFactory()
+        view = ApartmentViewSet()
+        view.request = Request(factory.get('/api/apartments/', params))
+        view.format_kwarg = None
+        return view.filter_queryset(view.get_queryset())
+
+    def _measure(self, params, repeat):
+        queryset = self._queryset(params)
+        page_ms, _ = timed(lambda: list(queryset[:10]), repeat)
+        count_ms, count = timed(queryset.count, repeat)
+        return page_ms, count_ms, count
+
+    def _report(self, queries, repeat):
+        for text in queries:
+            like_page, like_count, like_found = self._measure({'search': text}, repeat)
+            fts_page, fts_count, fts_found = self._measure({'q': text}, repeat)
+            self.stdout.write(
+                f'«{text}»: search= {like_page:.2f} / {like_count:.2f} ({like_found}), '
+                f'q= {fts_page:.2f} / {fts_count:.2f} ({fts_found}), '
+                f'x{like_page / fts_page:.1f} / x{like_count / fts_count:.1f}'
+            )
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        repeat = options['repeat']
+
+        with synthetic_test_db():
+            self.stdout.write(f'Создаю синтетический каталог: {rows} квартир...')
+            populate_catalog(rows, images_per_apartment=0)
+            # UPDATE проходит через триггер, поэтому FTS-индекс видит новые слова
+            Apartment.objects.filter(id__in=range(RARE_EVERY, rows + 1, RARE_EVERY)).update(
+                description=Concat(F('description'), Value(f' {RARE_WORDS}'))
+            )
+
+            self.stdout.write(self.style.MIGRATE_HEADING('\n=== Частые слова: страница / COUNT, мс (найдено) ==='))
+            self._report(COMMON_QUERIES, repeat)
+            self.stdout.write(self.style.MIGRATE_HEADING('\n=== Редкие слова: страница / COUNT, мс (найдено) ==='))
+            self._report(RARE_QUERIES, repeat)
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from estate.models import Apartment
+from estate.serializers import APARTMENT_VALUE_FIELDS, ApartmentSerializer, serialize_apartment_rows
+
+from ._catalog import populate_catalog, synthetic_test_db, timed
+
+PAGE_SIZES = (10, 100, 1000)
+
+
+class Command(BaseCommand):
+    help = 'Сравнение ApartmentSerializer и быстрой сериализации списка (строк в секунду)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=7, help='Повторов каждого замера')
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        request = Request(APIRequestFactory().get('/api/apartments/'))
+        renderer = JSONRenderer()
+        ordered = Apartment.objects.order_by('-created_at')
+
+        def render_serializer(size):
+            apartments = ordered.prefetch_related('images')[:size]
+            data = ApartmentSerializer(apartments, many=True, context={'request': request}).data
+            return renderer.render(data)
+
+        def render_fast(size):
+            rows = ordered.values(*APARTMENT_VALUE_FIELDS)[:size]
+            return renderer.render(serialize_apartment_rows(rows, request))
+
+        with synthetic_test_db():
+            rows = max(PAGE_SIZES)
+            self.stdout.write(f'Создаю синтетический каталог: {rows} квартир...')
+            populate_catalog(rows)
+
+            self.stdout.write(self.style.MIGRATE_HEADING('\n=== Строк в секунду (запрос + сериализация + JSON) ==='))
+            for size in PAGE_SIZES:
+                serializer_ms, expected = timed(lambda: render_serializer(size), repeat)
+                fast_ms, actual = timed(lambda: render_fast(size), repeat)
+                if actual != expected:
+                    raise CommandError(f'JSON быстрого пути отличается от ApartmentSerializer (страница {size})')
+                self.stdout.write(
+                    f'Страница {size}: ApartmentSerializer {size / serializer_ms * 1000:,.0f} строк/с '
+                    f'({serializer_ms:.2f} мс), быстрый путь {size / fast_ms * 1000:,.0f} строк/с '
+                    f'({fast_ms:.2f} мс), ускорение x{serializer_ms / fast_ms:.1f}'
+                )
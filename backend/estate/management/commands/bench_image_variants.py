@@ -0,0 +1,105 @@
+import tempfile
+import time
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from PIL import Image
+
+from estate.image_processing import render_variants
+from estate.models import ApartmentImage
+
+from ._catalog import populate_catalog, synthetic_test_db, timed
+
+# Снимок основной камеры телефона: 12 Мп
+PHOTO_SIZE = (4032, 3024)
+# Фото снято вертикально: при отображении его нужно повернуть
+EXIF_ORIENTATION = 6
+
+
+def make_phone_photo(seed: int) -> bytes:
+    """JPEG как с телефона: 12 Мп, шум сенсора, высокое качество, EXIF с поворотом"""
+    gradient = Image.linear_gradient('L').resize(PHOTO_SIZE)
+    noise = Image.effect_noise(PHOTO_SIZE, 40 + seed % 20)
+    image = Image.merge('RGB', (gradient, noise, gradient.rotate(180)))
+    exif = Image.Exif()
+    exif[0x0112] = EXIF_ORIENTATION
+    exif[0x010F] = 'Phone'
+    exif[0x0110] = f'Model {seed}'
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', quality=95, exif=exif)
+    return buffer.getvalue()
+
+
+class Command(BaseCommand):
+    help = 'Замер подготовки фото для Telegram: размер файлов и время сохранения фото в админке'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--photos', type=int, default=10, help='Количество фото (как одна загрузка в админке)')
+        parser.add_argument('--workers', type=int, default=settings.IMAGE_VARIANT_WORKERS, help='Процессов в пуле')
+
+    def _save_photos(self, apartment_id, photos):
+        """Время ApartmentImage.objects.create для каждого фото, как в save_model админки"""
+        timings = []
+        for index, data in enumerate(photos):
+            started = time.perf_counter()
+            ApartmentImage.objects.create(
+                apartment_id=apartment_id,
+                image=ContentFile(data, name=f'bench-{apartment_id}-{index}.jpg'),
+                order=index,
+            )
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    def _wait_for_variants(self, apartment_id, count, timeout=300):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if ApartmentImage.objects.filter(apartment_id=apartment_id).exclude(telegram_image='').count() >= count:
+                return True
+            time.sleep(0.05)
+        return False
+
+    def handle(self, *args, **options):
+        count = options['photos']
+        workers = options['workers']
+
+        self.stdout.write(f'Готовлю {count} синтетических фото {PHOTO_SIZE[0]}x{PHOTO_SIZE[1]}...')
+        photos = [make_phone_photo(seed) for seed in range(count)]
+
+        render_ms, (telegram_data, thumbnail_data) = timed(lambda: render_variants(photos[0]), 3)
+        with Image.open(BytesIO(telegram_data)) as variant:
+            self.stdout.write(
+                f'Копия для Telegram: {variant.size[0]}x{variant.size[1]}, '
+                f"progressive={bool(variant.info.get('progressive'))}, EXIF {'есть' if variant.getexif() else 'нет'}; "
+                f'подготовка одного фото {render_ms:.0f} мс'
+            )
+
+        with tempfile.TemporaryDirectory() as media_root, synthetic_test_db():
+            populate_catalog(2, images_per_apartment=0)
+            sync_id, pool_id = 1, 2
+
+            with override_settings(MEDIA_ROOT=media_root, IMAGE_VARIANT_WORKERS=0):
+                sync_timings = self._save_photos(sync_id, photos)
+
+            with override_settings(MEDIA_ROOT=media_root, IMAGE_VARIANT_WORKERS=workers):
+                started = time.perf_counter()
+                pool_timings = self._save_photos(pool_id, photos)
+                ready = self._wait_for_variants(pool_id, count)
+                pool_total = time.perf_counter() - started
+
+                images = ApartmentImage.objects.filter(apartment_id=pool_id)
+                source_bytes = sum(image.image.size for image in images)
+                telegram_bytes = sum(image.telegram_image.size for image in images if image.telegram_image)
+                thumbnail_bytes = sum(image.thumbnail.size for image in images if image.thumbnail)
+
+        self.stdout.write(self.style.MIGRATE_HEADING('\n=== Сохранение фото в админке, мс на фото ==='))
+        self.stdout.write(f'Обработка при сохранении: {sum(sync_timings) / count:.0f}')
+        self.stdout.write(f'Пул из {workers} процессов: {sum(pool_timings) / count:.0f} '
+                          f'(все копии готовы через {pool_total:.1f} с{"" if ready else ", не дождались"})')
+
+        self.stdout.write(self.style.MIGRATE_HEADING('\n=== Размер, МБ ==='))
+        self.stdout.write(f'Оригиналы: {source_bytes / 1e6:.1f}')
+        self.stdout.write(f'Копии для Telegram: {telegram_bytes / 1e6:.2f} (x{source_bytes / max(telegram_bytes, 1):.0f} меньше)')
+        self.stdout.write(f'Превью: {thumbnail_bytes / 1e6:.2f}')
@@ -0,0 +1,96 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from estate.models import Apartment, Place, PlaceWord, Word
+from estate.places import lookup_apartments, normalize, rebuild_place_index, trigrams
+
+from ._catalog import populate_catalog, synthetic_test_db, timed
+
+# Запросы с опечатками, сокращениями и неполными словами
+QUERIES = [
+    'юнусабад 15',
+    'мустакилик 7',
+    'амир темур 101',
+    'мега планет',
+    'минор',
+    'тц самарканд дарваза',
+]
+
+
+def scan_lookup(text: str, values, limit: int = 5):
+    """Без индекса: сходство каждого слова запроса со словами каждого значения"""
+    query = normalize(text)
+    scored = []
+    for value in values:
+        value_words = normalize(value)
+        words = [trigrams(word) for word in value_words]
+        total = 0
+        for query_word in query:
+            if query_word.isdigit():
+                total += query_word in value_words
+                continue
+            query_trigrams = trigrams(query_word)
+            best = 0
+            for word_trigrams in words:
+                shared = len(query_trigrams & word_trigrams)
+                if shared >= len(query_trigrams) / 2:
+                    overlap = shared / (len(query_trigrams) + len(word_trigrams) - shared)
+                    best = max(best, (shared / len(query_trigrams) + overlap) / 2)
+            total += best
+        if total >= len(query) * 0.4:
+            scored.append((total / len(query), value))
+    scored.sort(reverse=True)
+    return scored[:limit]
+
+
+class Command(BaseCommand):
+    help = 'Замер нечёткого поиска по адресу и ориентиру: индекс триграмм против перебора значений'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100_000, help='Количество квартир в каталоге')
+        parser.add_argument('--repeat', type=int, default=5, help='Повторов каждого запроса')
+
+    def _run(self, title, repeat):
+        self.stdout.write('Перестраиваю индекс...')
+        started = time.perf_counter()
+        rebuild_place_index()
+        self.stdout.write(
+            f'Индекс: {Place.objects.count()} значений, {Word.objects.count()} слов, '
+            f'{PlaceWord.objects.count()} связей слово → значение '
+            f'за {time.perf_counter() - started:.1f} с'
+        )
+        values = list(Place.objects.values_list('value', flat=True))
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\n=== {title}: мс на запрос ==='))
+        for text in QUERIES:
+            index_ms, results = timed(lambda: lookup_apartments(text, 5, ('address', 'orientation')), repeat)
+            scan_ms, _ = timed(lambda: scan_lookup(text, values), 1)
+            best = results[0]['matched_value'] if results else '—'
+            self.stdout.write(f'«{text}»: индекс {index_ms:.2f}, перебор {scan_ms:.1f} (x{scan_ms / index_ms:.0f}) → {best}')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        repeat = options['repeat']
+
+        with synthetic_test_db():
+            self.stdout.write(f'Создаю синтетический каталог: {rows} квартир...')
+            populate_catalog(rows, images_per_apartment=0)
+            self._run('Адреса повторяются (улица + дом)', repeat)
+
+            # Почти у каждой квартиры свой адрес: худший случай для размера индекса
+            with connection.cursor() as cursor:
+                cursor.execute("UPDATE estate_apartment SET address = address || ', кв. ' || (id % 97)")
+            self._run('Уникальные адреса (улица + дом + квартира)', repeat)
+
+            # Сохранение через модель обновляет индекс сигналами
+            apartment = Apartment.objects.order_by('id').first()
+            counter = iter(range(1_000_000))
+
+            def save():
+                apartment.address = f'ул. Навои, {next(counter)}'
+                apartment.save()
+
+            save_ms, _ = timed(save, repeat)
+            self.stdout.write(f'\nСохранение квартиры с новым адресом (с обновлением индекса): {save_ms:.2f} мс')
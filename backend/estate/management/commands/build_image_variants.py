@@ -0,0 +1,63 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from estate.image_pipeline import get_executor, read_source, save_variants
+from estate.image_processing import render_variants
+from estate.models import ApartmentImage
+
+
+class Command(BaseCommand):
+    help = 'Подготовить копии фото для Telegram и превью для фото, у которых их ещё нет'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Пересоздать копии для всех фото')
+
+    def handle(self, *args, **options):
+        images = ApartmentImage.objects.exclude(image='').order_by('id')
+        if not options['all']:
+            images = images.filter(telegram_image='')
+        images = list(images.values_list('id', 'image'))
+        if not images:
+            self.stdout.write('Все фото уже обработаны')
+            return
+
+        executor = get_executor()
+        # Оригиналы читаются по мере обработки: в памяти не больше окна фото
+        window = max(1, settings.IMAGE_VARIANT_WORKERS) * 2
+        started = time.perf_counter()
+        source_bytes = result_bytes = done = failed = 0
+        pending = []
+
+        def collect(item):
+            nonlocal source_bytes, result_bytes, done, failed
+            image_id, name, size, future = item
+            try:
+                telegram_data, thumbnail_data = future.result()
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f'Фото {image_id} ({name}): {e}')
+                return
+            if save_variants(image_id, name, telegram_data, thumbnail_data):
+                source_bytes += size
+                result_bytes += len(telegram_data)
+                done += 1
+
+        for image_id, name in images:
+            try:
+                data = read_source(name)
+            except OSError as e:
+                failed += 1
+                self.stderr.write(f'Фото {image_id} ({name}): {e}')
+                continue
+            pending.append((image_id, name, len(data), executor.submit(render_variants, data)))
+            if len(pending) >= window:
+                collect(pending.pop(0))
+        for item in pending:
+            collect(item)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово {done} фото, ошибок {failed}, за {time.perf_counter() - started:.1f} с; '
+            f'оригиналы {source_bytes / 1e6:.1f} МБ → копии для Telegram {result_bytes / 1e6:.1f} МБ'
+        ))
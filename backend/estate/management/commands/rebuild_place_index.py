@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from estate.models import Place, Word
+from estate.places import rebuild_place_index
+
+
+class Command(BaseCommand):
+    help = 'Перестроить индекс нечёткого поиска по адресу и ориентиру (после bulk_create и update())'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        rebuild_place_index()
+        self.stdout.write(self.style.SUCCESS(
+            f'Индекс перестроен за {time.perf_counter() - started:.1f} с: '
+            f'{Place.objects.count()} адресов и ориентиров, {Word.objects.count()} слов'
+        ))
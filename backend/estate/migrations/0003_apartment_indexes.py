@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estate', '0002_alter_apartment_district'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='apartment',
+            index=models.Index(fields=['-created_at'], name='apartment_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='apartment',
+            index=models.Index(fields=['district', 'rooms', 'price'], name='apartment_district_rooms_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='apartment',
+            index=models.Index(fields=['price'], name='apartment_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='apartment',
+            index=models.Index(fields=['area'], name='apartment_area_idx'),
+        ),
+    ]
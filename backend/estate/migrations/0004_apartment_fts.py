@@ -0,0 +1,86 @@
+from django.db import migrations
+
+# Схема FTS5 на момент миграции. Скопирована из estate.search, чтобы
+# последующие изменения модуля не меняли то, что делает эта миграция.
+FTS_SCHEMA_SQL = [
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS estate_apartment_fts USING fts5(
+        address, orientation, district, description,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS estate_apartment_fts_ai AFTER INSERT ON estate_apartment BEGIN
+        INSERT INTO estate_apartment_fts (rowid, address, orientation, district, description) VALUES (
+            new.id,
+            replace(replace(new.address, 'ё', 'е'), 'Ё', 'Е'),
+            replace(replace(new.orientation, 'ё', 'е'), 'Ё', 'Е'),
+            replace(replace(new.district, 'ё', 'е'), 'Ё', 'Е'),
+            replace(replace(new.description, 'ё', 'е'), 'Ё', 'Е')
+        );
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS estate_apartment_fts_ad AFTER DELETE ON estate_apartment BEGIN
+        DELETE FROM estate_apartment_fts WHERE rowid = old.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS estate_apartment_fts_au
+    AFTER UPDATE OF address, orientation, district, description ON estate_apartment BEGIN
+        DELETE FROM estate_apartment_fts WHERE rowid = old.id;
+        INSERT INTO estate_apartment_fts (rowid, address, orientation, district, description) VALUES (
+            new.id,
+            replace(replace(new.address, 'ё', 'е'), 'Ё', 'Е'),
+            replace(replace(new.orientation, 'ё', 'е'), 'Ё', 'Е'),
+            replace(replace(new.district, 'ё', 'е'), 'Ё', 'Е'),
+            replace(replace(new.description, 'ё', 'е'), 'Ё', 'Е')
+        );
+    END
+    ''',
+    '''
+    INSERT INTO estate_apartment_fts (rowid, address, orientation, district, description)
+    SELECT
+        id,
+        replace(replace(address, 'ё', 'е'), 'Ё', 'Е'),
+        replace(replace(orientation, 'ё', 'е'), 'Ё', 'Е'),
+        replace(replace(district, 'ё', 'е'), 'Ё', 'Е'),
+        replace(replace(description, 'ё', 'е'), 'Ё', 'Е')
+    FROM estate_apartment
+    ''',
+]
+
+FTS_DROP_SQL = [
+    'DROP TRIGGER IF EXISTS estate_apartment_fts_au',
+    'DROP TRIGGER IF EXISTS estate_apartment_fts_ad',
+    'DROP TRIGGER IF EXISTS estate_apartment_fts_ai',
+    'DROP TABLE IF EXISTS estate_apartment_fts',
+]
+
+
+def _execute(schema_editor, statements):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def create_index(apps, schema_editor):
+    _execute(schema_editor, FTS_SCHEMA_SQL)
+
+
+def drop_index(apps, schema_editor):
+    _execute(schema_editor, FTS_DROP_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estate', '0003_apartment_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,164 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:29
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Построение индекса на момент миграции. Скопировано из estate.places,
+# чтобы последующие изменения модуля не меняли то, что делает эта миграция.
+PLACE_FIELDS = ('address', 'orientation')
+BATCH_SIZE = 2000
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _normalize(text):
+    return list(dict.fromkeys(_WORD_RE.findall(text.lower().replace('ё', 'е'))))
+
+
+def _trigrams(word):
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _create_places(apps, places):
+    Place = apps.get_model('estate', 'Place')
+    PlaceWord = apps.get_model('estate', 'PlaceWord')
+    Word = apps.get_model('estate', 'Word')
+    WordTrigram = apps.get_model('estate', 'WordTrigram')
+
+    place_words = []
+    for place in places:
+        place_words.append(_normalize(place.value))
+        place.words_count = len(place_words[-1])
+    created = Place.objects.bulk_create(places)
+
+    texts = {word for words in place_words for word in words}
+    word_ids = dict(Word.objects.filter(text__in=texts).values_list('text', 'id'))
+    missing = texts - word_ids.keys()
+    if missing:
+        Word.objects.bulk_create(Word(text=text, trigram_count=len(_trigrams(text))) for text in missing)
+        new_ids = dict(Word.objects.filter(text__in=missing).values_list('text', 'id'))
+        WordTrigram.objects.bulk_create(
+            (WordTrigram(word_id=word_id, trigram=trigram) for text, word_id in new_ids.items() for trigram in _trigrams(text)),
+            batch_size=BATCH_SIZE * 10,
+        )
+        word_ids.update(new_ids)
+
+    PlaceWord.objects.bulk_create(
+        (PlaceWord(place_id=place.id, word_id=word_ids[word]) for place, words in zip(created, place_words) for word in words),
+        batch_size=BATCH_SIZE * 10,
+    )
+
+
+def build_index(apps, schema_editor):
+    Apartment = apps.get_model('estate', 'Apartment')
+    Place = apps.get_model('estate', 'Place')
+    for field in PLACE_FIELDS:
+        counts = (
+            Apartment.objects.exclude(**{field: ''})
+            .values_list(field)
+            .annotate(apartments_count=models.Count('id'))
+            .order_by()
+        )
+        batch = []
+        for value, apartments_count in counts.iterator():
+            batch.append(Place(field=field, value=value, apartments_count=apartments_count))
+            if len(batch) >= BATCH_SIZE:
+                _create_places(apps, batch)
+                batch = []
+        _create_places(apps, batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estate', '0004_apartment_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Place',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(choices=[('address', 'Адрес'), ('orientation', 'Ориентир')], max_length=20, verbose_name='Поле')),
+                ('value', models.CharField(max_length=255, verbose_name='Значение')),
+                ('words_count', models.IntegerField(default=0, verbose_name='Количество слов')),
+                ('apartments_count', models.IntegerField(default=0, verbose_name='Количество квартир')),
+            ],
+            options={
+                'verbose_name': 'Адрес или ориентир',
+                'verbose_name_plural': 'Адреса и ориентиры',
+            },
+        ),
+        migrations.CreateModel(
+            name='PlaceWord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+            options={
+                'verbose_name': 'Слово адреса',
+                'verbose_name_plural': 'Слова адресов',
+            },
+        ),
+        migrations.CreateModel(
+            name='Word',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', models.CharField(max_length=255, unique=True, verbose_name='Слово')),
+                ('trigram_count', models.IntegerField(default=0, verbose_name='Количество триграмм')),
+            ],
+            options={
+                'verbose_name': 'Слово',
+                'verbose_name_plural': 'Слова',
+            },
+        ),
+        migrations.CreateModel(
+            name='WordTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3, verbose_name='Триграмма')),
+            ],
+            options={
+                'verbose_name': 'Триграмма',
+                'verbose_name_plural': 'Триграммы',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='apartment',
+            index=models.Index(fields=['address', '-created_at'], name='apartment_address_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='apartment',
+            index=models.Index(fields=['orientation', '-created_at'], name='apartment_orientation_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='place',
+            constraint=models.UniqueConstraint(fields=('field', 'value'), name='place_field_value_uniq'),
+        ),
+        migrations.AddField(
+            model_name='placeword',
+            name='place',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='words', to='estate.place', verbose_name='Адрес или ориентир'),
+        ),
+        migrations.AddField(
+            model_name='placeword',
+            name='word',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='places', to='estate.word', verbose_name='Слово'),
+        ),
+        migrations.AddField(
+            model_name='wordtrigram',
+            name='word',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trigrams', to='estate.word', verbose_name='Слово'),
+        ),
+        migrations.AddConstraint(
+            model_name='placeword',
+            constraint=models.UniqueConstraint(fields=('word', 'place'), name='place_word_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='wordtrigram',
+            constraint=models.UniqueConstraint(fields=('trigram', 'word'), name='word_trigram_uniq'),
+        ),
+        migrations.RunPython(build_index, migrations.RunPython.noop),
+    ]
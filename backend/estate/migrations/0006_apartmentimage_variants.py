@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estate', '0005_apartment_places'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apartmentimage',
+            name='telegram_image',
+            field=models.ImageField(blank=True, editable=False, upload_to='apartments/telegram/', verbose_name='Фото для Telegram'),
+        ),
+        migrations.AddField(
+            model_name='apartmentimage',
+            name='thumbnail',
+            field=models.ImageField(blank=True, editable=False, upload_to='apartments/thumbnails/', verbose_name='Превью'),
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:52
+
+from django.db import migrations, models
+
+# Триггеры держат строку версии в одной транзакции с записью квартир.
+# Время хранится как у Django на SQLite: UTC, 'YYYY-MM-DD HH:MM:SS.ffffff'
+CATALOG_TRIGGERS_SQL = [
+    '''
+    CREATE TRIGGER IF NOT EXISTS estate_catalogstate_ai AFTER INSERT ON estate_apartment BEGIN
+        UPDATE estate_catalogstate SET
+            apartments_count = apartments_count + 1,
+            last_modified = max(coalesce(last_modified, ''), new.updated_at),
+            changes = changes + 1
+        WHERE id = 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS estate_catalogstate_au AFTER UPDATE ON estate_apartment BEGIN
+        UPDATE estate_catalogstate SET
+            last_modified = max(coalesce(last_modified, ''), new.updated_at),
+            changes = changes + 1
+        WHERE id = 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS estate_catalogstate_ad AFTER DELETE ON estate_apartment BEGIN
+        UPDATE estate_catalogstate SET
+            apartments_count = apartments_count - 1,
+            last_modified = max(coalesce(last_modified, ''), strftime('%Y-%m-%d %H:%M:%f', 'now')),
+            changes = changes + 1
+        WHERE id = 1;
+    END
+    ''',
+]
+
+CATALOG_DROP_SQL = [
+    'DROP TRIGGER IF EXISTS estate_catalogstate_ad',
+    'DROP TRIGGER IF EXISTS estate_catalogstate_au',
+    'DROP TRIGGER IF EXISTS estate_catalogstate_ai',
+]
+
+
+def create_state(apps, schema_editor):
+    Apartment = apps.get_model('estate', 'Apartment')
+    CatalogState = apps.get_model('estate', 'CatalogState')
+    totals = Apartment.objects.aggregate(last_modified=models.Max('updated_at'), total=models.Count('id'))
+    CatalogState.objects.create(id=1, apartments_count=totals['total'], last_modified=totals['last_modified'])
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for sql in CATALOG_TRIGGERS_SQL:
+            cursor.execute(sql)
+
+
+def drop_state(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for sql in CATALOG_DROP_SQL:
+            cursor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estate', '0006_apartmentimage_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('apartments_count', models.IntegerField(default=0, verbose_name='Количество квартир')),
+                ('last_modified', models.DateTimeField(null=True, verbose_name='Последнее изменение')),
+                ('changes', models.BigIntegerField(default=0, verbose_name='Счётчик изменений')),
+            ],
+            options={
+                'verbose_name': 'Версия каталога',
+                'verbose_name_plural': 'Версия каталога',
+            },
+        ),
+        migrations.RunPython(create_state, drop_state),
+    ]
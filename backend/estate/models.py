@@ -42,6 +42,18 @@ class Apartment(models.Model):
         verbose_name = 'Квартира'
         verbose_name_plural = 'Квартиры'
         ordering = ['-created_at']
+        indexes = [
+            # Сортировка списка по умолчанию
+            models.Index(fields=['-created_at'], name='apartment_created_idx'),
+            # Типичный поиск в боте: район + комнаты + диапазон цены
+            models.Index(fields=['district', 'rooms', 'price'], name='apartment_district_rooms_idx'),
+            # Диапазоны цены и площади без остальных фильтров
+            models.Index(fields=['price'], name='apartment_price_idx'),
+            models.Index(fields=['area'], name='apartment_area_idx'),
+            # Новые квартиры по адресу или ориентиру, найденным нечётким поиском
+            models.Index(fields=['address', '-created_at'], name='apartment_address_idx'),
+            models.Index(fields=['orientation', '-created_at'], name='apartment_orientation_idx'),
+        ]
 
     def __str__(self):
         return f"{self.rooms}-комнатная квартира, {self.district}, ${self.price}"
@@ -50,6 +62,9 @@ class Apartment(models.Model):
 class ApartmentImage(models.Model):
     apartment = models.ForeignKey(Apartment, related_name='images', on_delete=models.CASCADE, verbose_name='Квартира')
     image = models.ImageField(upload_to='apartments/', verbose_name='Изображение')
+    # Копии оригинала, которые готовит estate.image_pipeline после сохранения
+    telegram_image = models.ImageField(upload_to='apartments/telegram/', blank=True, editable=False, verbose_name='Фото для Telegram')
+    thumbnail = models.ImageField(upload_to='apartments/thumbnails/', blank=True, editable=False, verbose_name='Превью')
     order = models.IntegerField(default=0, verbose_name='Порядок')
 
     class Meta:
@@ -61,5 +76,79 @@ class ApartmentImage(models.Model):
         return f"Изображение {self.id} для квартиры {self.apartment.id}"
 
 
+class Place(models.Model):
+    """Уникальный адрес или ориентир квартир для нечёткого поиска"""
+    FIELD_CHOICES = [
+        ('address', 'Адрес'),
+        ('orientation', 'Ориентир'),
+    ]
+
+    field = models.CharField(max_length=20, choices=FIELD_CHOICES, verbose_name='Поле')
+    value = models.CharField(max_length=255, verbose_name='Значение')
+    words_count = models.IntegerField(default=0, verbose_name='Количество слов')
+    apartments_count = models.IntegerField(default=0, verbose_name='Количество квартир')
+
+    class Meta:
+        verbose_name = 'Адрес или ориентир'
+        verbose_name_plural = 'Адреса и ориентиры'
+        constraints = [
+            models.UniqueConstraint(fields=['field', 'value'], name='place_field_value_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_field_display()}: {self.value}"
+
+
+class Word(models.Model):
+    """Слово из адресов и ориентиров: словарь для сравнения по триграммам"""
+    text = models.CharField(max_length=255, unique=True, verbose_name='Слово')
+    trigram_count = models.IntegerField(default=0, verbose_name='Количество триграмм')
+
+    class Meta:
+        verbose_name = 'Слово'
+        verbose_name_plural = 'Слова'
+
+    def __str__(self):
+        return self.text
+
+
+class WordTrigram(models.Model):
+    word = models.ForeignKey(Word, related_name='trigrams', on_delete=models.CASCADE, verbose_name='Слово')
+    trigram = models.CharField(max_length=3, verbose_name='Триграмма')
+
+    class Meta:
+        verbose_name = 'Триграмма'
+        verbose_name_plural = 'Триграммы'
+        constraints = [
+            # Индекс (trigram, word) покрывает поиск похожих слов
+            models.UniqueConstraint(fields=['trigram', 'word'], name='word_trigram_uniq'),
+        ]
+
 
+class PlaceWord(models.Model):
+    place = models.ForeignKey(Place, related_name='words', on_delete=models.CASCADE, verbose_name='Адрес или ориентир')
+    word = models.ForeignKey(Word, related_name='places', on_delete=models.CASCADE, verbose_name='Слово')
 
+    class Meta:
+        verbose_name = 'Слово адреса'
+        verbose_name_plural = 'Слова адресов'
+        constraints = [
+            # Индекс (word, place) покрывает поиск адресов по найденным словам
+            models.UniqueConstraint(fields=['word', 'place'], name='place_word_uniq'),
+        ]
+
+
+class CatalogState(models.Model):
+    """
+    Версия каталога квартир одной строкой: число квартир, последнее изменение
+    и счётчик изменений. На SQLite строку обновляют триггеры (миграция 0007)
+    в той же транзакции, что и любую запись в estate_apartment, поэтому версию
+    видят все процессы, включая команды manage.py и bulk_create/update().
+    """
+    apartments_count = models.IntegerField(default=0, verbose_name='Количество квартир')
+    last_modified = models.DateTimeField(null=True, verbose_name='Последнее изменение')
+    changes = models.BigIntegerField(default=0, verbose_name='Счётчик изменений')
+
+    class Meta:
+        verbose_name = 'Версия каталога'
+        verbose_name_plural = 'Версия каталога'
@@ -0,0 +1,168 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .counts import cached_count
+
+
+class CachedCountPaginator(DjangoPaginator):
+    """Paginator, который берёт общее количество из кэша вместо COUNT(*)"""
+
+    def __init__(self, object_list, per_page, request=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.request = request
+
+    @cached_property
+    def count(self):
+        if self.request is None:
+            return super().count
+        return cached_count(self.object_list, self.request)
+
+
+class ApartmentPageNumberPagination(PageNumberPagination):
+    """
+    Пагинация по номерам страниц с кэшированным количеством:
+    при листании выполняется только запрос самой страницы.
+    """
+
+    def django_paginator_class(self, queryset, page_size):
+        return CachedCountPaginator(queryset, page_size, request=self.request)
+
+
+class ApartmentCursorPagination(BasePagination):
+    """
+    Keyset-пагинация по (created_at, id) от новых к старым.
+
+    Страница выбирается условием "строго после последней записи предыдущей
+    страницы" вместо OFFSET, поэтому время ответа не зависит от номера
+    страницы, а новые квартиры не сдвигают уже выданные страницы.
+    Курсор непрозрачен для клиента: base64 от JSON с позицией и направлением.
+    Количество возвращается только по запросу (with_count=1) и берётся из кэша.
+    """
+    page_size = 10
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    count_query_param = 'with_count'
+    invalid_cursor_message = 'Неверный курсор'
+
+    def _get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def encode_cursor(self, instance, reverse: bool) -> str:
+        # Страница может состоять из моделей или из словарей .values()
+        if isinstance(instance, dict):
+            created_at, pk = instance['created_at'], instance['id']
+        else:
+            created_at, pk = instance.created_at, instance.id
+        payload = {'c': created_at.isoformat(), 'i': pk, 'r': int(reverse)}
+        raw = json.dumps(payload, separators=(',', ':')).encode('ascii')
+        return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+            created_at = parse_datetime(payload['c'])
+            if created_at is None:
+                raise ValueError(payload['c'])
+            return created_at, int(payload['i']), bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size_value = self._get_page_size(request)
+        self.count = cached_count(queryset, request) if request.query_params.get(self.count_query_param) else None
+
+        cursor = self.decode_cursor(request)
+        if cursor is None:
+            page_queryset = queryset.order_by('-created_at', '-id')
+            reverse = False
+        else:
+            created_at, pk, reverse = cursor
+            if reverse:
+                # Назад: записи новее первой записи текущей страницы
+                page_queryset = queryset.filter(
+                    Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+                ).order_by('created_at', 'id')
+            else:
+                page_queryset = queryset.filter(
+                    Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+                ).order_by('-created_at', '-id')
+
+        # Одна лишняя запись показывает, есть ли продолжение в эту сторону
+        rows = list(page_queryset[:self.page_size_value + 1])
+        has_more = len(rows) > self.page_size_value
+        rows = rows[:self.page_size_value]
+
+        if reverse:
+            rows.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = cursor is not None
+
+        self.page = rows
+        return rows
+
+    def get_next_cursor(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_cursor(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def _link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.count_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        next_cursor = self.get_next_cursor()
+        previous_cursor = self.get_previous_cursor()
+        response = OrderedDict()
+        if self.count is not None:
+            response['count'] = self.count
+        response['next'] = self._link(next_cursor)
+        response['previous'] = self._link(previous_cursor)
+        response['next_cursor'] = next_cursor
+        response['previous_cursor'] = previous_cursor
+        response['results'] = data
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'count': {'type': 'integer'},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'next_cursor': {'type': 'string', 'nullable': True},
+                'previous_cursor': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,298 @@
+"""
+Нечёткий поиск квартир по адресу и ориентиру через индекс триграмм.
+
+Индекс двухуровневый. Уникальные значения address и orientation (Place)
+разбиваются на слова; словарь слов (Word) небольшой, и каждое слово запроса
+сравнивается с ним по триграммам — так «мустакилик» находит «мустакиллик»,
+а «кв» — «квартал». Затем по спискам слово → значение (PlaceWord) выбираются
+значения, в которых нашлись похожие слова для большинства слов запроса.
+Триграммы строятся как в pg_trgm: слово дополняется двумя пробелами слева
+и одним справа.
+"""
+import re
+
+from django.db import connection, transaction
+from django.db.models import Count
+
+from .models import Apartment, Place, PlaceWord, Word, WordTrigram
+
+PLACE_FIELDS = ('address', 'orientation')
+
+LOOKUP_DEFAULT_LIMIT = 5
+LOOKUP_MAX_LIMIT = 10
+# Минимальное сходство значения с запросом (среднее по словам запроса)
+LOOKUP_MIN_SIMILARITY = 0.4
+# Слово словаря — кандидат, если у него есть хотя бы половина триграмм слова запроса
+WORD_MIN_COVERAGE = 0.5
+# Сколько похожих слов словаря учитывать для каждого слова запроса
+WORD_CANDIDATES = 20
+# Длинный запрос обрезается: слова после лимита не учитываются
+MAX_QUERY_WORDS = 8
+
+REBUILD_BATCH_SIZE = 2000
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+# Лучшее сходство каждого слова запроса со словами значения, сумма по словам.
+# При равном сходстве выше значение без лишних слов и с большим числом квартир.
+_MATCH_PLACES_SQL = '''
+    WITH candidates (query_word, word_id, score) AS (VALUES {values})
+    SELECT place.id, place.field, place.value, place.words_count, place.apartments_count, matched.score
+    FROM (
+        SELECT place_id, SUM(best) AS score
+        FROM (
+            SELECT place_word.place_id, candidates.query_word, MAX(candidates.score) AS best
+            FROM {place_word} AS place_word
+            JOIN candidates ON candidates.word_id = place_word.word_id
+            GROUP BY place_word.place_id, candidates.query_word
+        ) AS per_word
+        GROUP BY place_id
+        HAVING SUM(best) >= %s
+    ) AS matched
+    JOIN {place} AS place ON place.id = matched.place_id
+    ORDER BY matched.score DESC, place.words_count, place.apartments_count DESC
+    LIMIT %s
+'''
+
+
+def normalize(text: str) -> list:
+    """Слова в нижнем регистре без повторов, ё заменена на е, знаки препинания отброшены"""
+    return list(dict.fromkeys(_WORD_RE.findall(text.lower().replace('ё', 'е'))))
+
+
+def trigrams(word: str) -> set:
+    """
+    Триграммы слова: «юнусабад» → {'  ю', ' юн', 'юну', ..., 'бад', 'ад '}
+
+    Args:
+        word: Нормализованное слово
+
+    Returns:
+        Множество триграмм
+    """
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _create_words(texts) -> dict:
+    """
+    Добавляет в словарь новые слова с их триграммами
+
+    Returns:
+        Словарь {слово: id} для всех переданных слов
+    """
+    texts = set(texts)
+    word_ids = dict(Word.objects.filter(text__in=texts).values_list('text', 'id'))
+    missing = texts - word_ids.keys()
+    if missing:
+        # Параллельное сохранение могло уже добавить слово: повтор пропускается
+        Word.objects.bulk_create(
+            (Word(text=text, trigram_count=len(trigrams(text))) for text in missing),
+            ignore_conflicts=True,
+        )
+        created = dict(Word.objects.filter(text__in=missing).values_list('text', 'id'))
+        WordTrigram.objects.bulk_create(
+            (WordTrigram(word_id=word_id, trigram=trigram) for text, word_id in created.items() for trigram in trigrams(text)),
+            batch_size=REBUILD_BATCH_SIZE * 10,
+            ignore_conflicts=True,
+        )
+        word_ids.update(created)
+    return word_ids
+
+
+def _save_place(field: str, value: str, apartments_count: int):
+    """
+    Создаёт, обновляет или удаляет запись индекса для одного значения.
+    Слова удалённого значения остаются в словаре до перестройки индекса:
+    они не мешают поиску, потому что ни с чем не связаны.
+    """
+    if apartments_count == 0:
+        Place.objects.filter(field=field, value=value).delete()
+        return
+
+    words = normalize(value)
+    place, created = Place.objects.get_or_create(
+        field=field,
+        value=value,
+        defaults={'words_count': len(words), 'apartments_count': apartments_count},
+    )
+    if created:
+        word_ids = _create_words(words)
+        PlaceWord.objects.bulk_create(PlaceWord(place=place, word_id=word_ids[word]) for word in words)
+    elif place.apartments_count != apartments_count:
+        Place.objects.filter(pk=place.pk).update(apartments_count=apartments_count)
+
+
+def update_places(values):
+    """
+    Пересчитывает индекс для затронутых значений после изменения квартир
+
+    Args:
+        values: Пары (поле, значение) — старые и новые адрес и ориентир
+    """
+    with transaction.atomic():
+        for field, value in set(values):
+            if not value:
+                continue
+            _save_place(field, value, Apartment.objects.filter(**{field: value}).count())
+
+
+def rebuild_place_index():
+    """
+    Полностью перестраивает индекс по таблице квартир.
+
+    Нужен после bulk_create и queryset.update(), которые не отправляют сигналы.
+    """
+    with transaction.atomic():
+        for model in (PlaceWord, WordTrigram, Place, Word):
+            model.objects.all().delete()
+        for field in PLACE_FIELDS:
+            counts = (
+                Apartment.objects.exclude(**{field: ''})
+                .values_list(field)
+                .annotate(apartments_count=Count('id'))
+                .order_by()
+            )
+            batch = []
+            for value, apartments_count in counts.iterator():
+                batch.append(Place(field=field, value=value, apartments_count=apartments_count))
+                if len(batch) >= REBUILD_BATCH_SIZE:
+                    _create_places(batch)
+                    batch = []
+            _create_places(batch)
+
+
+def _create_places(places):
+    place_words = []
+    for place in places:
+        place_words.append(normalize(place.value))
+        place.words_count = len(place_words[-1])
+    # На SQLite и PostgreSQL bulk_create возвращает объекты с id
+    created = Place.objects.bulk_create(places)
+    word_ids = _create_words(word for words in place_words for word in words)
+    PlaceWord.objects.bulk_create(
+        (PlaceWord(place_id=place.id, word_id=word_ids[word]) for place, words in zip(created, place_words) for word in words),
+        batch_size=REBUILD_BATCH_SIZE * 10,
+    )
+
+
+def _similar_words(query_words) -> list:
+    """
+    Похожие слова словаря для каждого слова запроса
+
+    Сходство — среднее из доли триграмм слова запроса, найденных у слова
+    словаря, и доли общих триграмм среди всех триграмм обоих слов: первое
+    прощает сокращения («кв» → «квартал»), второе поднимает точные совпадения.
+    Числа сравниваются только точно: дом 7 и дом 71 — разные адреса.
+
+    Returns:
+        Список (номер слова запроса, id слова словаря, сходство)
+    """
+    numbers = {word for word in query_words if word.isdigit()}
+    number_ids = dict(Word.objects.filter(text__in=numbers).values_list('text', 'id')) if numbers else {}
+
+    query_trigrams = {index: trigrams(word) for index, word in enumerate(query_words) if word not in numbers}
+    word_trigrams = {}
+    trigram_counts = {}
+    if query_trigrams:
+        postings = (
+            WordTrigram.objects.filter(trigram__in=set().union(*query_trigrams.values()))
+            .values_list('word_id', 'trigram', 'word__trigram_count')
+        )
+        for word_id, trigram, trigram_count in postings:
+            word_trigrams.setdefault(word_id, set()).add(trigram)
+            trigram_counts[word_id] = trigram_count
+
+    candidates = []
+    for index, word in enumerate(query_words):
+        if word in numbers:
+            if word in number_ids:
+                candidates.append((index, number_ids[word], 1.0))
+            continue
+        query = query_trigrams[index]
+        scored = []
+        for word_id, found in word_trigrams.items():
+            shared = len(query & found)
+            if shared < len(query) * WORD_MIN_COVERAGE:
+                continue
+            overlap = shared / (len(query) + trigram_counts[word_id] - shared)
+            scored.append(((shared / len(query) + overlap) / 2, word_id))
+        scored.sort(reverse=True)
+        candidates.extend((index, word_id, round(score, 4)) for score, word_id in scored[:WORD_CANDIDATES])
+    return candidates
+
+
+def lookup_places(text: str, limit: int = LOOKUP_DEFAULT_LIMIT) -> list:
+    """
+    Адреса и ориентиры, похожие на запрос
+
+    «Юнусабад 4 кв» находит «Юнусабадский 4-квартал», хотя слова
+    написаны иначе или не полностью.
+
+    Args:
+        text: Запрос пользователя
+        limit: Сколько значений вернуть
+
+    Returns:
+        Список (Place, similarity) по убыванию сходства, similarity от 0 до 1
+    """
+    query_words = normalize(text)[:MAX_QUERY_WORDS]
+    if not query_words:
+        return []
+    candidates = _similar_words(query_words)
+    if not candidates:
+        return []
+
+    sql = _MATCH_PLACES_SQL.format(
+        values=', '.join(['(%s, %s, %s)'] * len(candidates)),
+        place_word=PlaceWord._meta.db_table,
+        place=Place._meta.db_table,
+    )
+    params = [value for candidate in candidates for value in candidate]
+    params += [len(query_words) * LOOKUP_MIN_SIMILARITY, limit]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    return [
+        (
+            Place(id=place_id, field=field, value=value, words_count=words_count, apartments_count=apartments_count),
+            round(score / len(query_words), 3),
+        )
+        for place_id, field, value, words_count, apartments_count, score in rows
+    ]
+
+
+def lookup_apartments(text: str, limit: int = LOOKUP_DEFAULT_LIMIT, fields=('id',)) -> list:
+    """
+    Квартиры с адресом или ориентиром, похожим на запрос
+
+    Квартиры идут в порядке сходства найденных значений, для одного
+    значения — от новых к старым.
+
+    Args:
+        text: Запрос пользователя
+        limit: Сколько квартир вернуть
+        fields: Поля квартиры для .values() (id добавляется всегда)
+
+    Returns:
+        Список словарей с полями квартиры, matched_field, matched_value и similarity
+    """
+    fields = ('id',) + tuple(field for field in fields if field != 'id')
+    results = []
+    seen = set()
+    for place, similarity in lookup_places(text, limit):
+        remaining = limit - len(results)
+        if remaining <= 0:
+            break
+        rows = (
+            Apartment.objects.filter(**{place.field: place.value})
+            .exclude(id__in=seen)
+            .order_by('-created_at')
+            .values(*fields)[:remaining]
+        )
+        for row in rows:
+            seen.add(row['id'])
+            row.update(matched_field=place.field, matched_value=place.value, similarity=similarity)
+            results.append(row)
+    return results
@@ -0,0 +1,153 @@
+"""
+Полнотекстовый поиск квартир: SQLite FTS5 по адресу, ориентиру, району и описанию
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import BaseFilterBackend
+
+FTS_TABLE = 'estate_apartment_fts'
+FTS_COLUMNS = ('address', 'orientation', 'district', 'description')
+# Вес совпадения в каждой колонке для bm25: адрес важнее слова в описании
+FTS_WEIGHTS = (10.0, 5.0, 3.0, 1.0)
+SEARCH_PARAM = 'q'
+# Сколько слов запроса учитывать: остальное отбрасывается
+MAX_QUERY_TERMS = 8
+
+_TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _normalize_sql(column: str) -> str:
+    """ё и е в индексе не различаются: unicode61 снимает диакритику только с латиницы"""
+    return f"replace(replace({column}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+def _row_values(prefix: str) -> str:
+    return ', '.join(_normalize_sql(f'{prefix}.{column}') for column in FTS_COLUMNS)
+
+
+# Индекс хранит собственную нормализованную копию текста. Триггеры SQLite
+# поддерживают его при любой записи, в том числе bulk_create и update(),
+# которые не отправляют сигналы. UPDATE других колонок индекс не трогает.
+FTS_SCHEMA_SQL = [
+    f'''
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        {', '.join(FTS_COLUMNS)},
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON estate_apartment BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, {', '.join(FTS_COLUMNS)}) VALUES (new.id, {_row_values('new')});
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON estate_apartment BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF {', '.join(FTS_COLUMNS)} ON estate_apartment BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+        INSERT INTO {FTS_TABLE} (rowid, {', '.join(FTS_COLUMNS)}) VALUES (new.id, {_row_values('new')});
+    END
+    ''',
+]
+
+FTS_DROP_SQL = [
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_au',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ad',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ai',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+
+def fts_available() -> bool:
+    """FTS5 есть только у SQLite; на других СУБД q= ищет через icontains"""
+    return connection.vendor == 'sqlite'
+
+
+def create_fts_index(cursor):
+    """Создаёт FTS-таблицу с триггерами и заполняет её текущими квартирами"""
+    for sql in FTS_SCHEMA_SQL:
+        cursor.execute(sql)
+    rebuild_fts_index(cursor)
+
+
+def rebuild_fts_index(cursor):
+    """Полностью перестраивает индекс по таблице квартир"""
+    cursor.execute(f'DELETE FROM {FTS_TABLE}')
+    cursor.execute(
+        f"INSERT INTO {FTS_TABLE} (rowid, {', '.join(FTS_COLUMNS)}) "
+        f"SELECT id, {_row_values('estate_apartment')} FROM estate_apartment"
+    )
+
+
+def drop_fts_index(cursor):
+    for sql in FTS_DROP_SQL:
+        cursor.execute(sql)
+
+
+def query_terms(text: str) -> list:
+    """Слова запроса в нижнем регистре, ё заменена на е"""
+    return [term.lower().replace('ё', 'е') for term in _TERM_RE.findall(text)][:MAX_QUERY_TERMS]
+
+
+def build_match_query(text: str) -> str:
+    """
+    Строка MATCH для FTS5: все слова обязательны, каждое ищется по префиксу.
+    Слова берутся в кавычки, поэтому операторы FTS5 из ввода пользователя
+    не интерпретируются.
+
+    Args:
+        text: Запрос пользователя
+
+    Returns:
+        Выражение MATCH или пустая строка, если слов нет
+    """
+    return ' '.join(f'"{term}"*' for term in query_terms(text))
+
+
+def search_apartments(queryset, text: str):
+    """
+    Оставляет квартиры, подходящие под запрос, и добавляет search_rank
+    (bm25: меньше — релевантнее)
+    """
+    match = build_match_query(text)
+    if not match:
+        return queryset
+    if not fts_available():
+        condition = Q()
+        for term in query_terms(text):
+            term_q = Q()
+            for column in FTS_COLUMNS:
+                term_q |= Q(**{f'{column}__icontains': term})
+            condition &= term_q
+        return queryset.filter(condition)
+
+    weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+    return queryset.extra(
+        tables=[FTS_TABLE],
+        where=[f'{FTS_TABLE}.rowid = estate_apartment.id', f'{FTS_TABLE} MATCH %s'],
+        params=[match],
+    ).annotate(search_rank=RawSQL(f'bm25({FTS_TABLE}, {weights})', []))
+
+
+class FullTextSearchFilter(BaseFilterBackend):
+    """
+    Полнотекстовый поиск по ?q=. Без явного ?ordering результаты
+    упорядочены по релевантности, при равной — по новизне.
+    Должен стоять после OrderingFilter, чтобы задать порядок по релевантности.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        text = request.query_params.get(SEARCH_PARAM, '').strip()
+        if not text:
+            return queryset
+        queryset = search_apartments(queryset, text)
+        if 'search_rank' in queryset.query.annotations and not request.query_params.get('ordering'):
+            queryset = queryset.order_by('search_rank', '-created_at')
+        return queryset
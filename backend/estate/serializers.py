@@ -1,19 +1,35 @@
+from collections import defaultdict
+
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.utils.encoding import filepath_to_uri
 from rest_framework import serializers
 from .models import Apartment, ApartmentImage
 
 
 class ApartmentImageSerializer(serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
+    # Уменьшенные копии; None, пока они не готовы
+    telegram_url = serializers.SerializerMethodField()
+    thumbnail_url = serializers.SerializerMethodField()
 
     class Meta:
         model = ApartmentImage
-        fields = ('id', 'image_url', 'order')
+        fields = ('id', 'image_url', 'telegram_url', 'thumbnail_url', 'order')
 
     def get_image_url(self, obj):
+        return self._file_url(obj.image)
+
+    def get_telegram_url(self, obj):
+        return self._file_url(obj.telegram_image)
+
+    def get_thumbnail_url(self, obj):
+        return self._file_url(obj.thumbnail)
+
+    def _file_url(self, file):
         request = self.context.get('request')
-        if obj.image and hasattr(obj.image, 'url'):
+        if file and hasattr(file, 'url'):
             try:
-                image_url = obj.image.url
+                image_url = file.url
                 if image_url:
                     # Всегда возвращаем абсолютный URL
                     if request:
@@ -50,3 +66,82 @@ class ApartmentSerializer(serializers.ModelSerializer):
         )
         read_only_fields = ('created_at', 'updated_at')
 
+
+# Поля квартиры, читаемые через .values() для быстрого списка (без images)
+APARTMENT_VALUE_FIELDS = tuple(field for field in ApartmentSerializer.Meta.fields if field != 'images')
+
+
+class _ImageUrlBuilder:
+    """
+    Абсолютные URL фото для одного запроса.
+
+    Для локального хранилища префикс http(s)://host/media/ вычисляется один раз,
+    результат совпадает с ApartmentImageSerializer.get_image_url.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.prefix = None
+        if isinstance(default_storage, FileSystemStorage):
+            self.prefix = request.build_absolute_uri(default_storage.url(''))
+
+    def __call__(self, name):
+        if not name:
+            return None
+        if self.prefix is not None:
+            return self.prefix + filepath_to_uri(name).lstrip('/')
+        return self.request.build_absolute_uri(default_storage.url(name))
+
+
+def serialize_apartment_rows(rows, request):
+    """
+    Быстрая сериализация списка квартир из .values()
+
+    Фото загружаются одним запросом и группируются в Python, поля
+    с форматированием (даты) проходят через те же поля DRF, поэтому
+    JSON совпадает с ApartmentSerializer(many=True) байт в байт.
+
+    Args:
+        rows: Словари квартир с полями APARTMENT_VALUE_FIELDS
+        request: Текущий запрос (для абсолютных URL фото)
+
+    Returns:
+        Список словарей в формате ApartmentSerializer
+    """
+    rows = list(rows)
+    if not rows:
+        return []
+
+    image_url = _ImageUrlBuilder(request)
+    images = defaultdict(list)
+    image_rows = (
+        ApartmentImage.objects
+        .filter(apartment_id__in=[row['id'] for row in rows])
+        .order_by('order', 'id')
+        .values_list('apartment_id', 'id', 'image', 'telegram_image', 'thumbnail', 'order')
+    )
+    for apartment_id, image_id, name, telegram_name, thumbnail_name, order in image_rows:
+        images[apartment_id].append({
+            'id': image_id,
+            'image_url': image_url(name),
+            'telegram_url': image_url(telegram_name),
+            'thumbnail_url': image_url(thumbnail_name),
+            'order': order,
+        })
+
+    serializer_fields = ApartmentSerializer().fields
+    created_at_field = serializer_fields['created_at']
+    updated_at_field = serializer_fields['updated_at']
+
+    data = []
+    for row in rows:
+        item = {}
+        for field in ApartmentSerializer.Meta.fields:
+            if field == 'images':
+                item['images'] = images.get(row['id'], [])
+            else:
+                item[field] = row[field]
+        item['created_at'] = created_at_field.to_representation(row['created_at'])
+        item['updated_at'] = updated_at_field.to_representation(row['updated_at'])
+        data.append(item)
+    return data
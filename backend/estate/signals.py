@@ -0,0 +1,138 @@
+import json
+import threading
+import urllib.request
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .image_pipeline import VARIANT_FIELDS, delete_variant_files, schedule_variants
+from .models import Apartment, ApartmentImage
+from .places import PLACE_FIELDS, update_places
+
+
+def _post_event(payload: dict):
+    """Отправляет событие боту; ошибки не мешают сохранению в админке"""
+    request = urllib.request.Request(
+        settings.BOT_NOTIFY_URL,
+        data=json.dumps(payload).encode('utf-8'),
+        headers={
+            'Content-Type': 'application/json',
+            'X-Notify-Secret': settings.BOT_NOTIFY_SECRET,
+        },
+        method='POST',
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=settings.BOT_NOTIFY_TIMEOUT):
+            pass
+    except Exception as e:
+        # Бот подхватит квартиру при плановой сверке по ленте /changes/
+        print(f"[NOTIFY] Не удалось уведомить бота о квартире {payload.get('apartment_id')}: {e}")
+
+
+def notify_bot(apartment_id: int):
+    """Будит систему уведомлений бота, не блокируя запрос"""
+    if not settings.BOT_NOTIFY_URL:
+        return
+    threading.Thread(
+        target=_post_event,
+        args=({'event': 'apartment_created', 'apartment_id': apartment_id},),
+        daemon=True,
+    ).start()
+
+
+@receiver(post_save, sender=Apartment)
+def apartment_created(sender, instance, created, **kwargs):
+    """
+    Сообщает боту о новой квартире после фиксации транзакции.
+    В админке save_model добавляет фотографии уже после post_save, поэтому
+    событие уходит только по on_commit, когда квартира сохранена вместе с фото.
+    """
+    if created:
+        apartment_id = instance.id
+        transaction.on_commit(lambda: notify_bot(apartment_id))
+
+
+@receiver(pre_save, sender=Apartment)
+def remember_apartment_places(sender, instance, **kwargs):
+    """Запоминает прежние адрес и ориентир: после сохранения их уже не прочитать"""
+    instance._previous_places = ()
+    if instance.pk:
+        previous = Apartment.objects.filter(pk=instance.pk).values_list(*PLACE_FIELDS).first()
+        if previous:
+            instance._previous_places = tuple(zip(PLACE_FIELDS, previous))
+
+
+@receiver(post_save, sender=Apartment)
+@receiver(post_delete, sender=Apartment)
+def apartment_places_changed(sender, instance, **kwargs):
+    """
+    Обновляет индекс триграмм для старых и новых адреса и ориентира
+    в той же транзакции, что и сохранение квартиры
+    """
+    current = tuple((field, getattr(instance, field)) for field in PLACE_FIELDS)
+    previous = getattr(instance, '_previous_places', ())
+    if kwargs.get('created') is False and previous == current:
+        # Адрес и ориентир не менялись: количество квартир у них прежнее
+        return
+    update_places(current + previous)
+
+
+@receiver(post_save, sender=ApartmentImage)
+@receiver(post_delete, sender=ApartmentImage)
+def apartment_image_changed(sender, instance, **kwargs):
+    """
+    Фото входят в ответ API, поэтому их изменение обновляет updated_at
+    квартиры: от него зависят версия каталога, ETag/Last-Modified и кэши бота
+    """
+    Apartment.objects.filter(pk=instance.apartment_id).update(updated_at=timezone.now())
+
+
+def _stored_variants(instance) -> dict:
+    """Имена файлов копий из БД: у экземпляра в памяти они могут быть устаревшими"""
+    row = ApartmentImage.objects.filter(pk=instance.pk).values('image', *VARIANT_FIELDS).first()
+    return row or {}
+
+
+@receiver(pre_save, sender=ApartmentImage)
+def remember_image_source(sender, instance, **kwargs):
+    """Запоминает прежний файл фото и его копии, чтобы заметить замену в админке"""
+    instance._previous_image = None
+    instance._previous_variants = {}
+    if instance.pk:
+        stored = _stored_variants(instance)
+        instance._previous_image = stored.pop('image', None)
+        instance._previous_variants = stored
+
+
+@receiver(post_save, sender=ApartmentImage)
+def apartment_image_saved(sender, instance, created, **kwargs):
+    """
+    Ставит в очередь подготовку копий для Telegram для нового или
+    заменённого фото. Копии старого файла сразу перестают отдаваться,
+    а их файлы удаляются после фиксации транзакции.
+    """
+    if not created:
+        if getattr(instance, '_previous_image', None) == instance.image.name:
+            return
+        instance.telegram_image = instance.thumbnail = ''
+        ApartmentImage.objects.filter(pk=instance.pk).update(telegram_image='', thumbnail='')
+        delete_variant_files(getattr(instance, '_previous_variants', {}))
+    if instance.image:
+        schedule_variants(instance.pk, instance.image.name)
+
+
+@receiver(pre_delete, sender=ApartmentImage)
+def remember_image_variants(sender, instance, **kwargs):
+    """Запоминает копии удаляемого фото: после удаления строки их не прочитать"""
+    stored = _stored_variants(instance)
+    stored.pop('image', None)
+    instance._previous_variants = stored
+
+
+@receiver(post_delete, sender=ApartmentImage)
+def delete_image_variants(sender, instance, **kwargs):
+    """Удаляет файлы копий удалённого фото"""
+    delete_variant_files(getattr(instance, '_previous_variants', {}))
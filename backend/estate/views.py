@@ -1,17 +1,83 @@
-from django.db.models import Q
+import hashlib
+
+from django.db.models import Max, Q
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 from rest_framework import viewsets, filters
+from rest_framework.decorators import action
+from rest_framework.response import Response
 from .models import Apartment
-from .serializers import ApartmentSerializer
+from .counts import cached_count, get_catalog_version
+from .facets import cached_facets
+from .pagination import ApartmentCursorPagination, ApartmentPageNumberPagination
+from .places import LOOKUP_DEFAULT_LIMIT, LOOKUP_MAX_LIMIT, lookup_apartments
+from .search import FullTextSearchFilter
+from .serializers import APARTMENT_VALUE_FIELDS, ApartmentSerializer, serialize_apartment_rows
+
+CHANGES_DEFAULT_LIMIT = 50
+CHANGES_MAX_LIMIT = 200
+BATCH_MAX_IDS = 100
+# Поля квартиры в ответе нечёткого поиска: достаточно для кнопки выбора
+LOOKUP_FIELDS = ('id', 'type', 'district', 'rooms', 'area', 'price', 'address', 'orientation')
+
+
+def _make_etag(*parts) -> str:
+    """Сильный ETag из частей, определяющих содержимое ответа"""
+    raw = '|'.join(str(part) for part in parts)
+    return quote_etag(hashlib.sha1(raw.encode('utf-8')).hexdigest())
+
+
+def _request_signature(request) -> str:
+    """
+    Всё, кроме данных, от чего зависит тело ответа: параметры запроса
+    (включая страницу), хост для абсолютных URL фото и формат ответа
+    """
+    params = sorted((key, sorted(request.query_params.getlist(key))) for key in request.query_params.keys())
+    return f"{request.get_host()}|{request.accepted_renderer.format}|{params}"
+
+
+def _conditional_response(request, etag, last_modified):
+    """304 Not Modified, если у клиента актуальная версия, иначе None"""
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is not None:
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(timestamp)
+    return response
+
+
+def _set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(int(last_modified.timestamp()))
+    return response
 
 
 class ApartmentViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Apartment.objects.prefetch_related('images').all()
     serializer_class = ApartmentSerializer
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    pagination_class = ApartmentPageNumberPagination
+    # q= — полнотекстовый поиск FTS5 с ранжированием, search= — прежний поиск через LIKE
+    filter_backends = [filters.SearchFilter, filters.OrderingFilter, FullTextSearchFilter]
     search_fields = ['address', 'district', 'description']
     ordering_fields = ['price', 'area', 'created_at']
     ordering = ['-created_at']
 
+    @property
+    def paginator(self):
+        """
+        Пагинатор списка: по умолчанию номера страниц, с ?pagination=cursor —
+        keyset-курсоры по (created_at, id). В режиме курсоров параметр ordering
+        не применяется: порядок задаёт курсор.
+        """
+        if not hasattr(self, '_paginator'):
+            if self.request is not None and self.request.query_params.get('pagination') == 'cursor':
+                self._paginator = ApartmentCursorPagination()
+            else:
+                self._paginator = self.pagination_class() if self.pagination_class is not None else None
+        return self._paginator
+
     def get_queryset(self):
         queryset = super().get_queryset()
         
@@ -98,3 +164,142 @@ class ApartmentViewSet(viewsets.ReadOnlyModelViewSet):
                 queryset = queryset.filter(price__lte=int(price_lte))
         
         return queryset
+
+    def list(self, request, *args, **kwargs):
+        """
+        Список с условным GET: ETag — версия каталога (последний updated_at,
+        число квартир, счётчик изменений) и параметры запроса. Версия читается
+        одной выборкой по первичному ключу, без COUNT по фильтрам; при
+        совпадении If-None-Match отвечаем 304 без выборки и сериализации.
+        """
+        version = get_catalog_version()
+        last_modified = version.last_modified
+        etag = _make_etag('list', version, _request_signature(request))
+        not_modified = _conditional_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        queryset = self.filter_queryset(self.get_queryset())
+
+        # Быстрый путь: строки через .values(), фото одним запросом
+        rows = queryset.prefetch_related(None).values(*APARTMENT_VALUE_FIELDS)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            response = self.get_paginated_response(serialize_apartment_rows(page, request))
+        else:
+            response = Response(serialize_apartment_rows(rows, request))
+        return _set_validators(response, etag, last_modified)
+
+    def retrieve(self, request, *args, **kwargs):
+        """Карточка квартиры с условным GET по updated_at"""
+        try:
+            last_modified = (
+                Apartment.objects.filter(pk=kwargs.get(self.lookup_field))
+                .values_list('updated_at', flat=True)
+                .first()
+            )
+        except (TypeError, ValueError):
+            last_modified = None
+        if last_modified is None:
+            # Нет такой квартиры (или некорректный id) — стандартная обработка
+            return super().retrieve(request, *args, **kwargs)
+
+        etag = _make_etag('detail', kwargs.get(self.lookup_field), last_modified.isoformat(), _request_signature(request))
+        not_modified = _conditional_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+        return _set_validators(super().retrieve(request, *args, **kwargs), etag, last_modified)
+
+    @action(detail=False, methods=['get'])
+    def count(self, request):
+        """Количество квартир по фильтрам (те же параметры, что у списка), из кэша"""
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response({'count': cached_count(queryset, request)})
+
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """
+        Количество квартир по каждому варианту фильтров (тип, район, ремонт,
+        комнаты, диапазоны площади и цены) в пределах переданных фильтров
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(cached_facets(queryset, request))
+
+    @action(detail=False, methods=['get'])
+    def batch(self, request):
+        """
+        Несколько квартир по списку id за один запрос: ?ids=1,2,3.
+
+        Квартиры возвращаются в порядке переданных id; несуществующие id
+        перечисляются в missing.
+        """
+        raw_ids = ','.join(request.query_params.getlist('ids'))
+        try:
+            ids = [int(value) for value in raw_ids.split(',') if value.strip()]
+        except ValueError:
+            return Response({'detail': 'ids должны быть числами через запятую'}, status=400)
+        # Повторы не нужны, порядок сохраняем
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return Response({'detail': 'Передайте ids'}, status=400)
+        if len(ids) > BATCH_MAX_IDS:
+            return Response({'detail': f'Не больше {BATCH_MAX_IDS} id за запрос'}, status=400)
+
+        rows = Apartment.objects.filter(id__in=ids).values(*APARTMENT_VALUE_FIELDS)
+        by_id = {item['id']: item for item in serialize_apartment_rows(rows, request)}
+        return Response({
+            'results': [by_id[pk] for pk in ids if pk in by_id],
+            'missing': [pk for pk in ids if pk not in by_id],
+        })
+
+    @action(detail=False, methods=['get'])
+    def lookup(self, request):
+        """
+        Нечёткий поиск по адресу и ориентиру: ?q=юнусабад 4 кв&limit=5.
+
+        Запрос сравнивается по триграммам с уникальными адресами и ориентирами,
+        поэтому находит значения, написанные иначе или не полностью.
+        Квартиры идут по убыванию сходства (similarity от 0 до 1).
+        """
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            return Response({'detail': 'Передайте q'}, status=400)
+        try:
+            limit = int(request.query_params.get('limit', LOOKUP_DEFAULT_LIMIT))
+        except ValueError:
+            return Response({'detail': 'limit должен быть числом'}, status=400)
+        limit = max(1, min(limit, LOOKUP_MAX_LIMIT))
+        return Response({'results': lookup_apartments(text, limit, LOOKUP_FIELDS)})
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """
+        Лента новых квартир для уведомлений: квартиры с id > since_id по возрастанию id.
+
+        Без since_id возвращает пустой список и текущий максимальный id,
+        чтобы клиент мог начать отслеживание "с текущего момента".
+        """
+        since_id = request.query_params.get('since_id')
+        if since_id in (None, ''):
+            max_id = Apartment.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+            return Response({'results': [], 'next_cursor': max_id, 'has_more': False})
+
+        try:
+            since_id = int(since_id)
+            limit = int(request.query_params.get('limit', CHANGES_DEFAULT_LIMIT))
+        except ValueError:
+            return Response({'detail': 'since_id и limit должны быть числами'}, status=400)
+        limit = max(1, min(limit, CHANGES_MAX_LIMIT))
+
+        # Берём на одну запись больше, чтобы узнать, есть ли продолжение
+        apartments = list(
+            Apartment.objects.prefetch_related('images')
+            .filter(id__gt=since_id)
+            .order_by('id')[:limit + 1]
+        )
+        has_more = len(apartments) > limit
+        apartments = apartments[:limit]
+        next_cursor = apartments[-1].id if apartments else since_id
+
+        serializer = self.get_serializer(apartments, many=True)
+        return Response({'results': serializer.data, 'next_cursor': next_cursor, 'has_more': has_more})
@@ -0,0 +1,96 @@
+"""
+Замер FSM-хранилищ: MemoryStorage против SQLiteStorage.
+
+Каждый "апдейт" повторяет работу обработчика шага поиска: get_state,
+get_data и update_data с выбранными вариантами. Проверяется также, что
+после закрытия и повторного открытия SQLiteStorage данные на месте.
+
+Запуск из корня проекта:
+    python bot/benchmarks/fsm_storage.py --users 2000 --updates 50000
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from aiogram.fsm.storage.base import StorageKey  # noqa: E402
+from aiogram.fsm.storage.memory import MemoryStorage  # noqa: E402
+
+from services.fsm_storage import SQLiteStorage  # noqa: E402
+
+BOT_ID = 1
+DISTRICTS = ['Мирабадский', 'Мирзо-Улугбекский', 'Юнусабадский', 'Шайхантохурский', 'Яккасарайский', 'Яшнабадский']
+
+
+def make_updates(users: int, updates: int, seed: int = 42):
+    rng = random.Random(seed)
+    return [
+        (StorageKey(bot_id=BOT_ID, chat_id=user_id, user_id=user_id), rng.sample(DISTRICTS, rng.randint(0, 3)))
+        for user_id in (rng.randint(1, users) for _ in range(updates))
+    ]
+
+
+async def run(storage, updates):
+    """Возвращает задержки одного апдейта в микросекундах"""
+    latencies = []
+    for key, districts in updates:
+        started = time.perf_counter()
+        await storage.get_state(key)
+        data = await storage.get_data(key)
+        await storage.update_data(key, {'district': districts, 'district_any': not districts, 'type': data.get('type', [])})
+        await storage.set_state(key, 'ApartmentSearchStates:choosing_district')
+        latencies.append((time.perf_counter() - started) * 1e6)
+        # Даём отработать фоновому сбросу, как между апдейтами в реальном боте
+        if len(latencies) % 1000 == 0:
+            await asyncio.sleep(0)
+    return latencies
+
+
+def report(name: str, latencies):
+    latencies = sorted(latencies)
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(
+        f"{name}: p50 {statistics.median(latencies):.1f} мкс, p99 {p99:.1f} мкс, "
+        f"max {latencies[-1]:.1f} мкс, {len(latencies) / (sum(latencies) / 1e6):,.0f} апдейтов/с"
+    )
+
+
+async def main_async(args):
+    updates = make_updates(args.users, args.updates)
+
+    report('MemoryStorage', await run(MemoryStorage(), updates))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'fsm.db'
+        storage = SQLiteStorage(path)
+        latencies = await run(storage, updates)
+        await storage.close()
+        report('SQLiteStorage', latencies)
+        print(f"  сбросов на диск: {storage.flushes}, записано строк: {storage.flushed_rows}")
+
+        # Холодный старт: первое обращение к ключу читает SQLite
+        reopened = SQLiteStorage(path)
+        key, districts = updates[-1]
+        started = time.perf_counter()
+        data = await reopened.get_data(key)
+        cold = (time.perf_counter() - started) * 1e6
+        status = 'совпадает' if data.get('district') == districts else 'НЕ СОВПАДАЕТ'
+        print(f"  после перезапуска: district={data.get('district')} {status} (чтение с диска {cold:.0f} мкс)")
+        await reopened.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--updates', type=int, default=50_000)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
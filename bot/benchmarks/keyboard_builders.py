@@ -0,0 +1,79 @@
+"""
+Замер построения клавиатур поиска: без кэша и с кэшем.
+
+Состояния берутся из типичного прохода по шагам поиска: пользователи
+отмечают и снимают варианты, счётчики фасетов меняются редко.
+
+Запуск из корня проекта:
+    python bot/benchmarks/keyboard_builders.py --calls 50000
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from keyboards import inline  # noqa: E402
+
+BUILDERS = {
+    'type': (inline.get_type_keyboard, ['Новостройка', 'Вторичное жильё']),
+    'district': (inline.get_district_keyboard, [
+        'Мирабадский', 'Мирзо-Улугбекский', 'Юнусабадский',
+        'Шайхантохурский', 'Яккасарайский', 'Яшнабадский',
+    ]),
+    'condition': (inline.get_condition_keyboard, ['С ремонтом', 'Без ремонта', 'Среднее состояние']),
+    'area': (inline.get_area_keyboard, ['0:40', '40:66', '67:85', '85:105', '105:130']),
+    'rooms': (inline.get_rooms_keyboard, [1, 2, 3, 4, 5]),
+    'price': (inline.get_price_keyboard, ['0:70000', '70000:100000', '100000:150000']),
+}
+
+
+def make_calls(count: int, seed: int = 42):
+    """Случайные, но повторяющиеся состояния клавиатур (как при нажатии кнопок)"""
+    rng = random.Random(seed)
+    # Счётчики фасетов кэшируются на backend и в боте, поэтому в пределах TTL одинаковы
+    counts = {
+        step: {str(option): rng.randint(0, 500) for option in options}
+        for step, (_, options) in BUILDERS.items()
+    }
+    calls = []
+    for _ in range(count):
+        step = rng.choice(list(BUILDERS))
+        builder, options = BUILDERS[step]
+        selected = rng.sample(options, rng.randint(0, 2))
+        any_selected = not selected and rng.random() < 0.3
+        calls.append((builder, selected, any_selected, counts[step]))
+    return calls
+
+
+def run(calls, cached: bool) -> float:
+    started = time.perf_counter()
+    for builder, selected, any_selected, counts in calls:
+        if cached:
+            builder(selected, any_selected, counts)
+        else:
+            builder.__wrapped__(selected, any_selected, counts)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=50_000)
+    args = parser.parse_args()
+
+    calls = make_calls(args.calls)
+    inline._keyboard_cache.clear()
+
+    uncached = run(calls, cached=False)
+    cached = run(calls, cached=True)
+
+    print(f"Вызовов: {args.calls}, различных клавиатур: {len(inline._keyboard_cache)}")
+    print(f"Без кэша: {args.calls / uncached:,.0f} клавиатур/с ({uncached * 1e6 / args.calls:.1f} мкс на вызов)")
+    print(f"С кэшем:  {args.calls / cached:,.0f} клавиатур/с ({cached * 1e6 / args.calls:.1f} мкс на вызов)")
+    print(f"Ускорение: x{uncached / cached:.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Замер рассылки уведомлений на локальном фейковом боте.
+
+Запуск из корня проекта:
+    python bot/benchmarks/notification_dispatch.py --subscribers 2000
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from collections import deque
+from functools import partial
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from aiogram.exceptions import TelegramRetryAfter  # noqa: E402
+
+from services.dispatcher import DeliveryJob, NotificationDispatcher  # noqa: E402
+
+
+class FakeBot:
+    """
+    Имитация Bot API: задержка сети и flood control как у Telegram.
+    Превышение 30 сообщений/с или 1 отправления/с в чат — нарушение и RetryAfter.
+    """
+
+    def __init__(self, latency: float = 0.05, global_limit: int = 30, chat_interval: float = 1.0):
+        self.latency = latency
+        self.global_limit = global_limit
+        self.chat_interval = chat_interval
+        self.violations = 0
+        self.messages = 0
+        self._window = deque()
+        self._chat_last = {}
+
+    def _check_limits(self, chat_id: int, cost: int):
+        now = time.monotonic()
+        while self._window and now - self._window[0] >= 1.0:
+            self._window.popleft()
+        last = self._chat_last.get(chat_id)
+        # Небольшой допуск на погрешность таймеров event loop
+        if len(self._window) + cost > self.global_limit or (
+            last is not None and now - last < self.chat_interval * 0.95
+        ):
+            self.violations += 1
+            raise TelegramRetryAfter(method=None, message="Too Many Requests", retry_after=1)
+        self._window.extend([now] * cost)
+        self._chat_last[chat_id] = now
+        self.messages += cost
+
+    async def _send(self, chat_id: int, cost: int):
+        await asyncio.sleep(self.latency * random.uniform(0.5, 1.5))
+        self._check_limits(chat_id, cost)
+
+    async def send_message(self, chat_id: int, **kwargs):
+        await self._send(chat_id, 1)
+
+    async def send_photo(self, chat_id: int, **kwargs):
+        await self._send(chat_id, 1)
+
+    async def send_media_group(self, chat_id: int, media, **kwargs):
+        await self._send(chat_id, len(media))
+
+
+def make_jobs(bot: FakeBot, subscribers: int, apartments: int):
+    jobs = []
+    for apartment_id in range(apartments):
+        photos = random.choice([0, 1, 3, 5])
+        for user_id in random.sample(range(subscribers), subscribers // 2):
+            if photos >= 2:
+                send = partial(bot.send_media_group, chat_id=user_id, media=[None] * photos)
+            else:
+                send = partial(bot.send_message, chat_id=user_id)
+            cost = photos if photos >= 2 else 1
+            jobs.append(DeliveryJob(
+                chat_id=user_id,
+                send=send,
+                cost=cost,
+                label=f"user={user_id} apartment={apartment_id}",
+            ))
+    return jobs
+
+
+async def run(subscribers: int, apartments: int, workers: int):
+    bot = FakeBot()
+    jobs = make_jobs(bot, subscribers, apartments)
+    dispatcher = NotificationDispatcher(workers=workers)
+    print(f"Отправлений: {len(jobs)}, воркеров: {workers}")
+    stats = await dispatcher.dispatch(jobs)
+    print(f"Время: {stats.duration:.1f} с")
+    print(f"Сообщений Telegram: {bot.messages}, пропускная способность: {stats.throughput:.1f} msg/s")
+    print(f"p95 задержка доставки: {stats.p95_lag:.2f} с")
+    print(f"Нарушений flood control: {bot.violations} (RetryAfter обработано: {stats.flood_waits})")
+    print(f"Итого: {stats}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--subscribers', type=int, default=400)
+    parser.add_argument('--apartments', type=int, default=2)
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+    asyncio.run(run(args.subscribers, args.apartments, args.workers))
+
+
+if __name__ == '__main__':
+    main()
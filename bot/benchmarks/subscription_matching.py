@@ -0,0 +1,229 @@
+"""
+Замер подбора подписчиков: разбор JSON всех подписок против запроса по индексу.
+
+Старый путь читает все подписки, делает json.loads и проверяет каждую через
+apartment_matches_filters. Новый — iter_matching_subscribers: кандидаты берутся
+из subscription_match по району квартиры, остальные фильтры проверяются только
+у них. Результаты обоих путей сверяются. Для каждого числа подписок выводится
+доля кандидатов: запрос читает только их, а не все активные подписки. Она
+зависит от того, как часто подписчики выбирают "Не важно" (--any-share).
+
+Подписки записываются одной транзакцией через add_subscriptions_many; с --from-json
+они сохраняются в старом виде (только JSON) и переносятся миграцией init_db.
+
+Запуск из корня проекта:
+    python bot/benchmarks/subscription_matching.py --subscriptions 10000 50000 200000 --apartments 20
+    python bot/benchmarks/subscription_matching.py --subscriptions 200000 --any-share 0.05
+    python bot/benchmarks/subscription_matching.py --subscriptions 50000 --from-json
+"""
+import argparse
+import json
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from services import database  # noqa: E402
+
+TYPES = list(database.SUBSCRIPTION_MASK_VALUES['type'])
+DISTRICTS = list(database.SUBSCRIPTION_MASK_VALUES['district'])
+# Районы вне словаря масок: подбор находит их по точному значению в subscription_match
+DISTRICTS += ['Чиланзарский', 'Сергелийский']
+CONDITIONS = list(database.SUBSCRIPTION_MASK_VALUES['condition'])
+AREA_RANGES = ['0:40', '40:60', '60:80', '80:100', '100:']
+PRICE_RANGES = ['0:30000', '30000:50000', '50000:70000', '70000:100000', '100000:']
+
+
+def make_filters(rng: random.Random, any_share: float) -> dict:
+    """Случайные фильтры: "Не важно" с вероятностью any_share, иначе одно-два значения"""
+    filters = {}
+    for key, values in (('type', TYPES), ('district', DISTRICTS), ('condition', CONDITIONS), ('rooms', [1, 2, 3, 4, 5])):
+        filters[key] = [] if rng.random() < any_share else rng.sample(values, rng.randint(1, 2))
+        filters[f'{key}_any'] = not filters[key]
+    for key, any_key, values in (('area_ranges', 'area_any', AREA_RANGES), ('price_ranges', 'price_any', PRICE_RANGES)):
+        filters[key] = [] if rng.random() < any_share else rng.sample(values, rng.randint(1, 2))
+        filters[any_key] = not filters[key]
+    return filters
+
+
+def make_apartment(rng: random.Random, apartment_id: int) -> dict:
+    return {
+        'id': apartment_id,
+        'type': rng.choice(TYPES),
+        'district': rng.choice(DISTRICTS),
+        'condition': rng.choice(CONDITIONS),
+        'rooms': rng.randint(1, 5),
+        'area': round(rng.uniform(25, 160), 1),
+        'price': rng.randint(20, 200) * 1000,
+    }
+
+
+def seed_legacy_db(path: Path, subscriptions):
+    """Схема до переноса фильтров в колонки: только JSON"""
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE subscriptions (
+            user_id INTEGER PRIMARY KEY,
+            filters TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            is_active INTEGER NOT NULL DEFAULT 1
+        )
+    ''')
+    conn.executemany(
+        'INSERT INTO subscriptions (user_id, filters) VALUES (?, ?)',
+        [(user_id, json.dumps(filters)) for user_id, filters in subscriptions]
+    )
+    conn.commit()
+    conn.close()
+
+
+def apartment_matches_filters(apartment: dict, filters: dict) -> bool:
+    """
+    Проверяет, соответствует ли квартира фильтрам подписки
+
+    Args:
+        apartment: Данные квартиры
+        filters: Фильтры подписки
+
+    Returns:
+        True если квартира соответствует фильтрам
+    """
+    # Проверяем тип жилья
+    if filters.get('type') and not filters.get('type_any'):
+        if apartment['type'] not in filters['type']:
+            return False
+
+    # Проверяем район
+    if filters.get('district') and not filters.get('district_any'):
+        if apartment['district'] not in filters['district']:
+            return False
+
+    # Проверяем состояние
+    if filters.get('condition') and not filters.get('condition_any'):
+        if apartment['condition'] not in filters['condition']:
+            return False
+
+    # Проверяем количество комнат
+    if filters.get('rooms') and not filters.get('rooms_any'):
+        if apartment['rooms'] not in filters['rooms']:
+            return False
+
+    # Проверяем площадь
+    if filters.get('area_ranges') and not filters.get('area_any'):
+        area = apartment['area']
+        matches_area = False
+        for area_range in filters['area_ranges']:
+            parts = area_range.split(':')
+            min_area = float(parts[0]) if parts[0] else 0
+            max_area = float(parts[1]) if len(parts) > 1 and parts[1] else float('inf')
+            if min_area <= area <= max_area:
+                matches_area = True
+                break
+        if not matches_area:
+            return False
+
+    # Проверяем цену
+    if filters.get('price_ranges') and not filters.get('price_any'):
+        price = apartment['price']
+        matches_price = False
+        for price_range in filters['price_ranges']:
+            parts = price_range.split(':')
+            min_price = int(float(parts[0])) if parts[0] else 0
+            max_price = int(float(parts[1])) if len(parts) > 1 and parts[1] else float('inf')
+            if min_price <= price <= max_price:
+                matches_price = True
+                break
+        if not matches_price:
+            return False
+
+    return True
+
+
+def match_json(apartment: dict):
+    return sorted(
+        subscription['user_id'] for subscription in database.get_all_subscriptions()
+        if apartment_matches_filters(apartment, subscription['filters'])
+    )
+
+
+def count_candidates(apartment: dict) -> int:
+    """Сколько подписок читает запрос: с районом квартиры или «Не важно»"""
+    row = database.get_connection().execute(
+        'SELECT count(*) FROM subscription_match WHERE district IN (?, ?)',
+        (apartment['district'], database.SUBSCRIPTION_ANY_DISTRICT)
+    ).fetchone()
+    return row[0]
+
+
+def print_query_plan(apartment: dict):
+    rows = database.get_connection().execute(
+        'EXPLAIN QUERY PLAN SELECT s.user_id ' + database._MATCHING_SUBSCRIBERS_SQL,
+        database._matching_params(apartment)
+    ).fetchall()
+    print("План запроса:")
+    for row in rows:
+        print(f"  {row[3]}")
+
+
+def run(count: int, apartments: list, any_share: float, from_json: bool, show_plan: bool):
+    rng = random.Random(count)
+    subscriptions = [(user_id, make_filters(rng, any_share)) for user_id in range(1, count + 1)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = Path(tmp) / 'bot.db'
+        if from_json:
+            seed_legacy_db(database.DB_PATH, subscriptions)
+            started = time.perf_counter()
+            database.init_db()
+            print(f"Миграция {count} подписок: {time.perf_counter() - started:.2f} с")
+        else:
+            database.init_db()
+            started = time.perf_counter()
+            database.add_subscriptions_many(subscriptions)
+            print(f"Запись {count} подписок одной транзакцией: {time.perf_counter() - started:.2f} с")
+
+        if show_plan:
+            print_query_plan(apartments[0])
+
+        started = time.perf_counter()
+        expected = [match_json(apartment) for apartment in apartments]
+        json_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        actual = [list(database.iter_matching_subscribers(apartment)) for apartment in apartments]
+        sql_time = time.perf_counter() - started
+
+        candidates = sum(count_candidates(apartment) for apartment in apartments)
+        database.close_connection()
+
+    if actual != expected:
+        mismatched = sum(1 for a, e in zip(actual, expected) if a != e)
+        raise SystemExit(f"Результаты расходятся для {mismatched} квартир")
+
+    matches = sum(len(user_ids) for user_ids in expected)
+    print(f"  JSON + apartment_matches_filters: {json_time / len(apartments) * 1000:.2f} мс на квартиру")
+    print(f"  Запрос по индексу: {sql_time / len(apartments) * 1000:.2f} мс на квартиру (x{json_time / sql_time:.1f})")
+    print(f"  Прочитано кандидатов: {candidates / len(apartments) / count:.0%} подписок, "
+          f"совпадений: {matches / len(apartments) / count:.1%}, результаты идентичны")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--subscriptions', type=int, nargs='+', default=[10_000, 50_000])
+    parser.add_argument('--apartments', type=int, default=20)
+    parser.add_argument('--any-share', type=float, default=1 / 3, help='Доля фильтров со значением "Не важно"')
+    parser.add_argument('--from-json', action='store_true', help='Замерить перенос подписок из JSON в колонки')
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    apartments = [make_apartment(rng, apartment_id) for apartment_id in range(1, args.apartments + 1)]
+    for index, count in enumerate(args.subscriptions):
+        run(count, apartments, args.any_share, args.from_json, show_plan=index == 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Отправка записанных апдейтов Telegram в webhook бота.
+
+Позволяет проверить режим BOT_MODE=webhook локально, без Telegram: скрипт
+POST-ит JSON апдейтов (файлы с объектом Update или списком таких объектов)
+на адрес бота и печатает коды ответов и время подтверждения. Без файлов
+отправляется встроенный апдейт с командой /start.
+
+Запуск из корня проекта (бот запущен с BOT_MODE=webhook):
+    python bot/benchmarks/webhook_post.py --secret change-me --repeat 2000 --concurrency 50
+    python bot/benchmarks/webhook_post.py recorded_updates.json
+"""
+import argparse
+import asyncio
+import copy
+import json
+import statistics
+import time
+from collections import Counter
+
+import aiohttp
+
+DEFAULT_URL = 'http://127.0.0.1:8080/telegram/webhook'
+SAMPLE_UPDATE = {
+    'update_id': 1,
+    'message': {
+        'message_id': 1,
+        'date': 1700000000,
+        'chat': {'id': 100000001, 'type': 'private', 'first_name': 'Test'},
+        'from': {'id': 100000001, 'is_bot': False, 'first_name': 'Test'},
+        'text': '/start',
+        'entities': [{'type': 'bot_command', 'offset': 0, 'length': 6}],
+    },
+}
+
+
+def load_updates(paths):
+    if not paths:
+        return [SAMPLE_UPDATE]
+    updates = []
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        updates.extend(data if isinstance(data, list) else [data])
+    return updates
+
+
+async def main_async(args):
+    templates = load_updates(args.files)
+    headers = {'X-Telegram-Bot-Api-Secret-Token': args.secret} if args.secret else {}
+    statuses = Counter()
+    latencies = []
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def post(session, update_id, template):
+        update = copy.deepcopy(template)
+        update['update_id'] = update_id
+        async with semaphore:
+            started = time.perf_counter()
+            async with session.post(args.url, json=update, headers=headers) as response:
+                await response.read()
+                latencies.append((time.perf_counter() - started) * 1000)
+                statuses[response.status] += 1
+
+    started = time.perf_counter()
+    async with aiohttp.ClientSession() as session:
+        await asyncio.gather(*(
+            post(session, update_id, templates[update_id % len(templates)])
+            for update_id in range(1, args.repeat * len(templates) + 1)
+        ))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p99 = latencies[max(int(len(latencies) * 0.99) - 1, 0)]
+    print(f"Отправлено {len(latencies)} апдейтов за {elapsed:.2f} с ({len(latencies) / elapsed:,.0f} в секунду)")
+    print(f"Ответы: {dict(sorted(statuses.items()))}")
+    print(f"Подтверждение: p50 {statistics.median(latencies):.1f} мс, p99 {p99:.1f} мс")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='*', help='JSON-файлы с записанными апдейтами')
+    parser.add_argument('--url', default=DEFAULT_URL)
+    parser.add_argument('--secret', default='')
+    parser.add_argument('--repeat', type=int, default=1, help='Сколько раз отправить каждый апдейт')
+    parser.add_argument('--concurrency', type=int, default=10)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
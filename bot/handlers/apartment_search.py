@@ -1,3 +1,5 @@
+from typing import Optional
+
 from aiogram import Router, F
 from aiogram.types import CallbackQuery
 from aiogram.fsm.context import FSMContext
@@ -7,8 +9,9 @@ from keyboards.inline import (
     get_type_keyboard, get_district_keyboard, get_condition_keyboard,
     get_area_keyboard, get_rooms_keyboard, get_price_keyboard, get_pagination_keyboard
 )
-from services.api import get_apartments
-from services.database import init_db
+from services.api import get_apartments, get_apartments_page, get_facets
+from services.database import db, init_db
+from services.media_cache import remember_file_ids
 from utils.formatters import format_apartment_card, get_apartment_media_group
 
 router = Router()
@@ -16,6 +19,33 @@ router = Router()
 # Инициализация БД при импорте
 init_db()
 
+# Ключ фильтра в state -> название фасета в ответе /apartments/facets/
+FACET_KEYS = {
+    'type': 'type',
+    'district': 'district',
+    'condition': 'condition',
+    'area_ranges': 'area_range',
+    'rooms': 'rooms',
+    'price_ranges': 'price_range',
+}
+
+
+def _api_filters(filters: dict, exclude: Optional[str] = None) -> dict:
+    """Фильтры для API из state (exclude — ключ, который не учитывать)"""
+    return {key: filters[key] for key in FACET_KEYS if key != exclude and filters.get(key)}
+
+
+async def _facet_counts(filters: dict, key: str):
+    """
+    Счётчики вариантов текущего шага с учётом остальных выбранных фильтров.
+    Собственный выбор шага не учитывается, чтобы цифры не обнулялись
+    при отметке соседней кнопки. None — счётчики недоступны.
+    """
+    facets = await get_facets(_api_filters(filters, exclude=key))
+    if not facets:
+        return None
+    return facets.get(FACET_KEYS[key])
+
 
 @router.callback_query(F.data == "search_apartment")
 async def start_search(callback: CallbackQuery, state: FSMContext):
@@ -37,7 +67,8 @@ async def start_search(callback: CallbackQuery, state: FSMContext):
     )
     await state.set_state(ApartmentSearchStates.choosing_type)
     text = "🏠 <b>Выбор квартиры</b>\n\nВыберите тип жилья (можно несколько):"
-    await callback.message.edit_text(text, reply_markup=get_type_keyboard())
+    counts = await _facet_counts({}, 'type')
+    await callback.message.edit_text(text, reply_markup=get_type_keyboard(counts=counts))
     await callback.answer()
 
 
@@ -62,7 +93,8 @@ async def toggle_type(callback: CallbackQuery, state: FSMContext):
 
     await state.update_data(type=selected, type_any=any_selected)
     text = "🏠 <b>Выбор квартиры</b>\n\nВыберите тип жилья (можно несколько):"
-    await callback.message.edit_text(text, reply_markup=get_type_keyboard(selected, any_selected))
+    counts = await _facet_counts(data, 'type')
+    await callback.message.edit_text(text, reply_markup=get_type_keyboard(selected, any_selected, counts=counts))
     await callback.answer()
 
 
@@ -78,7 +110,8 @@ async def proceed_to_district(callback: CallbackQuery, state: FSMContext):
     text = "🏠 <b>Выбор квартиры</b>\n\nВыберите район (можно несколько):"
     districts = data.get('district', [])
     any_selected = data.get('district_any', False)
-    await callback.message.edit_text(text, reply_markup=get_district_keyboard(districts, any_selected))
+    counts = await _facet_counts(data, 'district')
+    await callback.message.edit_text(text, reply_markup=get_district_keyboard(districts, any_selected, counts=counts))
     await callback.answer()
 
 
@@ -103,7 +136,8 @@ async def toggle_district(callback: CallbackQuery, state: FSMContext):
 
     await state.update_data(district=selected, district_any=any_selected)
     text = "🏠 <b>Выбор квартиры</b>\n\nВыберите район (можно несколько):"
-    await callback.message.edit_text(text, reply_markup=get_district_keyboard(selected, any_selected))
+    counts = await _facet_counts(data, 'district')
+    await callback.message.edit_text(text, reply_markup=get_district_keyboard(selected, any_selected, counts=counts))
     await callback.answer()
 
 
@@ -119,7 +153,8 @@ async def proceed_to_condition(callback: CallbackQuery, state: FSMContext):
     text = "🏠 <b>Выбор квартиры</b>\n\nВыберите тип ремонта (можно несколько):"
     selected = data.get('condition', [])
     any_selected = data.get('condition_any', False)
-    await callback.message.edit_text(text, reply_markup=get_condition_keyboard(selected, any_selected))
+    counts = await _facet_counts(data, 'condition')
+    await callback.message.edit_text(text, reply_markup=get_condition_keyboard(selected, any_selected, counts=counts))
     await callback.answer()
 
 
@@ -144,7 +179,8 @@ async def toggle_condition(callback: CallbackQuery, state: FSMContext):
 
     await state.update_data(condition=selected, condition_any=any_selected)
     text = "🏠 <b>Выбор квартиры</b>\n\nВыберите тип ремонта (можно несколько):"
-    await callback.message.edit_text(text, reply_markup=get_condition_keyboard(selected, any_selected))
+    counts = await _facet_counts(data, 'condition')
+    await callback.message.edit_text(text, reply_markup=get_condition_keyboard(selected, any_selected, counts=counts))
     await callback.answer()
 
 
@@ -160,7 +196,8 @@ async def proceed_to_area(callback: CallbackQuery, state: FSMContext):
     selected = data.get('area_ranges', [])
     any_selected = data.get('area_any', False)
     text = "🏠 <b>Выбор квартиры</b>\n\nВыберите площадь (можно несколько диапазонов):"
-    await callback.message.edit_text(text, reply_markup=get_area_keyboard(selected, any_selected))
+    counts = await _facet_counts(data, 'area_ranges')
+    await callback.message.edit_text(text, reply_markup=get_area_keyboard(selected, any_selected, counts=counts))
     await callback.answer()
 
 
@@ -185,7 +222,8 @@ async def toggle_area(callback: CallbackQuery, state: FSMContext):
 
     await state.update_data(area_ranges=selected, area_any=any_selected)
     text = "🏠 <b>Выбор квартиры</b>\n\nВыберите площадь (можно несколько диапазонов):"
-    await callback.message.edit_text(text, reply_markup=get_area_keyboard(selected, any_selected))
+    counts = await _facet_counts(data, 'area_ranges')
+    await callback.message.edit_text(text, reply_markup=get_area_keyboard(selected, any_selected, counts=counts))
     await callback.answer()
 
 
@@ -201,7 +239,8 @@ async def proceed_to_rooms(callback: CallbackQuery, state: FSMContext):
     selected = data.get('rooms', [])
     any_selected = data.get('rooms_any', False)
     text = "🏠 <b>Выбор квартиры</b>\n\nВыберите количество комнат (можно несколько):"
-    await callback.message.edit_text(text, reply_markup=get_rooms_keyboard(selected, any_selected))
+    counts = await _facet_counts(data, 'rooms')
+    await callback.message.edit_text(text, reply_markup=get_rooms_keyboard(selected, any_selected, counts=counts))
     await callback.answer()
 
 
@@ -227,7 +266,8 @@ async def toggle_rooms(callback: CallbackQuery, state: FSMContext):
 
     await state.update_data(rooms=selected, rooms_any=any_selected)
     text = "🏠 <b>Выбор квартиры</b>\n\nВыберите количество комнат (можно несколько):"
-    await callback.message.edit_text(text, reply_markup=get_rooms_keyboard(selected, any_selected))
+    counts = await _facet_counts(data, 'rooms')
+    await callback.message.edit_text(text, reply_markup=get_rooms_keyboard(selected, any_selected, counts=counts))
     await callback.answer()
 
 
@@ -243,7 +283,8 @@ async def proceed_to_price(callback: CallbackQuery, state: FSMContext):
     selected = data.get('price_ranges', [])
     any_selected = data.get('price_any', False)
     text = "🏠 <b>Выбор квартиры</b>\n\nВыберите ценовой диапазон (можно несколько):"
-    await callback.message.edit_text(text, reply_markup=get_price_keyboard(selected, any_selected))
+    counts = await _facet_counts(data, 'price_ranges')
+    await callback.message.edit_text(text, reply_markup=get_price_keyboard(selected, any_selected, counts=counts))
     await callback.answer()
 
 
@@ -268,7 +309,8 @@ async def toggle_price(callback: CallbackQuery, state: FSMContext):
 
     await state.update_data(price_ranges=selected, price_any=any_selected)
     text = "🏠 <b>Выбор квартиры</b>\n\nВыберите ценовой диапазон (можно несколько):"
-    await callback.message.edit_text(text, reply_markup=get_price_keyboard(selected, any_selected))
+    counts = await _facet_counts(data, 'price_ranges')
+    await callback.message.edit_text(text, reply_markup=get_price_keyboard(selected, any_selected, counts=counts))
     await callback.answer()
 
 
@@ -314,19 +356,29 @@ async def show_search_results(callback: CallbackQuery, state: FSMContext, filter
             message_deleted = True
     
     # Подготавливаем фильтры для API
-    api_filters = {}
-    for key in ('type', 'district', 'condition', 'rooms'):
-        if filters.get(key):
-            api_filters[key] = filters[key]
-    if filters.get('area_ranges'):
-        api_filters['area_ranges'] = filters['area_ranges']
-    if filters.get('price_ranges'):
-        api_filters['price_ranges'] = filters['price_ranges']
+    api_filters = _api_filters(filters)
     
-    # Запрос к API
-    result = await get_apartments(api_filters, page)
+    # Запрос к API: страницы листаются по курсорам, сохранённым в state.
+    # Курсор страницы N — next_cursor страницы N-1, поэтому "Назад" берёт уже
+    # известный курсор, а новые квартиры не сдвигают просмотренные страницы.
+    search_pages = filters.get('search_pages') or {}
+    cursors = dict(search_pages.get('cursors', {}))
+    if page == 1:
+        result = await get_apartments_page(api_filters, with_count=True)
+        count = result.get('count', 0)
+        cursors = {}
+    elif str(page) in cursors:
+        result = await get_apartments_page(api_filters, cursor=cursors[str(page)])
+        count = search_pages.get('count', 0)
+    else:
+        # Курсора нет (например, state от старой версии бота) — номер страницы
+        result = await get_apartments(api_filters, page)
+        count = result.get('count', 0)
     apartments = result.get('results', [])
-    count = result.get('count', 0)
+
+    if result.get('next_cursor'):
+        cursors[str(page + 1)] = result['next_cursor']
+    await state.update_data(search_pages={'cursors': cursors, 'count': count})
     
     if not apartments:
         text = "😔 К сожалению, по вашим критериям ничего не найдено.\n\nПопробуйте изменить параметры поиска."
@@ -374,10 +426,11 @@ async def show_search_results(callback: CallbackQuery, state: FSMContext, filter
 
                 print(f"[DEBUG] Квартира {idx+1}/{len(apartments)}: Отправка медиа-группы из {len(media_group)} изображений")
 
-                await callback.bot.send_media_group(
+                messages = await callback.bot.send_media_group(
                     chat_id=callback.message.chat.id,
                     media=media_group
                 )
+                await remember_file_ids(media_group, messages)
                 print(f"[DEBUG] Медиа-группа успешно отправлена")
 
             except Exception as e:
@@ -391,12 +444,13 @@ async def show_search_results(callback: CallbackQuery, state: FSMContext, filter
             # Если только 1 фото, отправляем отдельным сообщением
             try:
                 print(f"[DEBUG] Квартира {idx+1}/{len(apartments)}: Отправка 1 фото отдельно")
-                await callback.bot.send_photo(
+                message = await callback.bot.send_photo(
                     chat_id=callback.message.chat.id,
                     photo=media_group[0].media,
                     caption=card_text,
                     parse_mode="HTML"
                 )
+                await remember_file_ids(media_group, [message])
             except Exception as e:
                 print(f"[ERROR] Ошибка при отправке фото для квартиры {apartment['id']}: {e}")
                 await callback.bot.send_message(
@@ -423,11 +477,10 @@ async def show_search_results(callback: CallbackQuery, state: FSMContext, filter
 
     # Предлагаем подписаться на рассылку
     from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-    from services.database import get_subscription
 
     # Проверяем, есть ли уже подписка
     user_id = callback.from_user.id
-    existing_subscription = get_subscription(user_id)
+    existing_subscription = await db.get_subscription(user_id)
 
     if existing_subscription:
         subscription_text = (
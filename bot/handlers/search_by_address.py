@@ -0,0 +1,95 @@
+from aiogram import Router, F
+from aiogram.types import Message, CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.utils.markdown import html_decoration as hd
+from handlers.search_by_id import send_apartment
+from keyboards.inline import get_main_menu_keyboard
+from services.api import get_apartment_by_id, lookup_apartments
+
+router = Router()
+
+# Запрос короче не даёт осмысленных совпадений
+MIN_QUERY_LENGTH = 2
+
+
+class SearchByAddressStates(StatesGroup):
+    waiting_for_query = State()
+
+
+def _cancel_keyboard() -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[[
+        InlineKeyboardButton(text="◀️ Отмена", callback_data="main_menu")
+    ]])
+
+
+def _candidate_text(apartment: dict) -> str:
+    """Текст кнопки варианта: найденный адрес или ориентир, комнаты и цена"""
+    price = f"${apartment['price']:,}".replace(',', ' ')
+    return f"📍 {apartment['matched_value']} · {apartment['rooms']}-комн. · {price}"
+
+
+@router.callback_query(F.data == "search_by_address")
+async def start_search_by_address(callback: CallbackQuery, state: FSMContext):
+    """Начать поиск по адресу или ориентиру"""
+    await state.set_state(SearchByAddressStates.waiting_for_query)
+    text = (
+        "📍 <b>Поиск по адресу</b>\n\n"
+        "Введите адрес или ориентир, можно неточно.\n"
+        "Например: <i>Юнусабад 4 кв</i> или <i>метро Минор</i>"
+    )
+    await callback.message.edit_text(text, reply_markup=_cancel_keyboard())
+    await callback.answer()
+
+
+@router.message(SearchByAddressStates.waiting_for_query)
+async def process_address_query(message: Message, state: FSMContext):
+    """Показать квартиры с похожим адресом или ориентиром"""
+    query = (message.text or "").strip()
+    if len(query) < MIN_QUERY_LENGTH:
+        await message.answer("❌ Введите адрес или ориентир текстом.")
+        return
+
+    apartments = await lookup_apartments(query)
+
+    if apartments is None:
+        await message.answer(
+            "⚠️ Поиск временно недоступен. Попробуйте позже.",
+            reply_markup=get_main_menu_keyboard()
+        )
+        await state.clear()
+        return
+
+    if not apartments:
+        # Остаёмся в том же состоянии: можно сразу уточнить запрос
+        await message.answer(
+            f"😔 По запросу «{hd.quote(query)}» ничего не найдено.\n\n"
+            "Попробуйте написать адрес иначе или указать ориентир.",
+            reply_markup=_cancel_keyboard()
+        )
+        return
+
+    keyboard = [
+        [InlineKeyboardButton(text=_candidate_text(apartment), callback_data=f"address_pick:{apartment['id']}")]
+        for apartment in apartments
+    ]
+    keyboard.append([InlineKeyboardButton(text="◀️ Отмена", callback_data="main_menu")])
+    await message.answer(
+        "🔎 Похожие варианты. Выберите квартиру или отправьте уточнённый запрос:",
+        reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard)
+    )
+
+
+@router.callback_query(F.data.startswith("address_pick:"))
+async def pick_apartment(callback: CallbackQuery, state: FSMContext):
+    """Показать выбранную квартиру"""
+    apartment_id = int(callback.data.split(":")[1])
+    apartment = await get_apartment_by_id(apartment_id)
+
+    if not apartment:
+        await callback.answer("😔 Квартира больше не доступна", show_alert=True)
+        return
+
+    await state.clear()
+    await callback.answer()
+    await send_apartment(callback.message, apartment, "✅ Квартира найдена!")
@@ -4,6 +4,7 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from keyboards.inline import get_main_menu_keyboard
 from services.api import get_apartment_by_id
+from services.media_cache import remember_file_ids
 from utils.formatters import format_apartment_card, get_apartment_media_group
 
 router = Router()
@@ -50,6 +51,19 @@ async def process_id(message: Message, state: FSMContext):
         await state.clear()
         return
     
+    await send_apartment(message, apartment, "✅ Квартира найдена!")
+    await state.clear()
+
+
+async def send_apartment(message: Message, apartment: dict, found_text: str):
+    """
+    Отправить карточку квартиры с фото и вернуть главное меню
+
+    Args:
+        message: Сообщение, в чат которого отправляется карточка
+        apartment: Данные квартиры из API
+        found_text: Текст сообщения с главным меню после фото
+    """
     # Форматируем карточку
     card_text = format_apartment_card(apartment)
     
@@ -60,30 +74,29 @@ async def process_id(message: Message, state: FSMContext):
         # Если есть 2+ изображения, отправляем медиа-группу
         try:
             media_group[0].caption = card_text
-            await message.bot.send_media_group(
+            messages = await message.bot.send_media_group(
                 chat_id=message.chat.id,
                 media=media_group
             )
-            await message.answer("✅ Квартира найдена!", reply_markup=get_main_menu_keyboard())
+            await remember_file_ids(media_group, messages)
+            await message.answer(found_text, reply_markup=get_main_menu_keyboard())
         except Exception as e:
             print(f"Ошибка при отправке медиа-группы: {e}")
             await message.answer(card_text, reply_markup=get_main_menu_keyboard())
     elif media_group and len(media_group) == 1:
         # Если только 1 фото, отправляем отдельным сообщением
         try:
-            await message.bot.send_photo(
+            sent = await message.bot.send_photo(
                 chat_id=message.chat.id,
                 photo=media_group[0].media,
                 caption=card_text,
                 parse_mode="HTML"
             )
-            await message.answer("✅ Квартира найдена!", reply_markup=get_main_menu_keyboard())
+            await remember_file_ids(media_group, [sent])
+            await message.answer(found_text, reply_markup=get_main_menu_keyboard())
         except Exception as e:
             print(f"Ошибка при отправке фото: {e}")
             await message.answer(card_text, reply_markup=get_main_menu_keyboard())
     else:
         # Если нет изображений, отправляем только текст
         await message.answer(card_text, reply_markup=get_main_menu_keyboard())
-    
-    await state.clear()
-
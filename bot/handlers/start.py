@@ -20,13 +20,12 @@ async def cmd_start(message: Message):
 @router.message(Command("check_new"))
 async def cmd_check_new(message: Message):
     """Команда для ручной проверки новых квартир (для тестирования)"""
-    from services.notifier import check_new_apartments
-
-    await message.answer("🔍 Запускаю проверку новых квартир...")
+    from services.notifier import request_feed_check
 
     try:
-        await check_new_apartments(message.bot)
-        await message.answer("✅ Проверка завершена! Уведомления отправлены подписчикам.")
+        # Ленту проверяет процесс-координатор рассылки, уведомления уходят через очередь
+        await request_feed_check()
+        await message.answer("🔍 Проверка новых квартир запущена, уведомления придут подписчикам.")
     except Exception as e:
         await message.answer(f"❌ Ошибка при проверке: {e}")
 
@@ -2,7 +2,7 @@ from aiogram import Router, F
 from aiogram.types import CallbackQuery
 from aiogram.fsm.context import FSMContext
 from keyboards.inline import get_main_menu_keyboard
-from services.database import add_subscription, remove_subscription, get_subscription, init_db
+from services.database import db, init_db
 
 router = Router()
 
@@ -17,6 +17,8 @@ async def subscribe(callback: CallbackQuery, state: FSMContext):
     
     # Получаем текущие фильтры из state (если есть)
     filters = await state.get_data()
+    # Курсоры пагинации к фильтрам подписки не относятся
+    filters.pop('search_pages', None)
     
     # Если фильтров нет, предлагаем начать поиск
     if not any(filters.values()):
@@ -36,7 +38,7 @@ async def subscribe(callback: CallbackQuery, state: FSMContext):
         return
     
     # Сохраняем подписку
-    add_subscription(user_id, filters)
+    await db.add_subscription(user_id, filters)
     
     text = (
         "✅ <b>Вы успешно подписались на рассылку!</b>\n\n"
@@ -52,12 +54,12 @@ async def unsubscribe(callback: CallbackQuery):
     user_id = callback.from_user.id
     
     # Проверяем, есть ли подписка
-    subscription = get_subscription(user_id)
+    subscription = await db.get_subscription(user_id)
     
     if not subscription:
         text = "ℹ️ У вас нет активной подписки на рассылку."
     else:
-        remove_subscription(user_id)
+        await db.remove_subscription(user_id)
         text = "❌ <b>Вы отписались от рассылки</b>\n\nВы больше не будете получать уведомления о новых квартирах."
     
     await callback.message.edit_text(text, reply_markup=get_main_menu_keyboard())
@@ -1,4 +1,67 @@
+from collections import OrderedDict
+from functools import wraps
+from typing import Dict, Optional
+
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from pydantic import ConfigDict
+
+# Сколько готовых клавиатур шагов поиска держать в памяти
+KEYBOARD_CACHE_SIZE = 2048
+
+
+class FrozenInlineKeyboardButton(InlineKeyboardButton):
+    """Кнопка, которую нельзя изменить: экземпляры общие для всех пользователей"""
+    model_config = ConfigDict(frozen=True)
+
+
+class FrozenInlineKeyboardMarkup(InlineKeyboardMarkup):
+    """Клавиатура, которую нельзя изменить: экземпляры общие для всех пользователей"""
+    model_config = ConfigDict(frozen=True)
+
+
+_keyboard_cache: 'OrderedDict[tuple, FrozenInlineKeyboardMarkup]' = OrderedDict()
+
+
+def _freeze(markup: InlineKeyboardMarkup) -> FrozenInlineKeyboardMarkup:
+    rows = [
+        [FrozenInlineKeyboardButton(**button.model_dump(exclude_none=True)) for button in row]
+        for row in markup.inline_keyboard
+    ]
+    return FrozenInlineKeyboardMarkup(inline_keyboard=rows)
+
+
+def _memoized_keyboard(step: str):
+    """
+    Кэширует клавиатуру шага по (step, frozenset(selected), any_selected, counts).
+
+    Клавиатура зависит только от этих значений, поэтому одинаковые состояния
+    у разных пользователей получают один и тот же неизменяемый объект
+    без повторного построения и валидации кнопок.
+    """
+
+    def decorator(builder):
+        @wraps(builder)
+        def wrapper(selected=None, any_selected: bool = False, counts: Optional[Dict[str, int]] = None):
+            key = (
+                step,
+                frozenset(selected or ()),
+                bool(any_selected),
+                tuple(sorted(counts.items())) if counts is not None else None,
+            )
+            markup = _keyboard_cache.get(key)
+            if markup is not None:
+                _keyboard_cache.move_to_end(key)
+                return markup
+
+            markup = _freeze(builder(list(selected or ()), any_selected, counts))
+            _keyboard_cache[key] = markup
+            while len(_keyboard_cache) > KEYBOARD_CACHE_SIZE:
+                _keyboard_cache.popitem(last=False)
+            return markup
+
+        return wrapper
+
+    return decorator
 
 
 def _mark_selected(text: str, selected: bool) -> str:
@@ -6,10 +69,28 @@ def _mark_selected(text: str, selected: bool) -> str:
     return f"{text} ✅" if selected else text
 
 
+_main_menu_keyboard: Optional[FrozenInlineKeyboardMarkup] = None
+
+
+def _with_count(text: str, counts: Optional[Dict[str, int]], key: str) -> str:
+    """Добавляет количество квартир для варианта (если счётчики известны)"""
+    if counts is None:
+        return text
+    return f"{text} ({counts.get(key, 0)})"
+
+
 def get_main_menu_keyboard():
-    """Главное меню бота"""
+    """Главное меню бота (один общий неизменяемый объект)"""
+    global _main_menu_keyboard
+    if _main_menu_keyboard is None:
+        _main_menu_keyboard = _freeze(_build_main_menu_keyboard())
+    return _main_menu_keyboard
+
+
+def _build_main_menu_keyboard():
     keyboard = [
         [InlineKeyboardButton(text="🏠 Выбор квартиры", callback_data="search_apartment")],
+        [InlineKeyboardButton(text="📍 Поиск по адресу", callback_data="search_by_address")],
         [InlineKeyboardButton(text="✉️ Подписаться на рассылку", callback_data="subscribe")],
         [InlineKeyboardButton(text="⛔ Отписаться от рассылки", callback_data="unsubscribe")],
         [InlineKeyboardButton(text="👤 Обо мне", callback_data="about")],
@@ -19,16 +100,17 @@ def get_main_menu_keyboard():
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
-def get_type_keyboard(selected=None, any_selected: bool = False):
+@_memoized_keyboard('type')
+def get_type_keyboard(selected=None, any_selected: bool = False, counts: Optional[Dict[str, int]] = None):
     """Клавиатура выбора типа жилья"""
     selected = selected or []
     keyboard = [
         [InlineKeyboardButton(
-            text=_mark_selected("Новостройка", "Новостройка" in selected),
+            text=_mark_selected(_with_count("Новостройка", counts, "Новостройка"), "Новостройка" in selected),
             callback_data="type_toggle:Новостройка"
         )],
         [InlineKeyboardButton(
-            text=_mark_selected("Вторичное жильё", "Вторичное жильё" in selected),
+            text=_mark_selected(_with_count("Вторичное жильё", counts, "Вторичное жильё"), "Вторичное жильё" in selected),
             callback_data="type_toggle:Вторичное жильё"
         )],
         [InlineKeyboardButton(
@@ -44,7 +126,8 @@ def get_type_keyboard(selected=None, any_selected: bool = False):
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
-def get_district_keyboard(selected=None, any_selected: bool = False):
+@_memoized_keyboard('district')
+def get_district_keyboard(selected=None, any_selected: bool = False, counts: Optional[Dict[str, int]] = None):
     """Клавиатура выбора района"""
     selected = selected or []
     districts = [
@@ -59,7 +142,7 @@ def get_district_keyboard(selected=None, any_selected: bool = False):
     for district in districts:
         keyboard.append([
             InlineKeyboardButton(
-                text=_mark_selected(district, district in selected),
+                text=_mark_selected(_with_count(district, counts, district), district in selected),
                 callback_data=f"district_toggle:{district}"
             )
         ])
@@ -78,20 +161,21 @@ def get_district_keyboard(selected=None, any_selected: bool = False):
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
-def get_condition_keyboard(selected=None, any_selected: bool = False):
+@_memoized_keyboard('condition')
+def get_condition_keyboard(selected=None, any_selected: bool = False, counts: Optional[Dict[str, int]] = None):
     """Клавиатура выбора типа ремонта"""
     selected = selected or []
     keyboard = [
         [InlineKeyboardButton(
-            text=_mark_selected("С ремонтом", "С ремонтом" in selected),
+            text=_mark_selected(_with_count("С ремонтом", counts, "С ремонтом"), "С ремонтом" in selected),
             callback_data="condition_toggle:С ремонтом"
         )],
         [InlineKeyboardButton(
-            text=_mark_selected("Без ремонта", "Без ремонта" in selected),
+            text=_mark_selected(_with_count("Без ремонта", counts, "Без ремонта"), "Без ремонта" in selected),
             callback_data="condition_toggle:Без ремонта"
         )],
         [InlineKeyboardButton(
-            text=_mark_selected("Среднее состояние", "Среднее состояние" in selected),
+            text=_mark_selected(_with_count("Среднее состояние", counts, "Среднее состояние"), "Среднее состояние" in selected),
             callback_data="condition_toggle:Среднее состояние"
         )],
         [InlineKeyboardButton(
@@ -107,7 +191,8 @@ def get_condition_keyboard(selected=None, any_selected: bool = False):
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
-def get_area_keyboard(selected=None, any_selected: bool = False):
+@_memoized_keyboard('area')
+def get_area_keyboard(selected=None, any_selected: bool = False, counts: Optional[Dict[str, int]] = None):
     """Клавиатура выбора площади"""
     selected = selected or []
     areas = [
@@ -124,7 +209,7 @@ def get_area_keyboard(selected=None, any_selected: bool = False):
     for label, data in areas:
         keyboard.append([
             InlineKeyboardButton(
-                text=_mark_selected(label, data in selected),
+                text=_mark_selected(_with_count(label, counts, data), data in selected),
                 callback_data=f"area_toggle:{data}"
             )
         ])
@@ -143,28 +228,29 @@ def get_area_keyboard(selected=None, any_selected: bool = False):
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
-def get_rooms_keyboard(selected=None, any_selected: bool = False):
+@_memoized_keyboard('rooms')
+def get_rooms_keyboard(selected=None, any_selected: bool = False, counts: Optional[Dict[str, int]] = None):
     """Клавиатура выбора количества комнат"""
     selected = selected or []
     keyboard = [
         [InlineKeyboardButton(
-            text=_mark_selected("1", 1 in selected),
+            text=_mark_selected(_with_count("1", counts, "1"), 1 in selected),
             callback_data="rooms_toggle:1"
         ),
          InlineKeyboardButton(
-             text=_mark_selected("2", 2 in selected),
+             text=_mark_selected(_with_count("2", counts, "2"), 2 in selected),
              callback_data="rooms_toggle:2"
          ),
          InlineKeyboardButton(
-             text=_mark_selected("3", 3 in selected),
+             text=_mark_selected(_with_count("3", counts, "3"), 3 in selected),
              callback_data="rooms_toggle:3"
          )],
         [InlineKeyboardButton(
-            text=_mark_selected("4", 4 in selected),
+            text=_mark_selected(_with_count("4", counts, "4"), 4 in selected),
             callback_data="rooms_toggle:4"
         ),
          InlineKeyboardButton(
-             text=_mark_selected("5+", 5 in selected),
+             text=_mark_selected(_with_count("5+", counts, "5"), 5 in selected),
              callback_data="rooms_toggle:5"
          )],
         [InlineKeyboardButton(
@@ -180,7 +266,8 @@ def get_rooms_keyboard(selected=None, any_selected: bool = False):
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
-def get_price_keyboard(selected=None, any_selected: bool = False):
+@_memoized_keyboard('price')
+def get_price_keyboard(selected=None, any_selected: bool = False, counts: Optional[Dict[str, int]] = None):
     """Клавиатура выбора ценового диапазона"""
     selected = selected or []
     prices = [
@@ -194,7 +281,7 @@ def get_price_keyboard(selected=None, any_selected: bool = False):
     for label, data in prices:
         keyboard.append([
             InlineKeyboardButton(
-                text=_mark_selected(label, data in selected),
+                text=_mark_selected(_with_count(label, counts, data), data in selected),
                 callback_data=f"price_toggle:{data}"
             )
         ])
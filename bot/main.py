@@ -5,9 +5,16 @@ from dotenv import load_dotenv
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
+from aiogram.fsm.storage.memory import MemoryStorage
 
-from handlers import start, apartment_search, search_by_id, subscription, menu
+from handlers import start, apartment_search, search_by_id, search_by_address, subscription, menu
+from services.api import api_client
+from services.database import db
+from services.fsm_storage import SQLiteStorage
+from services.media_cache import load_file_ids
 from services.notifier import start_notification_scheduler
+from services.push_listener import start_push_listener
+from services.webhook import WEBHOOK_QUEUE_SIZE, WEBHOOK_WORKERS, start_webhook_server
 
 load_dotenv()
 
@@ -23,8 +30,51 @@ BOT_TOKEN = os.getenv('BOT_TOKEN')
 if not BOT_TOKEN:
     raise ValueError("BOT_TOKEN не найден в переменных окружения")
 
+# Приём push-событий о новых квартирах от backend (пустой порт отключает)
+NOTIFY_LISTEN_HOST = os.getenv('NOTIFY_LISTEN_HOST', '127.0.0.1')
+NOTIFY_LISTEN_PORT = os.getenv('NOTIFY_LISTEN_PORT', '')
+NOTIFY_SECRET = os.getenv('NOTIFY_SECRET', '')
+
+# Хранилище состояний поиска: sqlite переживает перезапуск, memory — только для отладки
+FSM_STORAGE = os.getenv('FSM_STORAGE', 'sqlite')
+
+# Приём апдейтов: polling (getUpdates) или webhook (aiohttp-сервер)
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8080'))
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+WEBHOOK_QUEUE = int(os.getenv('WEBHOOK_QUEUE_SIZE', str(WEBHOOK_QUEUE_SIZE)))
+WEBHOOK_CONCURRENCY = int(os.getenv('WEBHOOK_WORKERS', str(WEBHOOK_WORKERS)))
+# Несколько процессов бота на одном порту (SO_REUSEPORT, только Linux/BSD)
+WEBHOOK_REUSE_PORT = os.getenv('WEBHOOK_REUSE_PORT', '') == '1'
+# Рассылку можно вести в нескольких процессах: они делят шарды подписчиков через bot.db
+NOTIFIER_ENABLED = os.getenv('NOTIFIER_ENABLED', '1') == '1'
+NOTIFIER_SHARDS = int(os.getenv('NOTIFIER_SHARDS', '4'))
+
 bot = Bot(token=BOT_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
-dp = Dispatcher()
+# Процессы на общем порту делят состояния через SQLite без кэша в памяти
+dp = Dispatcher(storage=MemoryStorage() if FSM_STORAGE == 'memory' else SQLiteStorage(shared=WEBHOOK_REUSE_PORT))
+
+
+async def run_webhook():
+    """Принимать апдейты через webhook до остановки процесса"""
+    await dp.emit_startup(bot=bot)
+    runner = await start_webhook_server(
+        dp, bot, WEBHOOK_HOST, WEBHOOK_PORT,
+        secret=WEBHOOK_SECRET,
+        url=WEBHOOK_URL or None,
+        queue_size=WEBHOOK_QUEUE,
+        workers=WEBHOOK_CONCURRENCY,
+        reuse_port=WEBHOOK_REUSE_PORT,
+    )
+    logger.info("Режим webhook: очередь %d, обработчиков %d", WEBHOOK_QUEUE, WEBHOOK_CONCURRENCY)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+        await dp.emit_shutdown(bot=bot)
+        await bot.session.close()
 
 
 async def main():
@@ -33,21 +83,45 @@ async def main():
     dp.include_router(menu.router)
     dp.include_router(apartment_search.router)
     dp.include_router(search_by_id.router)
+    dp.include_router(search_by_address.router)
     dp.include_router(subscription.router)
 
+    # Общая сессия с пулом соединений к backend API
+    await api_client.start()
+    # Кэш file_id фотографий читается из БД в потоке, не блокируя event loop
+    await load_file_ids()
+
     # Запуск системы уведомлений в фоновом режиме
-    # Интервал проверки: 5 минут (можно изменить)
-    notification_task = asyncio.create_task(start_notification_scheduler(bot, interval_minutes=60))
+    # Новые квартиры приходят push-событием, раз в 60 минут — страховочная сверка
+    notification_task = None
+    if NOTIFIER_ENABLED:
+        notification_task = asyncio.create_task(start_notification_scheduler(bot, interval_minutes=60, shards=NOTIFIER_SHARDS))
+
+    push_runner = None
+    if NOTIFY_LISTEN_PORT:
+        push_runner = await start_push_listener(NOTIFY_LISTEN_HOST, int(NOTIFY_LISTEN_PORT), NOTIFY_SECRET)
 
     # Запуск бота
     logger.info("Бот запущен")
-    logger.info("Система уведомлений запущена (интервал: 5 минут)")
+    if notification_task:
+        logger.info("Система уведомлений запущена (push: %s, сверка: 60 минут)", "вкл" if push_runner else "выкл")
 
     try:
-        await dp.start_polling(bot)
+        if BOT_MODE == 'webhook':
+            await run_webhook()
+        else:
+            await dp.start_polling(bot)
     finally:
         # Отменяем фоновую задачу при остановке бота
-        notification_task.cancel()
+        if notification_task:
+            # Узел дожидается текущей пачки и отдаёт аренды другим процессам
+            notification_task.cancel()
+            await asyncio.gather(notification_task, return_exceptions=True)
+        if push_runner:
+            await push_runner.cleanup()
+        await dp.storage.close()
+        await api_client.close()
+        await db.close()
 
 
 if __name__ == '__main__':
@@ -1,27 +1,246 @@
 import aiohttp
+import asyncio
 import os
-from typing import Optional, Dict
+import random
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Dict, List, Tuple, Union
 from dotenv import load_dotenv
 
+from services.cache import AsyncTTLCache
+
 load_dotenv()
 
 API_BASE_URL = os.getenv('API_BASE_URL', 'http://localhost:8000/api')
 
+# Пул соединений и таймауты запросов к backend
+API_POOL_LIMIT = int(os.getenv('API_POOL_LIMIT', '20'))
+API_TIMEOUT = float(os.getenv('API_TIMEOUT', '10'))
+API_CONNECT_TIMEOUT = float(os.getenv('API_CONNECT_TIMEOUT', '3'))
+API_RETRIES = 2
+API_RETRY_BASE_DELAY = 0.2
 
-async def get_apartments(filters: Optional[Dict] = None, page: int = 1) -> Dict:
+# Кэш результатов поиска: свежесть, окно stale-while-revalidate и размер
+SEARCH_CACHE_TTL = 60
+SEARCH_CACHE_STALE_TTL = 600
+SEARCH_CACHE_SIZE = 512
+
+# Пакетная загрузка квартир по id: размер пачки не больше лимита backend
+BATCH_CHUNK_SIZE = 100
+
+# Сколько ответов с ETag помнить для условных запросов (If-None-Match)
+VALIDATOR_CACHE_SIZE = 1024
+
+# Сколько вариантов показывать в нечётком поиске по адресу (максимум backend — 10)
+LOOKUP_LIMIT = 5
+
+# Счётчики для клавиатур фильтров: короткий TTL, чтобы цифры не отставали
+FACETS_CACHE_TTL = 30
+FACETS_CACHE_STALE_TTL = 120
+FACETS_CACHE_SIZE = 256
+
+# Circuit breaker: после серии ошибок запросы сразу отклоняются на время паузы
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_TIMEOUT = 30
+
+Params = List[Tuple[str, Union[str, int]]]
+
+
+class CachedResponse(NamedTuple):
+    """Ответ backend с валидаторами для повторной проверки"""
+    etag: str
+    last_modified: Optional[str]
+    data: Dict
+
+
+class CircuitOpenError(Exception):
+    """Backend недоступен: запросы временно не отправляются"""
+
+
+class CircuitBreaker:
     """
-    Получить список квартир с фильтрами
-    
-    Args:
-        filters: Словарь с фильтрами
-        page: Номер страницы
-    
-    Returns:
-        Словарь с результатами и пагинацией
+    Защита от лавины запросов к упавшему backend.
+
+    После failure_threshold ошибок подряд цепь размыкается, и запросы сразу
+    завершаются ошибкой. Через reset_timeout пропускается один пробный запрос:
+    успех замыкает цепь, ошибка снова размыкает её.
+    """
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURE_THRESHOLD, reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_progress = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def before_request(self):
+        """Проверить, можно ли отправлять запрос"""
+        if self.opened_at is None:
+            return
+        if time.monotonic() - self.opened_at < self.reset_timeout or self._trial_in_progress:
+            raise CircuitOpenError("backend временно недоступен")
+        # Полуоткрытое состояние: пропускаем один пробный запрос
+        self._trial_in_progress = True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_progress = False
+
+    def release_trial(self):
+        """Пробный запрос прерван без ответа backend: следующий запрос станет новой пробой"""
+        self._trial_in_progress = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_progress = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                print(f"[API] Circuit breaker разомкнут после {self.failures} ошибок подряд")
+            self.opened_at = time.monotonic()
+
+
+class ApiClient:
+    """
+    Долгоживущий клиент backend API: одна сессия aiohttp с пулом keep-alive
+    соединений, таймаутами, повторами с джиттером и circuit breaker.
+
+    Ответы с ETag запоминаются; повторный запрос отправляется с
+    If-None-Match, и при 304 возвращается сохранённый JSON.
     """
-    url = f"{API_BASE_URL}/apartments/"
-    params = [('page', page)]
-    
+
+    def __init__(
+        self,
+        base_url: str = API_BASE_URL,
+        pool_limit: int = API_POOL_LIMIT,
+        timeout: float = API_TIMEOUT,
+        connect_timeout: float = API_CONNECT_TIMEOUT,
+        retries: int = API_RETRIES,
+    ):
+        self.base_url = base_url.rstrip('/')
+        self.pool_limit = pool_limit
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=connect_timeout)
+        self.retries = retries
+        self.breaker = CircuitBreaker()
+        self.revalidated = 0
+        self._validators: 'OrderedDict[Tuple, CachedResponse]' = OrderedDict()
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def start(self):
+        """Создать сессию (вызывается при запуске бота)"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_limit,
+                ttl_dns_cache=300,
+                keepalive_timeout=30,
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+
+    async def close(self):
+        """Закрыть сессию (вызывается при остановке бота)"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def _remember(self, key: Tuple, cached: CachedResponse):
+        self._validators[key] = cached
+        self._validators.move_to_end(key)
+        while len(self._validators) > VALIDATOR_CACHE_SIZE:
+            self._validators.popitem(last=False)
+
+    async def _get_once(self, url: str, params: Optional[Params]) -> Tuple[int, Optional[Dict]]:
+        key = (url, tuple(sorted((k, str(v)) for k, v in params or ())))
+        cached = self._validators.get(key)
+        headers = {}
+        if cached is not None:
+            headers['If-None-Match'] = cached.etag
+            if cached.last_modified:
+                headers['If-Modified-Since'] = cached.last_modified
+
+        async with self._session.get(url, params=params, headers=headers) as response:
+            if response.status == 304 and cached is not None:
+                # Данные не изменились: тело не передавалось
+                self._validators.move_to_end(key)
+                self.revalidated += 1
+                return 200, cached.data
+            if response.status == 200:
+                data = await response.json()
+                etag = response.headers.get('ETag')
+                if etag:
+                    self._remember(key, CachedResponse(etag, response.headers.get('Last-Modified'), data))
+                return response.status, data
+            # Тело ошибки не нужно, но его нужно дочитать, чтобы соединение вернулось в пул
+            await response.read()
+            return response.status, None
+
+    async def get_json(self, path: str, params: Optional[Params] = None) -> Optional[Dict]:
+        """
+        GET-запрос к API
+
+        Args:
+            path: Путь относительно API_BASE_URL, например '/apartments/'
+            params: Параметры запроса
+
+        Returns:
+            JSON ответа при статусе 200, иначе None
+        """
+        if self._session is None or self._session.closed:
+            await self.start()
+        url = f"{self.base_url}{path}"
+
+        for attempt in range(self.retries + 1):
+            try:
+                self.breaker.before_request()
+            except CircuitOpenError as e:
+                print(f"[API] Запрос {path} отклонён: {e}")
+                return None
+
+            try:
+                status, data = await self._get_once(url, params)
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                # ValueError — backend ответил не JSON (ContentTypeError входит в ClientError)
+                self.breaker.record_failure()
+                error = f"{type(e).__name__}: {e}"
+            except BaseException:
+                # Отмена (CancelledError) не говорит о состоянии backend, но пробный
+                # запрос должен завершиться, иначе цепь останется разомкнутой навсегда
+                self.breaker.release_trial()
+                raise
+            else:
+                if status < 500:
+                    # 4xx — корректный ответ backend (например, 404), повторять нечего
+                    self.breaker.record_success()
+                    return data
+                self.breaker.record_failure()
+                error = f"HTTP {status}"
+
+            if attempt < self.retries:
+                delay = API_RETRY_BASE_DELAY * 2 ** attempt
+                await asyncio.sleep(delay + random.uniform(0, delay))
+            else:
+                print(f"Ошибка при запросе к API {path}: {error}")
+
+        return None
+
+
+api_client = ApiClient()
+search_cache = AsyncTTLCache(SEARCH_CACHE_TTL, SEARCH_CACHE_STALE_TTL, SEARCH_CACHE_SIZE)
+facets_cache = AsyncTTLCache(FACETS_CACHE_TTL, FACETS_CACHE_STALE_TTL, FACETS_CACHE_SIZE)
+
+
+def _search_signature(params: Params) -> Tuple:
+    """Каноничный ключ запроса: порядок выбора фильтров не важен"""
+    return tuple(sorted((key, str(value)) for key, value in params))
+
+
+def _filter_params(filters: Optional[Dict]) -> Params:
+    """Преобразовать фильтры поиска в параметры запроса"""
+    params = []
+
     if filters:
         # Добавляем фильтры в параметры запроса
         for key in ('type', 'district', 'condition'):
@@ -38,41 +257,154 @@ async def get_apartments(filters: Optional[Dict] = None, page: int = 1) -> Dict:
         if filters.get('price_ranges'):
             for value in filters['price_ranges']:
                 params.append(('price_range', value))
-    
-    async with aiohttp.ClientSession() as session:
-        try:
-            async with session.get(url, params=params) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    return data
-                else:
-                    return {'results': [], 'count': 0, 'next': None, 'previous': None}
-        except Exception as e:
-            print(f"Ошибка при запросе к API: {e}")
-            return {'results': [], 'count': 0, 'next': None, 'previous': None}
+
+    return params
+
+
+async def _search(params: Params) -> Optional[Dict]:
+    # Одинаковые комбинации фильтров у разных пользователей обслуживает один запрос
+    return await search_cache.get_or_fetch(
+        _search_signature(params),
+        lambda: api_client.get_json('/apartments/', params),
+    )
+
+
+async def get_apartments(filters: Optional[Dict] = None, page: int = 1) -> Dict:
+    """
+    Получить список квартир с фильтрами
+
+    Args:
+        filters: Словарь с фильтрами
+        page: Номер страницы
+
+    Returns:
+        Словарь с результатами и пагинацией
+    """
+    params = [('page', page)] + _filter_params(filters)
+
+    data = await _search(params)
+    if data is None:
+        return {'results': [], 'count': 0, 'next': None, 'previous': None}
+    return data
+
+
+async def get_apartments_page(filters: Optional[Dict] = None, cursor: Optional[str] = None, with_count: bool = False) -> Dict:
+    """
+    Получить страницу квартир в режиме keyset-курсоров
+
+    Args:
+        filters: Словарь с фильтрами
+        cursor: Курсор страницы из next_cursor/previous_cursor (None — первая страница)
+        with_count: Запросить общее количество найденных квартир
+
+    Returns:
+        Словарь с results, next_cursor, previous_cursor и count (если запрошен)
+    """
+    params = [('pagination', 'cursor')] + _filter_params(filters)
+    if cursor:
+        params.append(('cursor', cursor))
+    if with_count:
+        params.append(('with_count', 1))
+
+    data = await _search(params)
+    if data is None:
+        return {'results': [], 'count': 0, 'next_cursor': None, 'previous_cursor': None}
+    return data
+
+
+async def get_facets(filters: Optional[Dict] = None) -> Optional[Dict]:
+    """
+    Получить количество квартир по каждому варианту фильтров
+
+    Args:
+        filters: Уже выбранные фильтры
+
+    Returns:
+        Словарь {'district': {'Мирабадский': 12, ...}, 'rooms': {'1': 5, ...}, ...}
+        или None, если backend недоступен
+    """
+    params = _filter_params(filters)
+    return await facets_cache.get_or_fetch(
+        _search_signature(params),
+        lambda: api_client.get_json('/apartments/facets/', params),
+    )
 
 
 async def get_apartment_by_id(apartment_id: int) -> Optional[Dict]:
     """
     Получить квартиру по ID
-    
+
     Args:
         apartment_id: ID квартиры
-    
+
     Returns:
         Словарь с данными квартиры или None
     """
-    url = f"{API_BASE_URL}/apartments/{apartment_id}/"
-    
-    async with aiohttp.ClientSession() as session:
-        try:
-            async with session.get(url) as response:
-                if response.status == 200:
-                    return await response.json()
-                else:
-                    return None
-        except Exception as e:
-            print(f"Ошибка при запросе к API: {e}")
-            return None
+    return await api_client.get_json(f'/apartments/{apartment_id}/')
+
+
+async def get_apartments_by_ids(apartment_ids: List[int], chunk_size: int = BATCH_CHUNK_SIZE) -> List[Dict]:
+    """
+    Получить несколько квартир по ID
+
+    Args:
+        apartment_ids: Список ID квартир
+        chunk_size: Сколько ID отправлять в одном запросе
+
+    Returns:
+        Найденные квартиры в порядке переданных ID (отсутствующие пропускаются)
+    """
+    ids = list(dict.fromkeys(apartment_ids))
+    if not ids:
+        return []
+
+    # Пачки запрашиваются параллельно через общий пул соединений
+    chunks = [ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size)]
+    responses = await asyncio.gather(*(
+        api_client.get_json('/apartments/batch/', [('ids', ','.join(str(pk) for pk in chunk))])
+        for chunk in chunks
+    ))
+
+    by_id = {}
+    for data in responses:
+        if data is None:
+            continue
+        for apartment in data.get('results', []):
+            by_id[apartment['id']] = apartment
+    return [by_id[pk] for pk in ids if pk in by_id]
+
 
+async def lookup_apartments(text: str, limit: int = LOOKUP_LIMIT) -> Optional[List[Dict]]:
+    """
+    Найти квартиры по неточному адресу или ориентиру
+
+    Args:
+        text: Запрос пользователя, например «юнусабад 4 кв»
+        limit: Сколько вариантов вернуть
+
+    Returns:
+        Квартиры по убыванию сходства (с matched_value и similarity)
+        или None, если backend недоступен
+    """
+    data = await api_client.get_json('/apartments/lookup/', [('q', text), ('limit', limit)])
+    if data is None:
+        return None
+    return data.get('results', [])
+
+
+async def get_apartment_changes(since_id: Optional[int] = None, limit: int = 50) -> Optional[Dict]:
+    """
+    Получить квартиры, добавленные после since_id (лента для уведомлений)
+
+    Args:
+        since_id: ID последней обработанной квартиры (None — узнать текущий курсор)
+        limit: Размер пачки
+
+    Returns:
+        Словарь с results, next_cursor и has_more или None при ошибке
+    """
+    params = [('limit', limit)]
+    if since_id is not None:
+        params.append(('since_id', since_id))
 
+    return await api_client.get_json('/apartments/changes/', params)
@@ -0,0 +1,125 @@
+"""
+In-process кэш ответов API с TTL, stale-while-revalidate и склейкой запросов
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple
+
+Fetcher = Callable[[], Awaitable[Optional[Any]]]
+
+
+class AsyncTTLCache:
+    """
+    Кэш результатов асинхронных запросов.
+
+    - Свежие записи (моложе ttl) отдаются сразу.
+    - Устаревшие, но моложе stale_ttl, тоже отдаются сразу, а в фоне
+      запускается одно обновление на ключ.
+    - Одновременные промахи по одному ключу ждут один общий запрос.
+    - Размер ограничен: вытесняются давно не использованные записи.
+    - Результат None (ошибка backend) не кэшируется.
+    """
+
+    def __init__(self, ttl: float, stale_ttl: float, maxsize: int):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        # key -> (время сохранения, значение)
+        self._items: 'OrderedDict[Hashable, Tuple[float, Any]]' = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._refreshing: Set[Hashable] = set()
+        # Ссылки на фоновые обновления, чтобы задачи не собрал GC
+        self._tasks: Set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def clear(self):
+        self._items.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'size': len(self._items),
+        }
+
+    def _store(self, key: Hashable, value: Any):
+        self._items[key] = (time.monotonic(), value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    async def _load(self, key: Hashable, fetch: Fetcher) -> Optional[Any]:
+        try:
+            value = await fetch()
+            if value is not None:
+                self._store(key, value)
+            return value
+        finally:
+            del self._inflight[key]
+
+    @staticmethod
+    def _consume_result(task: asyncio.Task):
+        # Все ожидающие могли быть отменены: помечаем исключение как полученное
+        if not task.cancelled():
+            task.exception()
+
+    async def _fetch(self, key: Hashable, fetch: Fetcher) -> Optional[Any]:
+        """
+        Выполнить запрос, склеивая одновременные вызовы по одному ключу.
+        Запрос идёт в отдельной задаче, а вызывающие ждут её через shield:
+        отмена одного из них не прерывает запрос для остальных.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key, fetch))
+            task.add_done_callback(self._consume_result)
+            self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _refresh(self, key: Hashable, fetch: Fetcher):
+        try:
+            await self._fetch(key, fetch)
+        except Exception as e:
+            print(f"[CACHE] Ошибка фонового обновления {key}: {e}")
+        finally:
+            self._refreshing.discard(key)
+
+    async def get_or_fetch(self, key: Hashable, fetch: Fetcher) -> Optional[Any]:
+        """
+        Получить значение из кэша или запросить его
+
+        Args:
+            key: Хэшируемый ключ запроса
+            fetch: Корутина-фабрика, выполняющая запрос
+
+        Returns:
+            Значение или None, если запрос не удался и в кэше ничего нет
+        """
+        item = self._items.get(key)
+        if item is not None:
+            stored_at, value = item
+            age = time.monotonic() - stored_at
+            if age < self.ttl:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return value
+            if age < self.stale_ttl:
+                self._items.move_to_end(key)
+                self.stale_hits += 1
+                if key not in self._refreshing and key not in self._inflight:
+                    self._refreshing.add(key)
+                    task = asyncio.create_task(self._refresh(key, fetch))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+                return value
+            del self._items[key]
+
+        self.misses += 1
+        return await self._fetch(key, fetch)
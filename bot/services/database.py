@@ -1,120 +1,807 @@
+import asyncio
 import sqlite3
 import json
-from typing import Optional, Dict, List
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from typing import Optional, Dict, List, Iterable, Iterator, Tuple
 from pathlib import Path
 
 DB_PATH = Path(__file__).parent.parent.parent / 'bot.db'
 
+# Статусы доставки в очереди уведомлений
+OUTBOX_PENDING = 'pending'
+OUTBOX_SENT = 'sent'
+OUTBOX_FAILED = 'failed'
+OUTBOX_BLOCKED = 'blocked'
+
+# Аренда координатора рассылки: только её владелец читает ленту новых квартир
+COORDINATOR_LEASE = 'coordinator'
+
+
+class LeaseLostError(Exception):
+    """Аренда истекла или перешла к другому процессу"""
+
+
+# Настройки соединения: WAL позволяет читать во время записи,
+# busy_timeout ждёт блокировку вместо немедленной ошибки
+DB_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA busy_timeout=5000',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA cache_size=-16000',
+)
+# Сколько подготовленных запросов sqlite3 держит на соединение
+DB_STATEMENT_CACHE_SIZE = 256
+
+# Битовые маски категориальных фильтров подписки: значение -> номер бита.
+# Маска 0 означает "Не важно"; значения вне словаря получают общий бит,
+# а сами значения хранятся в subscription_values для точной сверки
+SUBSCRIPTION_MASK_VALUES = {
+    'type': ('Новостройка', 'Вторичное жильё'),
+    'district': (
+        'Мирабадский', 'Мирзо-Улугбекский', 'Юнусабадский',
+        'Шайхантохурский', 'Яккасарайский', 'Яшнабадский',
+    ),
+    'condition': ('С ремонтом', 'Без ремонта', 'Среднее состояние'),
+}
+SUBSCRIPTION_OTHER_BIT = 1 << 62
+# Район в subscription_match для подписок с районом "Не важно"
+SUBSCRIPTION_ANY_DISTRICT = '*'
+# Диапазонные фильтры: ключ списка диапазонов, флаг "Не важно", поле квартиры
+SUBSCRIPTION_RANGES = (
+    ('area_ranges', 'area_any', 'area'),
+    ('price_ranges', 'price_any', 'price'),
+)
+# Сколько строк подписчиков читать из курсора за раз
+SUBSCRIBERS_FETCH_SIZE = 1000
+
+_local = threading.local()
+
 
 def get_connection():
-    """Получить соединение с БД"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+    """
+    Получить соединение с БД
+
+    Соединение одно на поток и живёт до close_connection(), поэтому
+    подготовленные запросы переиспользуются между вызовами.
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = sqlite3.connect(DB_PATH, cached_statements=DB_STATEMENT_CACHE_SIZE)
+        conn.row_factory = sqlite3.Row
+        for pragma in DB_PRAGMAS:
+            conn.execute(pragma)
+        _local.conn = conn
     return conn
 
 
-def init_db():
-    """Инициализация базы данных"""
+def close_connection():
+    """Закрыть соединение текущего потока"""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+
+@contextmanager
+def _transaction(immediate: bool = False):
+    """
+    Курсор в транзакции: фиксация при успехе, откат при ошибке
+
+    immediate=True сразу берёт блокировку записи, чтобы прочитанное
+    внутри транзакции не изменил другой процесс до записи.
+    """
     conn = get_connection()
-    cursor = conn.cursor()
+    if immediate:
+        conn.execute('BEGIN IMMEDIATE')
+    try:
+        yield conn.cursor()
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+def value_bit(key: str, value) -> int:
+    """Бит значения категориального фильтра (комнаты — по числу комнат)"""
+    if key == 'rooms':
+        return 1 << value if isinstance(value, int) and 0 <= value < 62 else SUBSCRIPTION_OTHER_BIT
+    values = SUBSCRIPTION_MASK_VALUES[key]
+    return 1 << values.index(value) if value in values else SUBSCRIPTION_OTHER_BIT
+
 
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS subscriptions (
-            user_id INTEGER PRIMARY KEY,
-            filters TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+def _parse_range(key: str, value: str) -> Tuple[float, float]:
+    """Разбирает диапазон вида 'min:max' (цена — в целых долларах)"""
+    parts = value.split(':')
+    if key == 'price_ranges':
+        low = int(float(parts[0])) if parts[0] else 0
+        high = int(float(parts[1])) if len(parts) > 1 and parts[1] else float('inf')
+    else:
+        low = float(parts[0]) if parts[0] else 0
+        high = float(parts[1]) if len(parts) > 1 and parts[1] else float('inf')
+    return low, high
+
+
+def subscription_columns(filters: Dict) -> Tuple[Tuple[int, ...], List[Tuple[str, float, float]], List[Tuple[str, object]]]:
+    """
+    Раскладывает фильтры подписки по колонкам таблицы subscriptions
+
+    Семантика совпадает с проверкой JSON-фильтров apartment_matches_filters
+    (benchmarks/subscription_matching.py).
+
+    Args:
+        filters: Фильтры подписки
+
+    Returns:
+        Кортеж (type_mask, district_mask, condition_mask, rooms_mask, area_any, price_any),
+        список диапазонов (поле, min, max) для subscription_ranges
+        и список значений вне словаря (поле, значение) для subscription_values
+    """
+    masks = []
+    other_values = []
+    for key in ('type', 'district', 'condition', 'rooms'):
+        mask = 0
+        if filters.get(key) and not filters.get(f'{key}_any'):
+            for value in filters[key]:
+                bit = value_bit(key, value)
+                mask |= bit
+                if bit == SUBSCRIPTION_OTHER_BIT:
+                    other_values.append((key, value))
+        masks.append(mask)
+
+    flags = []
+    ranges = []
+    for key, any_key, field in SUBSCRIPTION_RANGES:
+        if filters.get(key) and not filters.get(any_key):
+            flags.append(0)
+            for value in filters[key]:
+                try:
+                    ranges.append((field,) + _parse_range(key, value))
+                except (ValueError, AttributeError) as e:
+                    print(f"[DATABASE] Некорректный диапазон '{value}' ({key}): {e}")
+        else:
+            flags.append(1)
+    return tuple(masks + flags), ranges, other_values
+
+
+def _subscription_districts(filters: Dict) -> List:
+    """Районы подписки для subscription_match: выбранные или '*' для «Не важно»"""
+    if filters.get('district') and not filters.get('district_any'):
+        return list(filters['district'])
+    return [SUBSCRIPTION_ANY_DISTRICT]
+
+
+def _write_subscriptions(cursor, subscriptions: List[Tuple[int, Dict]]):
+    """Записывает подписки вместе с колонками фильтров и диапазонами"""
+    rows = []
+    ranges = []
+    other_values = []
+    match_rows = []
+    for user_id, filters in subscriptions:
+        columns, user_ranges, user_values = subscription_columns(filters)
+        rows.append((user_id, json.dumps(filters)) + columns)
+        ranges.extend((user_id, field, low, high) for field, low, high in user_ranges)
+        other_values.extend((user_id, field, value) for field, value in user_values)
+        type_mask, _, condition_mask, rooms_mask, area_any, price_any = columns
+        match_rows.extend(
+            (district, user_id, type_mask, condition_mask, rooms_mask, area_any, price_any)
+            for district in _subscription_districts(filters)
+        )
+
+    cursor.executemany('''
+        INSERT OR REPLACE INTO subscriptions (
+            user_id, filters, is_active,
+            type_mask, district_mask, condition_mask, rooms_mask, area_any, price_any
         )
-    ''')
-
-    # Таблица для отслеживания последних проверенных квартир
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS last_check (
-            id INTEGER PRIMARY KEY,
-            last_apartment_id INTEGER,
-            checked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        VALUES (?, ?, 1, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+    cursor.executemany('DELETE FROM subscription_ranges WHERE user_id = ?', [(row[0],) for row in rows])
+    cursor.executemany(
+        'INSERT OR IGNORE INTO subscription_ranges (user_id, field, min_value, max_value) VALUES (?, ?, ?, ?)',
+        ranges
+    )
+    cursor.executemany('DELETE FROM subscription_values WHERE user_id = ?', [(row[0],) for row in rows])
+    cursor.executemany(
+        'INSERT OR IGNORE INTO subscription_values (user_id, field, value) VALUES (?, ?, ?)',
+        other_values
+    )
+    cursor.executemany('DELETE FROM subscription_match WHERE user_id = ?', [(row[0],) for row in rows])
+    cursor.executemany('''
+        INSERT OR IGNORE INTO subscription_match (
+            district, user_id, type_mask, condition_mask, rooms_mask, area_any, price_any
         )
-    ''')
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', match_rows)
+
+
+def init_db():
+    """Инициализация базы данных"""
+    with _transaction() as cursor:
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS subscriptions (
+                user_id INTEGER PRIMARY KEY,
+                filters TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
 
-    conn.commit()
-    conn.close()
+        # Таблица для отслеживания последних проверенных квартир
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS last_check (
+                id INTEGER PRIMARY KEY,
+                last_apartment_id INTEGER,
+                checked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        # Очередь уведомлений: одна строка на пару (пользователь, квартира)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS notification_outbox (
+                user_id INTEGER NOT NULL,
+                apartment_id INTEGER NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_retry_at INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (user_id, apartment_id)
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_outbox_due
+            ON notification_outbox (status, next_retry_at)
+        ''')
+
+        # Аренды процессов рассылки: координатор, шарды подписчиков, живые узлы
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS notifier_leases (
+                name TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        ''')
+        # Запросы внеочередной проверки ленты для координатора из других процессов
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS notifier_signals (
+                name TEXT PRIMARY KEY,
+                requested_at REAL NOT NULL
+            )
+        ''')
+
+        # Снимок квартиры на момент постановки в очередь, общий для всех получателей
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS outbox_apartments (
+                apartment_id INTEGER PRIMARY KEY,
+                payload TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        # file_id фотографий, уже загруженных в Telegram (по ID ApartmentImage)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS telegram_file_ids (
+                image_id INTEGER PRIMARY KEY,
+                image_path TEXT NOT NULL,
+                file_id TEXT NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        # Пользователи, заблокировавшие бота, деактивируются вместо удаления
+        columns = {row[1] for row in cursor.execute('PRAGMA table_info(subscriptions)')}
+        if 'is_active' not in columns:
+            cursor.execute('ALTER TABLE subscriptions ADD COLUMN is_active INTEGER NOT NULL DEFAULT 1')
+
+        # Диапазоны площади и цены подписок: одна строка на выбранный диапазон
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS subscription_ranges (
+                user_id INTEGER NOT NULL,
+                field TEXT NOT NULL,
+                min_value REAL NOT NULL,
+                max_value REAL NOT NULL,
+                PRIMARY KEY (user_id, field, min_value, max_value)
+            ) WITHOUT ROWID
+        ''')
+
+        # Значения категориальных фильтров вне словаря масок: общий бит в маске
+        # отбирает кандидатов, а совпадение проверяется по точному значению.
+        # Колонка value без типа: комнаты сравниваются как числа, остальное как строки
+        has_values_table = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'subscription_values'"
+        ).fetchone()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS subscription_values (
+                user_id INTEGER NOT NULL,
+                field TEXT NOT NULL,
+                value NOT NULL,
+                PRIMARY KEY (user_id, field, value)
+            ) WITHOUT ROWID
+        ''')
+
+        # Индекс подбора: строка на каждый район активной подписки ('*' — "Не важно")
+        # с масками остальных фильтров. Подбор читает только строки района
+        # квартиры подряд по ключу, не обходя все подписки.
+        # Колонка district без типа, как value в subscription_values
+        has_match_table = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'subscription_match'"
+        ).fetchone()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS subscription_match (
+                district NOT NULL,
+                user_id INTEGER NOT NULL,
+                type_mask INTEGER NOT NULL,
+                condition_mask INTEGER NOT NULL,
+                rooms_mask INTEGER NOT NULL,
+                area_any INTEGER NOT NULL,
+                price_any INTEGER NOT NULL,
+                PRIMARY KEY (district, user_id)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_subscription_match_user ON subscription_match (user_id)')
+
+        # Фильтры в колонках: подбор подписчиков идёт запросом, без разбора JSON.
+        # Старые подписки хранят только JSON и переносятся в колонки один раз
+        if 'type_mask' not in columns:
+            for column, default in (
+                ('type_mask', 0), ('district_mask', 0), ('condition_mask', 0), ('rooms_mask', 0),
+                ('area_any', 1), ('price_any', 1),
+            ):
+                cursor.execute(f'ALTER TABLE subscriptions ADD COLUMN {column} INTEGER NOT NULL DEFAULT {default}')
+            _migrate_subscription_filters(cursor)
+        elif not has_values_table or not has_match_table:
+            # Колонки уже заполнены, но значений вне словаря или индекса подбора ещё нет
+            _migrate_subscription_filters(cursor)
+
+        # Индекс полного обхода активных подписок: подбор теперь идёт по subscription_match
+        cursor.execute('DROP INDEX IF EXISTS idx_subscriptions_match')
+
+
+def _migrate_subscription_filters(cursor):
+    """Заполнить колонки фильтров у подписок, сохранённых только в JSON"""
+    rows = cursor.execute('SELECT user_id, filters, is_active FROM subscriptions').fetchall()
+    if not rows:
+        return
+    _write_subscriptions(cursor, [(row[0], json.loads(row[1])) for row in rows])
+    # INSERT OR REPLACE включил все подписки: возвращаем отключённые
+    inactive = [(row[0],) for row in rows if not row[2]]
+    cursor.executemany('UPDATE subscriptions SET is_active = 0 WHERE user_id = ?', inactive)
+    cursor.executemany('DELETE FROM subscription_match WHERE user_id = ?', inactive)
+    print(f"[DATABASE] Фильтры подписок перенесены в колонки: {len(rows)}")
 
 
 def add_subscription(user_id: int, filters: Dict):
     """Добавить подписку пользователя"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        INSERT OR REPLACE INTO subscriptions (user_id, filters)
-        VALUES (?, ?)
-    ''', (user_id, json.dumps(filters)))
-    
-    conn.commit()
-    conn.close()
+    with _transaction() as cursor:
+        _write_subscriptions(cursor, [(user_id, filters)])
+
+
+def add_subscriptions_many(subscriptions: Iterable[Tuple[int, Dict]]):
+    """Добавить несколько подписок одной транзакцией: (user_id, фильтры)"""
+    with _transaction() as cursor:
+        _write_subscriptions(cursor, list(subscriptions))
 
 
 def remove_subscription(user_id: int):
     """Удалить подписку пользователя"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('DELETE FROM subscriptions WHERE user_id = ?', (user_id,))
-    
-    conn.commit()
-    conn.close()
+    with _transaction() as cursor:
+        cursor.execute('DELETE FROM subscriptions WHERE user_id = ?', (user_id,))
+        cursor.execute('DELETE FROM subscription_ranges WHERE user_id = ?', (user_id,))
+        cursor.execute('DELETE FROM subscription_values WHERE user_id = ?', (user_id,))
+        cursor.execute('DELETE FROM subscription_match WHERE user_id = ?', (user_id,))
 
 
 def get_subscription(user_id: int) -> Optional[Dict]:
     """Получить подписку пользователя"""
-    conn = get_connection()
-    cursor = conn.cursor()
+    cursor = get_connection().cursor()
     
-    cursor.execute('SELECT filters FROM subscriptions WHERE user_id = ?', (user_id,))
+    cursor.execute('SELECT filters FROM subscriptions WHERE user_id = ? AND is_active = 1', (user_id,))
     row = cursor.fetchone()
     
-    conn.close()
-    
     if row:
         return json.loads(row[0])
     return None
 
 
 def get_all_subscriptions() -> List[Dict]:
-    """Получить все подписки"""
-    conn = get_connection()
-    cursor = conn.cursor()
+    """Получить все активные подписки"""
+    cursor = get_connection().cursor()
 
-    cursor.execute('SELECT user_id, filters FROM subscriptions')
+    cursor.execute('SELECT user_id, filters FROM subscriptions WHERE is_active = 1')
     rows = cursor.fetchall()
 
-    conn.close()
-
     return [{'user_id': row[0], 'filters': json.loads(row[1])} for row in rows]
 
 
+# Подписчики, фильтрам которых соответствует квартира.
+# Кандидаты — строки subscription_match с районом квартиры или '*': два
+# отрезка первичного ключа, остальные подписки не читаются. Маски кандидатов
+# лежат в тех же строках; диапазоны проверяются по первичному ключу
+# subscription_ranges, значения вне словаря — по subscription_values.
+_MATCHING_SUBSCRIBERS_SQL = '''
+    FROM subscription_match s
+    WHERE s.district IN (:district, :any_district)
+        AND (s.type_mask = 0 OR (s.type_mask & :type_bit AND (:type_bit != :other_bit OR EXISTS (
+            SELECT 1 FROM subscription_values v
+            WHERE v.user_id = s.user_id AND v.field = 'type' AND v.value = :type
+        ))))
+        AND (s.condition_mask = 0 OR (s.condition_mask & :condition_bit AND (:condition_bit != :other_bit OR EXISTS (
+            SELECT 1 FROM subscription_values v
+            WHERE v.user_id = s.user_id AND v.field = 'condition' AND v.value = :condition
+        ))))
+        AND (s.rooms_mask = 0 OR (s.rooms_mask & :rooms_bit AND (:rooms_bit != :other_bit OR EXISTS (
+            SELECT 1 FROM subscription_values v
+            WHERE v.user_id = s.user_id AND v.field = 'rooms' AND v.value = :rooms
+        ))))
+        AND (s.area_any = 1 OR EXISTS (
+            SELECT 1 FROM subscription_ranges r
+            WHERE r.user_id = s.user_id AND r.field = 'area' AND r.min_value <= :area AND r.max_value >= :area
+        ))
+        AND (s.price_any = 1 OR EXISTS (
+            SELECT 1 FROM subscription_ranges r
+            WHERE r.user_id = s.user_id AND r.field = 'price' AND r.min_value <= :price AND r.max_value >= :price
+        ))
+'''
+
+
+def _matching_params(apartment: Dict) -> Dict:
+    params = {'other_bit': SUBSCRIPTION_OTHER_BIT, 'any_district': SUBSCRIPTION_ANY_DISTRICT}
+    params['district'] = apartment['district']
+    for key in ('type', 'condition', 'rooms'):
+        params[key] = apartment[key]
+        params[f'{key}_bit'] = value_bit(key, apartment[key])
+    params['area'] = apartment['area']
+    params['price'] = apartment['price']
+    return params
+
+
+def iter_matching_subscribers(apartment: Dict) -> Iterator[int]:
+    """
+    Перебрать ID подписчиков, фильтрам которых соответствует квартира
+
+    Строки читаются из курсора порциями, все подписки в память не загружаются.
+
+    Args:
+        apartment: Данные квартиры
+
+    Returns:
+        Итератор user_id в порядке возрастания
+    """
+    cursor = get_connection().cursor()
+    cursor.execute('SELECT s.user_id ' + _MATCHING_SUBSCRIBERS_SQL + ' ORDER BY s.user_id', _matching_params(apartment))
+    while True:
+        rows = cursor.fetchmany(SUBSCRIBERS_FETCH_SIZE)
+        if not rows:
+            break
+        for row in rows:
+            yield row[0]
+
+
 def get_last_checked_apartment_id() -> Optional[int]:
     """Получить ID последней проверенной квартиры"""
-    conn = get_connection()
-    cursor = conn.cursor()
+    cursor = get_connection().cursor()
 
     cursor.execute('SELECT last_apartment_id FROM last_check WHERE id = 1')
     row = cursor.fetchone()
 
-    conn.close()
-
     return row[0] if row else None
 
 
 def update_last_checked_apartment_id(apartment_id: int):
     """Обновить ID последней проверенной квартиры"""
-    conn = get_connection()
-    cursor = conn.cursor()
+    with _transaction() as cursor:
+        cursor.execute('''
+            INSERT OR REPLACE INTO last_check (id, last_apartment_id, checked_at)
+            VALUES (1, ?, CURRENT_TIMESTAMP)
+        ''', (apartment_id,))
+
+
+def deactivate_subscriptions(user_ids: Iterable[int]):
+    """Отключить подписки пользователей, заблокировавших бота"""
+    with _transaction() as cursor:
+        params = [(user_id,) for user_id in user_ids]
+        cursor.executemany('UPDATE subscriptions SET is_active = 0 WHERE user_id = ?', params)
+        cursor.executemany('DELETE FROM subscription_match WHERE user_id = ?', params)
+        # Недоставленные уведомления этим пользователям больше не отправляем
+        cursor.executemany(
+            'UPDATE notification_outbox SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE user_id = ? AND status = ?',
+            [(OUTBOX_BLOCKED, user_id, OUTBOX_PENDING) for (user_id,) in params]
+        )
+
+
+def enqueue_notifications(apartments: List[Dict], last_apartment_id: int, owner: Optional[str] = None) -> Dict[int, int]:
+    """
+    Поставить в очередь уведомления подходящим подписчикам и сдвинуть курсор одной транзакцией
+
+    Подписчики подбираются запросом INSERT ... SELECT прямо в SQLite,
+    их ID не проходят через Python.
+
+    Args:
+        apartments: Новые квартиры
+        last_apartment_id: Новое значение ID последней проверенной квартиры
+        owner: Владелец аренды координатора; если аренда уже не его,
+            ничего не записывается и выбрасывается LeaseLostError
+
+    Returns:
+        Словарь apartment_id -> количество поставленных в очередь уведомлений
+    """
+    queued = {}
+    with _transaction(immediate=owner is not None) as cursor:
+        if owner is not None and not _lease_held(cursor, COORDINATOR_LEASE, owner):
+            raise LeaseLostError(COORDINATOR_LEASE)
+        for apartment in apartments:
+            params = _matching_params(apartment)
+            params['apartment_id'] = apartment['id']
+            cursor.execute(
+                'INSERT OR IGNORE INTO notification_outbox (user_id, apartment_id) '
+                'SELECT s.user_id, :apartment_id ' + _MATCHING_SUBSCRIBERS_SQL,
+                params
+            )
+            queued[apartment['id']] = cursor.rowcount
+            if cursor.rowcount:
+                cursor.execute(
+                    'INSERT OR IGNORE INTO outbox_apartments (apartment_id, payload) VALUES (?, ?)',
+                    (apartment['id'], json.dumps(apartment))
+                )
+        cursor.execute('''
+            INSERT OR REPLACE INTO last_check (id, last_apartment_id, checked_at)
+            VALUES (1, ?, CURRENT_TIMESTAMP)
+        ''', (last_apartment_id,))
+    return queued
+
+
+def get_due_notifications(limit: int = 100, shard: int = 0, shards: int = 1, claim_seconds: int = 0) -> List[Dict]:
+    """
+    Получить пачку уведомлений, которые пора отправить
+
+    Args:
+        limit: Размер пачки
+        shard: Номер шарда: берутся только получатели с user_id % shards == shard
+        shards: Общее число шардов
+        claim_seconds: На сколько секунд скрыть выбранные уведомления от других
+            процессов. Если процесс упадёт, не сохранив результат, они снова
+            станут доступны по истечении этого времени
+    """
+    now = int(time.time())
+    with _transaction(immediate=bool(claim_seconds)) as cursor:
+        cursor.execute('''
+            SELECT o.user_id, o.apartment_id, o.attempts, a.payload
+            FROM notification_outbox o
+            JOIN outbox_apartments a ON a.apartment_id = o.apartment_id
+            WHERE o.status = ? AND o.next_retry_at <= ? AND o.user_id % ? = ?
+            ORDER BY o.apartment_id, o.user_id
+            LIMIT ?
+        ''', (OUTBOX_PENDING, now, shards, shard, limit))
+        rows = cursor.fetchall()
+        if claim_seconds:
+            cursor.executemany(
+                'UPDATE notification_outbox SET next_retry_at = ? WHERE user_id = ? AND apartment_id = ?',
+                [(now + claim_seconds, row['user_id'], row['apartment_id']) for row in rows]
+            )
+
+    return [
+        {
+            'user_id': row['user_id'],
+            'apartment_id': row['apartment_id'],
+            'attempts': row['attempts'],
+            'apartment': json.loads(row['payload']),
+        }
+        for row in rows
+    ]
+
+
+def record_notification_results(
+    sent: Iterable[Tuple[int, int]],
+    retry: Iterable[Tuple[int, int, int, str]],
+    failed: Iterable[Tuple[int, int, str]],
+    blocked: Iterable[Tuple[int, int, str]],
+):
+    """
+    Сохранить результаты доставки пачки одной транзакцией
+
+    Args:
+        sent: Пары (user_id, apartment_id)
+        retry: (user_id, apartment_id, next_retry_at, ошибка) — повторить позже
+        failed: (user_id, apartment_id, ошибка) — попытки исчерпаны
+        blocked: (user_id, apartment_id, ошибка) — пользователь заблокировал бота
+    """
+    with _transaction() as cursor:
+        cursor.executemany('''
+            UPDATE notification_outbox
+            SET status = ?, attempts = attempts + 1, last_error = NULL, updated_at = CURRENT_TIMESTAMP
+            WHERE user_id = ? AND apartment_id = ?
+        ''', [(OUTBOX_SENT, user_id, apartment_id) for user_id, apartment_id in sent])
+        cursor.executemany('''
+            UPDATE notification_outbox
+            SET attempts = attempts + 1, next_retry_at = ?, last_error = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE user_id = ? AND apartment_id = ?
+        ''', [(next_retry_at, error, user_id, apartment_id) for user_id, apartment_id, next_retry_at, error in retry])
+        for status, rows in ((OUTBOX_FAILED, failed), (OUTBOX_BLOCKED, blocked)):
+            cursor.executemany('''
+                UPDATE notification_outbox
+                SET status = ?, attempts = attempts + 1, last_error = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE user_id = ? AND apartment_id = ?
+            ''', [(status, error, user_id, apartment_id) for user_id, apartment_id, error in rows])
+
+
+def purge_outbox(days: int = 7):
+    """Удалить завершённые уведомления старше указанного срока"""
+    with _transaction() as cursor:
+        cursor.execute('''
+            DELETE FROM notification_outbox
+            WHERE status != ? AND updated_at < datetime('now', ?)
+        ''', (OUTBOX_PENDING, f'-{days} days'))
+        cursor.execute('''
+            DELETE FROM outbox_apartments
+            WHERE apartment_id NOT IN (SELECT DISTINCT apartment_id FROM notification_outbox)
+        ''')
+
+
+def get_all_file_ids() -> Dict[int, Tuple[str, str]]:
+    """Получить сохранённые file_id: image_id -> (путь изображения, file_id)"""
+    cursor = get_connection().cursor()
+
+    cursor.execute('SELECT image_id, image_path, file_id FROM telegram_file_ids')
+    rows = cursor.fetchall()
+
+    return {row[0]: (row[1], row[2]) for row in rows}
+
+
+def save_file_ids(entries: Iterable[Tuple[int, str, str]]):
+    """Сохранить file_id загруженных фотографий: (image_id, путь, file_id)"""
+    with _transaction() as cursor:
+        cursor.executemany('''
+            INSERT OR REPLACE INTO telegram_file_ids (image_id, image_path, file_id, updated_at)
+            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+        ''', list(entries))
+
+
+def _lease_held(cursor, name: str, owner: str) -> bool:
+    cursor.execute(
+        'SELECT 1 FROM notifier_leases WHERE name = ? AND owner = ? AND expires_at >= ?',
+        (name, owner, time.time())
+    )
+    return cursor.fetchone() is not None
+
+
+def acquire_lease(name: str, owner: str, ttl: float) -> bool:
+    """
+    Взять или продлить аренду
+
+    Args:
+        name: Имя аренды
+        owner: Идентификатор процесса
+        ttl: Срок аренды в секундах
+
+    Returns:
+        True, если аренда принадлежит owner до now + ttl
+    """
+    now = time.time()
+    with _transaction() as cursor:
+        # Чужую аренду можно забрать только после её истечения
+        cursor.execute('''
+            INSERT INTO notifier_leases (name, owner, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+            WHERE notifier_leases.owner = excluded.owner OR notifier_leases.expires_at < ?
+        ''', (name, owner, now + ttl, now))
+        return cursor.rowcount > 0
+
+
+def release_lease(name: str, owner: str):
+    """Отдать аренду, если она принадлежит owner"""
+    with _transaction() as cursor:
+        cursor.execute('DELETE FROM notifier_leases WHERE name = ? AND owner = ?', (name, owner))
+
+
+def count_live_leases(prefix: str) -> int:
+    """Сколько неистёкших аренд с именем, начинающимся с prefix"""
+    cursor = get_connection().cursor()
+    cursor.execute(
+        'SELECT COUNT(*) FROM notifier_leases WHERE name >= ? AND name < ? AND expires_at >= ?',
+        (prefix, prefix + '\uffff', time.time())
+    )
+    return cursor.fetchone()[0]
+
+
+def request_feed_check():
+    """Попросить координатора рассылки проверить ленту новых квартир"""
+    with _transaction() as cursor:
+        cursor.execute(
+            'INSERT OR REPLACE INTO notifier_signals (name, requested_at) VALUES (?, ?)',
+            ('feed_check', time.time())
+        )
+
+
+def take_feed_check_request() -> bool:
+    """Забрать запрос проверки ленты; True, если он был"""
+    with _transaction() as cursor:
+        cursor.execute('DELETE FROM notifier_signals WHERE name = ?', ('feed_check',))
+        return cursor.rowcount > 0
+
+
+class AsyncDatabase:
+    """
+    Асинхронный доступ к БД для обработчиков и notifier.
+
+    Функции модуля выполняются в отдельном потоке с собственным
+    долгоживущим соединением, поэтому event loop не ждёт диск.
+    Поток один: записи идут последовательно, без конкуренции за блокировку.
+    """
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='bot-db')
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, partial(func, *args))
+
+    async def add_subscription(self, user_id: int, filters: Dict):
+        await self._run(add_subscription, user_id, filters)
+
+    async def add_subscriptions_many(self, subscriptions: Iterable[Tuple[int, Dict]]):
+        await self._run(add_subscriptions_many, list(subscriptions))
+
+    async def remove_subscription(self, user_id: int):
+        await self._run(remove_subscription, user_id)
+
+    async def get_subscription(self, user_id: int) -> Optional[Dict]:
+        return await self._run(get_subscription, user_id)
+
+    async def get_all_subscriptions(self) -> List[Dict]:
+        return await self._run(get_all_subscriptions)
+
+    async def deactivate_subscriptions(self, user_ids: Iterable[int]):
+        await self._run(deactivate_subscriptions, list(user_ids))
+
+    async def get_last_checked_apartment_id(self) -> Optional[int]:
+        return await self._run(get_last_checked_apartment_id)
+
+    async def update_last_checked_apartment_id(self, apartment_id: int):
+        await self._run(update_last_checked_apartment_id, apartment_id)
+
+    async def enqueue_notifications(
+        self, apartments: List[Dict], last_apartment_id: int, owner: Optional[str] = None
+    ) -> Dict[int, int]:
+        return await self._run(enqueue_notifications, apartments, last_apartment_id, owner)
+
+    async def get_due_notifications(
+        self, limit: int = 100, shard: int = 0, shards: int = 1, claim_seconds: int = 0
+    ) -> List[Dict]:
+        return await self._run(get_due_notifications, limit, shard, shards, claim_seconds)
+
+    async def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        return await self._run(acquire_lease, name, owner, ttl)
+
+    async def release_lease(self, name: str, owner: str):
+        await self._run(release_lease, name, owner)
+
+    async def count_live_leases(self, prefix: str) -> int:
+        return await self._run(count_live_leases, prefix)
+
+    async def request_feed_check(self):
+        await self._run(request_feed_check)
+
+    async def take_feed_check_request(self) -> bool:
+        return await self._run(take_feed_check_request)
+
+    async def record_notification_results(self, sent, retry, failed, blocked):
+        await self._run(record_notification_results, list(sent), list(retry), list(failed), list(blocked))
+
+    async def purge_outbox(self, days: int = 7):
+        await self._run(purge_outbox, days)
+
+    async def get_all_file_ids(self) -> Dict[int, Tuple[str, str]]:
+        return await self._run(get_all_file_ids)
+
+    async def save_file_ids(self, entries: Iterable[Tuple[int, str, str]]):
+        await self._run(save_file_ids, list(entries))
 
-    cursor.execute('''
-        INSERT OR REPLACE INTO last_check (id, last_apartment_id, checked_at)
-        VALUES (1, ?, CURRENT_TIMESTAMP)
-    ''', (apartment_id,))
+    async def close(self):
+        """Закрыть соединение потока БД (вызывается при остановке бота)"""
+        await self._run(close_connection)
 
-    conn.commit()
-    conn.close()
 
+db = AsyncDatabase()
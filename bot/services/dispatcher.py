@@ -0,0 +1,237 @@
+"""
+Параллельная рассылка сообщений с учётом лимитов Telegram
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+from aiogram.exceptions import TelegramRetryAfter
+
+# Глобальный лимит Telegram: около 30 сообщений в секунду на бота.
+# Скорость пополнения плюс запас ведра не превышают 30 за любую секунду,
+# а запас вмещает самую большую медиа-группу (10 фото). При рассылке из
+# нескольких процессов скорость и запас делятся между ними поровну.
+DEFAULT_RATE = 20
+DEFAULT_CAPACITY = 10
+# Не чаще одного отправления в секунду в один чат
+DEFAULT_PER_CHAT_INTERVAL = 1.0
+DEFAULT_WORKERS = 8
+MAX_RETRY_AFTER_ATTEMPTS = 3
+
+
+class TokenBucket:
+    """
+    Глобальный ограничитель скорости отправки.
+
+    Медиа-группа из N фото стоит N токенов. При TelegramRetryAfter
+    ведро ставится на паузу целиком, чтобы остановить всех воркеров.
+    """
+
+    def __init__(self, rate: float = DEFAULT_RATE, capacity: float = DEFAULT_CAPACITY):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated_at
+        self._updated_at = now
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+
+    async def acquire(self, cost: float = 1):
+        """
+        Ждёт, пока в ведре не наберётся cost токенов, и списывает их.
+        Медиа-группа дороже запаса ведра ждёт полного ведра и уходит в долг:
+        средняя скорость не превышает rate при любой ёмкости.
+        """
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._refill(now)
+                needed = min(cost, self.capacity)
+                if self._tokens >= needed:
+                    self._tokens -= cost
+                    return
+                await asyncio.sleep((needed - self._tokens) / self.rate)
+
+    def resize(self, rate: float, capacity: float):
+        """Меняет скорость и запас ведра (доля процесса в общем лимите бота)"""
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = min(self._tokens, capacity)
+
+    def pause(self, seconds: float):
+        """Останавливает выдачу токенов на указанное время"""
+        now = time.monotonic()
+        self._paused_until = max(self._paused_until, now + seconds)
+        self._tokens = 0
+        self._updated_at = self._paused_until
+
+
+@dataclass
+class DeliveryJob:
+    """Одно отправление: сообщение, фото или медиа-группа в один чат"""
+    chat_id: int
+    send: Callable[[], Awaitable]
+    cost: int = 1
+    label: str = ''
+    attempts: int = 0
+    created_at: float = field(default_factory=time.monotonic)
+    # Результат после dispatch: доставлено или последняя ошибка
+    delivered: bool = False
+    error: Optional[Exception] = None
+
+
+@dataclass
+class DispatchStats:
+    """Статистика рассылки"""
+    sent: int = 0
+    failed: int = 0
+    messages: int = 0
+    flood_waits: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+    finished_at: Optional[float] = None
+    lags: List[float] = field(default_factory=list)
+
+    @property
+    def duration(self) -> float:
+        end = self.finished_at if self.finished_at is not None else time.monotonic()
+        return end - self.started_at
+
+    @property
+    def throughput(self) -> float:
+        """Сообщений в секунду"""
+        return self.messages / self.duration if self.duration > 0 else 0.0
+
+    @property
+    def p95_lag(self) -> float:
+        """95-й перцентиль задержки от постановки в очередь до доставки"""
+        if not self.lags:
+            return 0.0
+        ordered = sorted(self.lags)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def __str__(self) -> str:
+        return (
+            f"отправлено: {self.sent}, ошибок: {self.failed}, сообщений: {self.messages}, "
+            f"flood wait: {self.flood_waits}, {self.throughput:.1f} msg/s, "
+            f"p95 задержка: {self.p95_lag:.2f} с"
+        )
+
+
+class NotificationDispatcher:
+    """
+    Пул воркеров, разбирающих очередь отправлений.
+
+    Каждый воркер перед отправкой ждёт свободный слот чата и токены
+    глобального ведра, поэтому параллельность не нарушает лимиты Telegram.
+    """
+
+    def __init__(
+        self,
+        workers: int = DEFAULT_WORKERS,
+        rate: float = DEFAULT_RATE,
+        capacity: float = DEFAULT_CAPACITY,
+        per_chat_interval: float = DEFAULT_PER_CHAT_INTERVAL,
+        bucket: Optional[TokenBucket] = None,
+    ):
+        self.workers = workers
+        self.per_chat_interval = per_chat_interval
+        self.bucket = bucket or TokenBucket(rate, capacity)
+        # Время, раньше которого в чат нельзя отправлять следующее сообщение
+        self._chat_next_slot: Dict[int, float] = {}
+        # Отправления в один чат идут строго по очереди
+        self._chat_locks: Dict[int, asyncio.Lock] = {}
+        self._chat_pending: Dict[int, int] = {}
+
+    async def _send_paced(self, job: DeliveryJob):
+        """Отправляет задание, соблюдая темп чата и глобальный лимит"""
+        chat_id = job.chat_id
+        lock = self._chat_locks.setdefault(chat_id, asyncio.Lock())
+        self._chat_pending[chat_id] = self._chat_pending.get(chat_id, 0) + 1
+        try:
+            async with lock:
+                delay = self._chat_next_slot.get(chat_id, 0.0) - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                await self.bucket.acquire(job.cost)
+                job.attempts += 1
+                try:
+                    await job.send()
+                finally:
+                    self._chat_next_slot[chat_id] = time.monotonic() + self.per_chat_interval
+        finally:
+            self._chat_pending[chat_id] -= 1
+            if not self._chat_pending[chat_id]:
+                del self._chat_pending[chat_id]
+                del self._chat_locks[chat_id]
+
+    def _forget_idle_chats(self):
+        now = time.monotonic()
+        for chat_id in [chat_id for chat_id, slot in self._chat_next_slot.items() if slot <= now]:
+            del self._chat_next_slot[chat_id]
+
+    async def _deliver(self, job: DeliveryJob, queue: asyncio.Queue, stats: DispatchStats):
+        try:
+            await self._send_paced(job)
+        except TelegramRetryAfter as e:
+            stats.flood_waits += 1
+            print(f"[DISPATCHER] Flood control, пауза {e.retry_after} с ({job.label or job.chat_id})")
+            self.bucket.pause(e.retry_after)
+            if job.attempts < MAX_RETRY_AFTER_ATTEMPTS:
+                await queue.put(job)
+            else:
+                job.error = e
+                stats.failed += 1
+            return
+        except Exception as e:
+            job.error = e
+            stats.failed += 1
+            print(f"[ERROR] Ошибка при отправке {job.label or job.chat_id}: {e}")
+            return
+
+        job.delivered = True
+        stats.sent += 1
+        stats.messages += job.cost
+        stats.lags.append(time.monotonic() - job.created_at)
+
+    async def _worker(self, queue: asyncio.Queue, stats: DispatchStats):
+        while True:
+            job = await queue.get()
+            try:
+                await self._deliver(job, queue, stats)
+            finally:
+                queue.task_done()
+
+    async def dispatch(self, jobs: Iterable[DeliveryJob]) -> DispatchStats:
+        """
+        Отправляет все задания и ждёт завершения
+
+        Args:
+            jobs: Отправления
+
+        Returns:
+            Статистика рассылки
+        """
+        stats = DispatchStats()
+        queue: asyncio.Queue = asyncio.Queue()
+        for job in jobs:
+            queue.put_nowait(job)
+
+        workers = [asyncio.create_task(self._worker(queue, stats)) for _ in range(self.workers)]
+        try:
+            await queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+        stats.finished_at = time.monotonic()
+        self._forget_idle_chats()
+        return stats
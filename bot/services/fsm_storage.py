@@ -0,0 +1,249 @@
+"""
+FSM-хранилище aiogram в SQLite: незаконченные поиски переживают перезапуск бота
+"""
+import asyncio
+import json
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Mapping, Optional, Set, Tuple
+
+from aiogram.exceptions import DataNotDictLikeError
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+FSM_DB_PATH = Path(__file__).parent.parent.parent / 'fsm.db'
+
+# Как часто сбрасывать изменения на диск и чистить брошенные сессии
+FSM_FLUSH_INTERVAL = 0.5
+FSM_EXPIRE_INTERVAL = 600
+# Сессия без изменений дольше TTL считается брошенной
+FSM_SESSION_TTL = 24 * 60 * 60
+
+
+class _Session:
+    __slots__ = ('state', 'data', 'touched_at')
+
+    def __init__(self, state: Optional[str] = None, data: Optional[Dict[str, Any]] = None, touched_at: float = 0.0):
+        self.state = state
+        self.data = data if data is not None else {}
+        self.touched_at = touched_at
+
+
+def _key_id(key: StorageKey) -> str:
+    return ':'.join(str(part) for part in (
+        key.bot_id, key.chat_id, key.user_id, key.thread_id, key.business_connection_id, key.destiny,
+    ))
+
+
+class SQLiteStorage(BaseStorage):
+    """
+    FSM-хранилище с памятью как основным источником и SQLite (WAL) на диске.
+
+    - Чтения и записи работают со словарём в памяти, поэтому get_data/update_data
+      занимают микросекунды.
+    - Изменённые ключи раз в flush_interval записываются на диск одной
+      транзакцией в отдельном потоке (write-behind), не блокируя event loop.
+    - Ключ, которого нет в памяти (например, после перезапуска), один раз
+      читается из SQLite.
+    - Сессии без изменений дольше session_ttl удаляются из памяти и с диска.
+
+    Каждый пользователь должен обслуживаться одним процессом бота: память
+    процесса — источник истины до ближайшего сброса на диск. Если апдейты
+    распределяются между несколькими процессами, нужен shared=True: каждое
+    чтение идёт в SQLite, каждое изменение сразу записывается.
+    """
+
+    def __init__(
+        self,
+        path: Path = FSM_DB_PATH,
+        flush_interval: float = FSM_FLUSH_INTERVAL,
+        session_ttl: float = FSM_SESSION_TTL,
+        expire_interval: float = FSM_EXPIRE_INTERVAL,
+        shared: bool = False,
+    ):
+        self.path = Path(path)
+        self.shared = shared
+        self.flush_interval = flush_interval
+        self.session_ttl = session_ttl
+        self.expire_interval = expire_interval
+        self.flushes = 0
+        self.flushed_rows = 0
+        self._sessions: Dict[str, _Session] = {}
+        self._dirty: Set[str] = set()
+        self._loading: Dict[str, asyncio.Future] = {}
+        # Одно соединение, с которым работает только этот поток
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='fsm-sqlite')
+        self._conn: Optional[sqlite3.Connection] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._last_expire = time.time()
+        self._closed = False
+
+    # --- Работа с SQLite (только в потоке executor) ---
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA busy_timeout=5000')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS fsm_sessions (
+                    key TEXT PRIMARY KEY,
+                    state TEXT,
+                    data TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_fsm_updated ON fsm_sessions (updated_at)')
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _db_load(self, key_id: str) -> Optional[Tuple[Optional[str], str, float]]:
+        return self._connect().execute(
+            'SELECT state, data, updated_at FROM fsm_sessions WHERE key = ?', (key_id,)
+        ).fetchone()
+
+    def _db_write(self, upserts: list, deletes: list, expire_before: Optional[float]):
+        conn = self._connect()
+        with conn:
+            if upserts:
+                conn.executemany('''
+                    INSERT INTO fsm_sessions (key, state, data, updated_at) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(key) DO UPDATE SET
+                        state = excluded.state, data = excluded.data, updated_at = excluded.updated_at
+                ''', upserts)
+            if deletes:
+                conn.executemany('DELETE FROM fsm_sessions WHERE key = ?', deletes)
+            if expire_before is not None:
+                conn.execute('DELETE FROM fsm_sessions WHERE updated_at < ?', (expire_before,))
+
+    def _db_close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    # --- Сессии в памяти ---
+
+    async def _session(self, key: StorageKey) -> _Session:
+        key_id = _key_id(key)
+        session = self._sessions.get(key_id)
+        if session is not None and not self.shared:
+            if time.time() - session.touched_at <= self.session_ttl:
+                return session
+            # Брошенная сессия: начинаем с чистого листа
+            session = self._sessions[key_id] = _Session(touched_at=time.time())
+            self._dirty.add(key_id)
+            return session
+
+        # Одновременные обращения к одному ключу ждут одно чтение с диска
+        future = self._loading.get(key_id)
+        if future is None:
+            future = asyncio.ensure_future(self._run(self._db_load, key_id))
+            self._loading[key_id] = future
+            try:
+                row = await asyncio.shield(future)
+            finally:
+                self._loading.pop(key_id, None)
+        else:
+            row = await asyncio.shield(future)
+
+        session = self._sessions.get(key_id)
+        if session is None or self.shared:
+            if row is not None and time.time() - row[2] <= self.session_ttl:
+                session = _Session(row[0], json.loads(row[1]), row[2])
+            else:
+                session = _Session(touched_at=time.time())
+            self._sessions[key_id] = session
+        return session
+
+    async def _touch(self, key: StorageKey, session: _Session):
+        session.touched_at = time.time()
+        self._dirty.add(_key_id(key))
+        if self.shared:
+            # Следующий апдейт может прийти в другой процесс: пишем сразу
+            await self.flush()
+        elif self._flush_task is None and not self._closed:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    # --- Интерфейс BaseStorage ---
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        session = await self._session(key)
+        session.state = state.state if isinstance(state, State) else state
+        await self._touch(key, session)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return (await self._session(key)).state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not isinstance(data, dict):
+            msg = f"Data must be a dict or dict-like object, got {type(data).__name__}"
+            raise DataNotDictLikeError(msg)
+        session = await self._session(key)
+        session.data = data.copy()
+        await self._touch(key, session)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return (await self._session(key)).data.copy()
+
+    # --- Сброс на диск ---
+
+    async def flush(self):
+        """Записать все изменённые сессии (и удалить брошенные) одной транзакцией"""
+        now = time.time()
+        expire_before = None
+        if now - self._last_expire >= self.expire_interval:
+            self._last_expire = now
+            expire_before = now - self.session_ttl
+            for key_id in [k for k, s in self._sessions.items() if s.touched_at < expire_before]:
+                del self._sessions[key_id]
+                self._dirty.discard(key_id)
+
+        if not self._dirty and expire_before is None:
+            return
+
+        upserts, deletes = [], []
+        dirty, self._dirty = self._dirty, set()
+        for key_id in dirty:
+            session = self._sessions.get(key_id)
+            if session is None:
+                continue
+            if session.state is None and not session.data:
+                # state.clear(): хранить нечего
+                deletes.append((key_id,))
+            else:
+                upserts.append((key_id, session.state, json.dumps(session.data, ensure_ascii=False), session.touched_at))
+
+        try:
+            await self._run(self._db_write, upserts, deletes, expire_before)
+        except Exception as e:
+            # Вернём ключи в очередь: следующий сброс повторит запись
+            self._dirty |= dirty
+            print(f"[FSM] Ошибка записи сессий в SQLite: {e}")
+            return
+        self.flushes += 1
+        self.flushed_rows += len(upserts) + len(deletes)
+
+    async def _flush_loop(self):
+        while not self._closed:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def close(self) -> None:
+        self._closed = True
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+        await self._run(self._db_close)
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,133 @@
+"""
+Кэш file_id фотографий, уже загруженных в Telegram.
+
+После первой загрузки фото Telegram возвращает file_id, по которому то же
+изображение можно отправлять повторно без передачи байтов. Запись
+привязана к ID ApartmentImage и пути файла: если фото заменили в админке,
+путь меняется и кэш для него больше не используется.
+"""
+import asyncio
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from aiogram.types import InputMediaPhoto, Message
+
+from services.database import db, get_all_file_ids
+
+# image_id -> (путь изображения, file_id)
+_file_ids: Dict[int, Tuple[str, str]] = {}
+_loaded = False
+_load_task: Optional[asyncio.Task] = None
+
+
+def _image_path(image_url: str) -> str:
+    """Путь изображения без хоста: хост API может отличаться между запросами"""
+    return urlparse(image_url).path or image_url
+
+
+def _ensure_loaded():
+    """
+    Кэш не загружен при запуске: внутри event loop загружаем его в фоне
+    через AsyncDatabase (до окончания загрузки — промахи), вне loop — сразу
+    """
+    global _loaded, _load_task
+    if _loaded or _load_task is not None:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        _merge(get_all_file_ids())
+        _loaded = True
+        return
+    _load_task = loop.create_task(load_file_ids())
+    _load_task.add_done_callback(_report_load_error)
+
+
+def _report_load_error(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        print(f"[MEDIA] Не удалось загрузить кэш file_id: {task.exception()}")
+
+
+def _merge(stored: Dict[int, Tuple[str, str]]):
+    # file_id, полученные за время загрузки, новее сохранённых
+    for image_id, entry in stored.items():
+        _file_ids.setdefault(image_id, entry)
+
+
+async def load_file_ids():
+    """Загрузить кэш file_id при запуске бота, не блокируя event loop"""
+    global _loaded, _load_task
+    if _loaded:
+        return
+    try:
+        _merge(await db.get_all_file_ids())
+        _loaded = True
+    finally:
+        _load_task = None
+
+
+def get_cached_file_id(image_id: Optional[int], image_url: str) -> Optional[str]:
+    """Вернуть file_id изображения, если оно уже загружено и не менялось"""
+    if image_id is None:
+        return None
+    _ensure_loaded()
+    cached = _file_ids.get(image_id)
+    if cached and cached[0] == _image_path(image_url):
+        return cached[1]
+    return None
+
+
+class ApartmentMediaGroup(list):
+    """
+    Список InputMediaPhoto, помнящий, какому ApartmentImage соответствует
+    каждый элемент, чтобы после отправки сохранить полученные file_id
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.image_refs: List[Tuple[Optional[int], str]] = []
+
+    def add(self, media: InputMediaPhoto, image_id: Optional[int], image_url: str):
+        self.append(media)
+        self.image_refs.append((image_id, image_url))
+
+    @property
+    def has_uploads(self) -> bool:
+        """Есть ли фото, которые ещё нужно загружать в Telegram"""
+        return any(not isinstance(media.media, str) for media in self)
+
+    def use_cached_file_ids(self):
+        """Заменить загрузки файлов на file_id, появившиеся после прошлых отправок"""
+        for media, (image_id, image_url) in zip(self, self.image_refs):
+            if not isinstance(media.media, str):
+                file_id = get_cached_file_id(image_id, image_url)
+                if file_id:
+                    media.media = file_id
+
+
+async def remember_file_ids(media_group: List[InputMediaPhoto], messages: Iterable[Message]):
+    """
+    Сохранить file_id из ответа Telegram на send_media_group / send_photo
+
+    Args:
+        media_group: Отправленная медиа-группа
+        messages: Сообщения, которые вернул Telegram (по одному на фото)
+    """
+    image_refs = getattr(media_group, 'image_refs', None)
+    if not image_refs:
+        return
+
+    _ensure_loaded()
+    entries = []
+    for (image_id, image_url), message in zip(image_refs, messages):
+        if image_id is None or not message.photo:
+            continue
+        path = _image_path(image_url)
+        # Последний размер в списке — самый большой
+        file_id = message.photo[-1].file_id
+        if _file_ids.get(image_id) != (path, file_id):
+            _file_ids[image_id] = (path, file_id)
+            entries.append((image_id, path, file_id))
+
+    if entries:
+        await db.save_file_ids(entries)
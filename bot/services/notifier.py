@@ -2,205 +2,473 @@
 Система уведомлений о новых квартирах для подписчиков
 """
 import asyncio
-from typing import Dict, List
+import os
+import socket
+import time
+import uuid
+from functools import partial
+from typing import Callable, Dict, List, Optional, Set, Tuple
 from aiogram import Bot
-
-from services.api import get_apartments
-from services.database import (
-    get_all_subscriptions,
-    get_last_checked_apartment_id,
-    update_last_checked_apartment_id
-)
-from utils.formatters import format_apartment_card, get_apartment_media_group
-
-
-def apartment_matches_filters(apartment: Dict, filters: Dict) -> bool:
+from aiogram.exceptions import TelegramForbiddenError
+from aiogram.types import InputMediaPhoto
+
+from services.api import get_apartment_changes
+from services.database import COORDINATOR_LEASE, LeaseLostError, db
+from services.dispatcher import DEFAULT_CAPACITY, DEFAULT_RATE, DeliveryJob, NotificationDispatcher
+from services.media_cache import ApartmentMediaGroup, remember_file_ids
+from utils.formatters import format_apartment_card, get_apartment_media_group, render_cache
+
+# Общий диспетчер, чтобы темп по чатам сохранялся между проверками
+notification_dispatcher = NotificationDispatcher()
+
+# Событие от backend о новой квартире будит планировщик раньше интервала
+_wake_event = asyncio.Event()
+PUSH_DEBOUNCE_SECONDS = 2
+
+# Очередь уведомлений: размер пачки и повторы при временных ошибках
+OUTBOX_BATCH_SIZE = 500
+OUTBOX_MAX_ATTEMPTS = 5
+OUTBOX_RETRY_BASE_SECONDS = 60
+OUTBOX_PURGE_INTERVAL = 60 * 60
+
+# Рассылка в нескольких процессах: шарды подписчиков и аренды
+NOTIFIER_SHARDS = 4
+LEASE_TTL_SECONDS = 30
+LEASE_RENEW_SECONDS = 10
+NODE_LEASE_PREFIX = 'node:'
+SHARD_LEASE_PREFIX = 'shard:'
+# На сколько выбранные из очереди уведомления скрыты от других процессов.
+# Должно с запасом превышать время рассылки пачки: иначе её возьмёт другой процесс
+OUTBOX_CLAIM_SECONDS = 15 * 60
+# Как часто воркер шарда заглядывает в очередь без сигнала координатора
+OUTBOX_POLL_SECONDS = 5
+
+
+def build_notification(apartment: Dict) -> Tuple[str, List[InputMediaPhoto]]:
     """
-    Проверяет, соответствует ли квартира фильтрам подписки
+    Готовит текст и медиа-группу уведомления о квартире
 
     Args:
         apartment: Данные квартиры
-        filters: Фильтры подписки
 
     Returns:
-        True если квартира соответствует фильтрам
-    """
-    # Проверяем тип жилья
-    if filters.get('type') and not filters.get('type_any'):
-        if apartment['type'] not in filters['type']:
-            return False
-
-    # Проверяем район
-    if filters.get('district') and not filters.get('district_any'):
-        if apartment['district'] not in filters['district']:
-            return False
-
-    # Проверяем состояние
-    if filters.get('condition') and not filters.get('condition_any'):
-        if apartment['condition'] not in filters['condition']:
-            return False
-
-    # Проверяем количество комнат
-    if filters.get('rooms') and not filters.get('rooms_any'):
-        if apartment['rooms'] not in filters['rooms']:
-            return False
-
-    # Проверяем площадь
-    if filters.get('area_ranges') and not filters.get('area_any'):
-        area = apartment['area']
-        matches_area = False
-        for area_range in filters['area_ranges']:
-            parts = area_range.split(':')
-            min_area = float(parts[0]) if parts[0] else 0
-            max_area = float(parts[1]) if len(parts) > 1 and parts[1] else float('inf')
-            if min_area <= area <= max_area:
-                matches_area = True
-                break
-        if not matches_area:
-            return False
-
-    # Проверяем цену
-    if filters.get('price_ranges') and not filters.get('price_any'):
-        price = apartment['price']
-        matches_price = False
-        for price_range in filters['price_ranges']:
-            parts = price_range.split(':')
-            min_price = int(float(parts[0])) if parts[0] else 0
-            max_price = int(float(parts[1])) if len(parts) > 1 and parts[1] else float('inf')
-            if min_price <= price <= max_price:
-                matches_price = True
-                break
-        if not matches_price:
-            return False
+        Кортеж (текст карточки, медиа-группа)
+    """
+    card_text = "🔔 <b>Новая квартира по вашим фильтрам!</b>\n\n" + format_apartment_card(apartment)
+    media_group = get_apartment_media_group(apartment)
+    if len(media_group) >= 2:
+        media_group[0].caption = card_text
+    return card_text, media_group
+
 
-    return True
+def notification_cost(media_group: List[InputMediaPhoto]) -> int:
+    """Сколько сообщений Telegram засчитает за одно уведомление"""
+    return len(media_group) if len(media_group) >= 2 else 1
 
 
-async def send_apartment_notification(bot: Bot, user_id: int, apartment: Dict):
+async def deliver_notification(bot: Bot, user_id: int, card_text: str, media_group: List[InputMediaPhoto]):
     """
-    Отправляет уведомление пользователю о новой квартире
+    Отправляет готовое уведомление пользователю. Ошибки Telegram пробрасываются выше.
 
     Args:
         bot: Экземпляр бота
         user_id: ID пользователя Telegram
-        apartment: Данные квартиры
+        card_text: Текст карточки
+        media_group: Медиа-группа из build_notification
+    """
+    if isinstance(media_group, ApartmentMediaGroup):
+        # Фото, загруженные предыдущим получателям, отправляем по file_id
+        media_group.use_cached_file_ids()
+
+    if len(media_group) >= 2:
+        # Отправляем медиа-группу (2+ фото)
+        messages = await bot.send_media_group(chat_id=user_id, media=media_group)
+        await remember_file_ids(media_group, messages)
+    elif len(media_group) == 1:
+        # Отправляем одно фото
+        message = await bot.send_photo(
+            chat_id=user_id,
+            photo=media_group[0].media,
+            caption=card_text,
+            parse_mode="HTML"
+        )
+        await remember_file_ids(media_group, [message])
+    else:
+        # Отправляем только текст
+        await bot.send_message(chat_id=user_id, text=card_text, parse_mode="HTML")
+
+
+def build_delivery_jobs(
+    bot: Bot,
+    apartment_id: int,
+    user_ids: List[int],
+    card_text: str,
+    media_group: List[InputMediaPhoto],
+) -> List[DeliveryJob]:
+    """
+    Создаёт задания рассылки одной квартиры списку пользователей.
+    Карточка и медиа-группа собираются один раз на квартиру.
     """
-    try:
-        # Формируем карточку квартиры
-        card_text = "🔔 <b>Новая квартира по вашим фильтрам!</b>\n\n" + format_apartment_card(apartment)
+    cost = notification_cost(media_group)
+    return [
+        DeliveryJob(
+            chat_id=user_id,
+            send=partial(deliver_notification, bot, user_id, card_text, media_group),
+            cost=cost,
+            label=f"user={user_id} apartment={apartment_id}",
+        )
+        for user_id in user_ids
+    ]
+
+
+async def enqueue_for_subscribers(apartments: List[Dict], last_apartment_id: int, owner: Optional[str] = None) -> int:
+    """
+    Ставит в очередь уведомления о квартирах подходящим подписчикам
+    и сдвигает курсор в той же транзакции
 
-        # Получаем медиа-группу
-        media_group = get_apartment_media_group(apartment)
+    Args:
+        apartments: Новые квартиры
+        last_apartment_id: ID последней квартиры в пачке
+        owner: Владелец аренды координатора (см. NotifierNode)
 
-        if media_group and len(media_group) >= 2:
-            # Отправляем медиа-группу (2+ фото)
-            media_group[0].caption = card_text
-            await bot.send_media_group(chat_id=user_id, media=media_group)
-        elif media_group and len(media_group) == 1:
-            # Отправляем одно фото
-            await bot.send_photo(
-                chat_id=user_id,
-                photo=media_group[0].media,
-                caption=card_text,
-                parse_mode="HTML"
-            )
-        else:
-            # Отправляем только текст
-            await bot.send_message(chat_id=user_id, text=card_text, parse_mode="HTML")
+    Returns:
+        Количество поставленных в очередь уведомлений
+    """
+    # Подписчики подбираются запросом по колонкам фильтров прямо в БД
+    queued = await db.enqueue_notifications(apartments, last_apartment_id, owner)
+    for apartment_id, count in queued.items():
+        print(f"[NOTIFIER] Квартира {apartment_id}: подходящих подписчиков {count}")
+    return sum(queued.values())
 
-        print(f"[NOTIFIER] Отправлено уведомление пользователю {user_id} о квартире {apartment['id']}")
 
-    except Exception as e:
-        print(f"[ERROR] Ошибка при отправке уведомления пользователю {user_id}: {e}")
+def _retry_delay(attempts: int) -> int:
+    """Экспоненциальная пауза перед повторной отправкой"""
+    return OUTBOX_RETRY_BASE_SECONDS * 2 ** attempts
 
 
-async def check_new_apartments(bot: Bot):
+async def drain_outbox(
+    bot: Bot, shard: int = 0, shards: int = 1, keep_going: Optional[Callable[[], bool]] = None
+) -> int:
     """
-    Проверяет новые квартиры и отправляет уведомления подписчикам
+    Отправляет уведомления из очереди пачками и сохраняет результат каждой доставки
 
     Args:
         bot: Экземпляр бота
+        shard: Номер шарда получателей (user_id % shards)
+        shards: Общее число шардов
+        keep_going: Проверяется перед каждой пачкой; False — остановиться
+
+    Returns:
+        Количество доставленных уведомлений
+    """
+    total_sent = 0
+    while keep_going is None or keep_going():
+        rows = await db.get_due_notifications(OUTBOX_BATCH_SIZE, shard, shards, OUTBOX_CLAIM_SECONDS)
+        if not rows:
+            break
+
+        # Группируем получателей по квартире, чтобы собрать карточку один раз
+        apartments: Dict[int, Dict] = {}
+        recipients: Dict[int, List[int]] = {}
+        attempts: Dict[Tuple[int, int], int] = {}
+        for row in rows:
+            apartments[row['apartment_id']] = row['apartment']
+            recipients.setdefault(row['apartment_id'], []).append(row['user_id'])
+            attempts[(row['user_id'], row['apartment_id'])] = row['attempts']
+
+        jobs: List[Tuple[int, DeliveryJob]] = []
+        warmup: List[DeliveryJob] = []
+        remaining: List[DeliveryJob] = []
+        for apartment_id, user_ids in recipients.items():
+            card_text, media_group = build_notification(apartments[apartment_id])
+            apartment_jobs = build_delivery_jobs(bot, apartment_id, user_ids, card_text, media_group)
+            jobs.extend((apartment_id, job) for job in apartment_jobs)
+            if isinstance(media_group, ApartmentMediaGroup) and media_group.has_uploads:
+                # Сначала один получатель: остальным фото уйдут уже по file_id,
+                # а не параллельными загрузками одних и тех же файлов
+                warmup.append(apartment_jobs[0])
+                remaining.extend(apartment_jobs[1:])
+            else:
+                remaining.extend(apartment_jobs)
+
+        if warmup:
+            await notification_dispatcher.dispatch(warmup)
+
+        # Рассылаем параллельно в пределах лимитов Telegram
+        stats = await notification_dispatcher.dispatch(remaining)
+        print(f"[NOTIFIER] Пачка из очереди: {stats}, кэш карточек: {render_cache.stats()}")
+
+        sent, retry, failed, blocked = [], [], [], []
+        now = int(time.time())
+        for apartment_id, job in jobs:
+            user_id = job.chat_id
+            if job.delivered:
+                sent.append((user_id, apartment_id))
+                continue
+            error = str(job.error)
+            done_attempts = attempts[(user_id, apartment_id)] + 1
+            if isinstance(job.error, TelegramForbiddenError):
+                blocked.append((user_id, apartment_id, error))
+            elif done_attempts >= OUTBOX_MAX_ATTEMPTS:
+                failed.append((user_id, apartment_id, error))
+            else:
+                retry.append((user_id, apartment_id, now + _retry_delay(done_attempts), error))
+
+        await db.record_notification_results(sent, retry, failed, blocked)
+        total_sent += len(sent)
+
+        if blocked:
+            # Заблокировавшие бота больше не участвуют в рассылке
+            blocked_users = {user_id for user_id, _, _ in blocked}
+            await db.deactivate_subscriptions(blocked_users)
+            print(f"[NOTIFIER] Отключены подписки заблокировавших бота: {len(blocked_users)}")
+
+    if total_sent:
+        print(f"[NOTIFIER] Отправлено уведомлений: {total_sent}")
+    return total_sent
+
+
+async def check_new_apartments(owner: Optional[str] = None) -> int:
+    """
+    Проверяет новые квартиры и ставит уведомления подписчикам в очередь.
+    Ленту новых квартир выбирает пачками до конца, поэтому после простоя
+    уведомления приходят обо всех пропущенных квартирах. Уведомления
+    сначала сохраняются в очередь, поэтому перезапуск бота их не теряет
+    и не отправляет повторно.
+
+    Args:
+        owner: Владелец аренды координатора; пачка не записывается,
+            если аренда перешла к другому процессу
+
+    Returns:
+        Количество поставленных в очередь уведомлений
     """
     print("[NOTIFIER] Начинаю проверку новых квартир...")
 
     # Получаем ID последней проверенной квартиры
-    last_checked_id = get_last_checked_apartment_id()
+    last_checked_id = await db.get_last_checked_apartment_id()
     print(f"[NOTIFIER] Последняя проверенная квартира: {last_checked_id}")
 
-    # Получаем все квартиры (последняя страница, отсортированные по дате создания)
-    result = await get_apartments({}, page=1)
-    apartments = result.get('results', [])
-
-    if not apartments:
-        print("[NOTIFIER] Нет квартир в базе")
-        return
-
-    # Фильтруем только новые квартиры
-    new_apartments = []
-    max_apartment_id = 0
-
-    for apartment in apartments:
-        apartment_id = apartment['id']
-        max_apartment_id = max(max_apartment_id, apartment_id)
-
-        if last_checked_id is None or apartment_id > last_checked_id:
-            new_apartments.append(apartment)
-
-    print(f"[NOTIFIER] Найдено новых квартир: {len(new_apartments)}")
-
-    if not new_apartments:
-        # Обновляем ID последней проверки даже если нет новых квартир
-        if max_apartment_id > 0:
-            update_last_checked_apartment_id(max_apartment_id)
-        return
+    if last_checked_id is None:
+        # Первый запуск: начинаем отслеживание с текущей последней квартиры
+        feed = await get_apartment_changes()
+        if feed is None:
+            print("[NOTIFIER] API недоступно, проверка отложена")
+            return 0
+        await db.update_last_checked_apartment_id(feed['next_cursor'])
+        print(f"[NOTIFIER] Начальный ID последней проверки: {feed['next_cursor']}")
+        return 0
+
+    total_new = 0
+    total_queued = 0
+    while True:
+        feed = await get_apartment_changes(last_checked_id)
+        if feed is None:
+            print("[NOTIFIER] API недоступно, проверка прервана")
+            break
+
+        apartments = feed.get('results', [])
+        if apartments:
+            total_new += len(apartments)
+            # Очередь и курсор сохраняются вместе после каждой пачки
+            try:
+                queued = await enqueue_for_subscribers(apartments, feed['next_cursor'], owner)
+            except LeaseLostError:
+                print("[NOTIFIER] Аренда координатора потеряна, проверка прервана")
+                break
+            total_queued += queued
+            last_checked_id = feed['next_cursor']
+            print(f"[NOTIFIER] В очередь добавлено {queued}, ID последней проверки: {last_checked_id}")
 
-    # Получаем все подписки
-    subscriptions = get_all_subscriptions()
-    print(f"[NOTIFIER] Активных подписок: {len(subscriptions)}")
+        if not feed.get('has_more'):
+            break
 
-    if not subscriptions:
-        # Обновляем ID последней проверки
-        update_last_checked_apartment_id(max_apartment_id)
-        return
+    print(f"[NOTIFIER] Найдено новых квартир: {total_new}")
+    return total_queued
 
-    # Для каждой новой квартиры проверяем подписки
-    notifications_sent = 0
-    for apartment in new_apartments:
-        print(f"[NOTIFIER] Проверяю квартиру {apartment['id']}")
 
-        for subscription in subscriptions:
-            user_id = subscription['user_id']
-            filters = subscription['filters']
+def wake_notifier():
+    """Просит планировщик проверить новые квартиры, не дожидаясь интервала"""
+    _wake_event.set()
 
-            # Проверяем, подходит ли квартира под фильтры
-            if apartment_matches_filters(apartment, filters):
-                await send_apartment_notification(bot, user_id, apartment)
-                notifications_sent += 1
-                # Небольшая задержка между отправками
-                await asyncio.sleep(0.5)
 
-    print(f"[NOTIFIER] Отправлено уведомлений: {notifications_sent}")
+async def request_feed_check():
+    """Просит координатора (возможно, в другом процессе) проверить ленту"""
+    await db.request_feed_check()
+    _wake_event.set()
 
-    # Обновляем ID последней проверенной квартиры
-    update_last_checked_apartment_id(max_apartment_id)
-    print(f"[NOTIFIER] Обновлен ID последней проверки: {max_apartment_id}")
 
+class NotifierNode:
+    """
+    Участник рассылки в одном процессе бота.
+
+    Процессы договариваются через аренды в bot.db:
+    - координатор (одна аренда на всех) читает ленту новых квартир и ставит
+      уведомления в очередь; запись пачки проверяет, что аренда ещё его;
+    - очередь разбита на шарды по user_id % shards, у каждого шарда свой
+      воркер в процессе, который держит аренду шарда;
+    - каждый процесс берёт не больше своей доли шардов (по числу живых узлов),
+      аренды упавшего процесса истекают и переходят к остальным.
+
+    Кроме того, выбранные из очереди уведомления скрываются от других
+    процессов на OUTBOX_CLAIM_SECONDS, поэтому одно уведомление не
+    отправляется дважды даже при смене владельца шарда посреди пачки.
+    """
 
-async def start_notification_scheduler(bot: Bot, interval_minutes: int = 5):
+    def __init__(self, bot: Bot, shards: int = NOTIFIER_SHARDS, interval_minutes: int = 5):
+        self.bot = bot
+        self.shards = shards
+        self.interval = interval_minutes * 60
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_coordinator = False
+        self._workers: Dict[int, asyncio.Task] = {}
+        self._outbox_events: Dict[int, asyncio.Event] = {}
+        # Все живые воркеры, включая уже остановленные, но дорабатывающие пачку
+        self._tasks: Set[asyncio.Task] = set()
+        self._next_check = 0.0
+        self._next_purge = 0.0
+
+    def _shard_lease(self, shard: int) -> str:
+        # Число шардов в имени: узлы с разной настройкой не делят диапазоны
+        return f"{SHARD_LEASE_PREFIX}{shard}/{self.shards}"
+
+    async def _coordinate(self):
+        """Проверка ленты, если этот процесс — координатор и пора проверять"""
+        woken = _wake_event.is_set()
+        _wake_event.clear()
+        self.is_coordinator = await db.acquire_lease(COORDINATOR_LEASE, self.owner, LEASE_TTL_SECONDS)
+        if not self.is_coordinator:
+            if woken:
+                # Push-событие пришло не координатору: передаём через БД
+                await db.request_feed_check()
+            return
+
+        now = time.monotonic()
+        if woken or await db.take_feed_check_request():
+            # Даём пачке сохранений в админке завершиться и проверяем один раз
+            await asyncio.sleep(PUSH_DEBOUNCE_SECONDS)
+        elif now < self._next_check:
+            return
+        self._next_check = now + self.interval
+
+        if await check_new_apartments(self.owner):
+            for event in self._outbox_events.values():
+                event.set()
+        if now >= self._next_purge:
+            self._next_purge = now + OUTBOX_PURGE_INTERVAL
+            await db.purge_outbox()
+
+    async def _balance_shards(self):
+        """Продлевает свои аренды шардов, отдаёт лишние и забирает свободные"""
+        nodes = max(await db.count_live_leases(NODE_LEASE_PREFIX), 1)
+        fair_share = -(-self.shards // nodes)
+        # Глобальный лимит Telegram общий для бота: делим между узлами и скорость,
+        # и запас ведра, иначе одновременные всплески узлов превысят 30 в секунду
+        notification_dispatcher.bucket.resize(DEFAULT_RATE / nodes, DEFAULT_CAPACITY / nodes)
+
+        for shard in list(self._workers):
+            if len(self._workers) > fair_share:
+                self._stop_worker(shard, release=True)
+            elif not await db.acquire_lease(self._shard_lease(shard), self.owner, LEASE_TTL_SECONDS):
+                print(f"[NOTIFIER] Шард {shard} перешёл к другому процессу")
+                self._stop_worker(shard)
+
+        for shard in range(self.shards):
+            if len(self._workers) >= fair_share:
+                break
+            if shard not in self._workers and await db.acquire_lease(
+                self._shard_lease(shard), self.owner, LEASE_TTL_SECONDS
+            ):
+                print(f"[NOTIFIER] Шард {shard}/{self.shards} обслуживает {self.owner}")
+                self._outbox_events[shard] = asyncio.Event()
+                self._workers[shard] = self._track(self._shard_worker(shard))
+
+    def _track(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _shard_worker(self, shard: int):
+        """Рассылает уведомления своего шарда, пока держит его аренду"""
+        event = self._outbox_events[shard]
+        me = asyncio.current_task()
+        # Сравниваем задачу, а не номер: шард мог снова достаться этому же процессу,
+        # пока остановленный воркер дописывает пачку
+        keep_going = lambda: self._workers.get(shard) is me  # noqa: E731
+        while keep_going():
+            try:
+                await drain_outbox(self.bot, shard, self.shards, keep_going=keep_going)
+            except Exception as e:
+                print(f"[ERROR] Ошибка рассылки шарда {shard}: {e}")
+            # Новые уведомления от своего координатора будят сразу, от чужого — по опросу
+            try:
+                await asyncio.wait_for(event.wait(), timeout=OUTBOX_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            event.clear()
+
+    def _stop_worker(self, shard: int, release: bool = False):
+        """
+        Останавливает воркер шарда после текущей пачки, не прерывая отправку.
+        Пачка дописывается в фоне: основной цикл не ждёт её и продолжает
+        продлевать остальные аренды.
+
+        Args:
+            shard: Номер шарда
+            release: Отдать аренду шарда, когда воркер допишет пачку
+        """
+        task = self._workers.pop(shard)
+        self._outbox_events.pop(shard).set()
+        if release:
+            self._track(self._release_after(shard, task))
+
+    async def _release_after(self, shard: int, task: asyncio.Task):
+        # wait, в отличие от gather, не отменяет воркер, если отменят сам узел
+        await asyncio.wait([task])
+        if shard not in self._workers:
+            await db.release_lease(self._shard_lease(shard), self.owner)
+
+    async def run(self):
+        print(f"[NOTIFIER] Узел {self.owner}: шардов {self.shards}, интервал сверки {self.interval // 60} мин")
+        try:
+            while True:
+                try:
+                    await db.acquire_lease(NODE_LEASE_PREFIX + self.owner, self.owner, LEASE_TTL_SECONDS)
+                    await self._balance_shards()
+                    await self._coordinate()
+                except Exception as e:
+                    print(f"[ERROR] Ошибка в планировщике уведомлений: {e}")
+
+                try:
+                    await asyncio.wait_for(_wake_event.wait(), timeout=LEASE_RENEW_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            # Отдаём аренды сразу, не дожидаясь их истечения
+            for shard in list(self._workers):
+                self._workers.pop(shard)
+                self._outbox_events.pop(shard).set()
+            if self._tasks:
+                await asyncio.wait(list(self._tasks))
+            await asyncio.shield(self._release_all())
+
+    async def _release_all(self):
+        names = [self._shard_lease(shard) for shard in range(self.shards)]
+        names += [COORDINATOR_LEASE, NODE_LEASE_PREFIX + self.owner]
+        for name in names:
+            await db.release_lease(name, self.owner)
+
+
+async def start_notification_scheduler(bot: Bot, interval_minutes: int = 5, shards: int = NOTIFIER_SHARDS):
     """
-    Запускает периодическую проверку новых квартир
+    Запускает проверку новых квартир: сразу по push-событию от backend
+    и периодически как страховочную сверку, если событие потерялось.
+    Можно запускать в нескольких процессах: они делят работу через аренды.
 
     Args:
         bot: Экземпляр бота
-        interval_minutes: Интервал проверки в минутах (по умолчанию 5 минут)
+        interval_minutes: Интервал сверки в минутах (по умолчанию 5 минут)
+        shards: На сколько шардов по user_id разбита рассылка
     """
-    print(f"[NOTIFIER] Запущен планировщик проверки новых квартир (интервал: {interval_minutes} мин)")
-
-    while True:
-        try:
-            await check_new_apartments(bot)
-        except Exception as e:
-            print(f"[ERROR] Ошибка в планировщике уведомлений: {e}")
-
-        # Ждем следующей проверки
-        await asyncio.sleep(interval_minutes * 60)
+    await NotifierNode(bot, shards=shards, interval_minutes=interval_minutes).run()
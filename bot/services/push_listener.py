@@ -0,0 +1,52 @@
+"""
+Приём push-событий от backend о новых квартирах
+"""
+import hmac
+
+from aiohttp import web
+
+from services.notifier import wake_notifier
+
+NOTIFY_PATH = '/notify/apartments'
+
+
+def create_push_app(secret: str = '') -> web.Application:
+    """Создаёт aiohttp-приложение с единственным обработчиком событий"""
+
+    async def handle_event(request: web.Request) -> web.Response:
+        if secret and not hmac.compare_digest(request.headers.get('X-Notify-Secret', ''), secret):
+            return web.Response(status=403)
+
+        try:
+            payload = await request.json()
+        except ValueError:
+            payload = {}
+        print(f"[PUSH] Получено событие: {payload}")
+
+        # Само событие только будит notifier: квартиры забираются из ленты /changes/
+        wake_notifier()
+        return web.Response(status=204)
+
+    app = web.Application()
+    app.router.add_post(NOTIFY_PATH, handle_event)
+    return app
+
+
+async def start_push_listener(host: str, port: int, secret: str = '') -> web.AppRunner:
+    """
+    Запускает HTTP-сервер для push-событий
+
+    Args:
+        host: Адрес для прослушивания
+        port: Порт
+        secret: Общий секрет с backend (заголовок X-Notify-Secret)
+
+    Returns:
+        AppRunner, который нужно закрыть при остановке бота
+    """
+    runner = web.AppRunner(create_push_app(secret))
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    print(f"[PUSH] Ожидаю события на http://{host}:{port}{NOTIFY_PATH}")
+    return runner
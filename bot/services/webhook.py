@@ -0,0 +1,151 @@
+"""
+Приём апдейтов Telegram через webhook вместо long polling
+"""
+import asyncio
+import hmac
+from typing import List, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiohttp import web
+from pydantic import ValidationError
+
+WEBHOOK_PATH = '/telegram/webhook'
+# Заголовок, в котором Telegram присылает secret_token из setWebhook
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+# Сколько апдейтов может ждать обработки и сколько обрабатывается одновременно
+WEBHOOK_QUEUE_SIZE = 1000
+WEBHOOK_WORKERS = 16
+# Telegram повторит апдейт, на который получил не-2xx ответ
+WEBHOOK_RETRY_AFTER = 1
+# Сколько ждать обработки очереди при остановке
+WEBHOOK_DRAIN_TIMEOUT = 10
+
+
+class UpdateQueue:
+    """
+    Ограниченная очередь апдейтов с пулом обработчиков.
+
+    HTTP-обработчик только кладёт апдейт в очередь и сразу отвечает 200,
+    поэтому Telegram не ждёт, пока бот сходит в backend. Когда очередь
+    заполнена, апдейт не принимается (503): Telegram повторит его позже,
+    а память процесса не растёт под нагрузкой.
+    """
+
+    def __init__(self, dp: Dispatcher, bot: Bot, maxsize: int = WEBHOOK_QUEUE_SIZE, workers: int = WEBHOOK_WORKERS):
+        self.dp = dp
+        self.bot = bot
+        self.workers = workers
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.accepted = 0
+        self.rejected = 0
+        self._tasks: List[asyncio.Task] = []
+
+    def offer(self, update: Update) -> bool:
+        """Поставить апдейт в очередь; False, если очередь заполнена"""
+        try:
+            self.queue.put_nowait(update)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+        self.accepted += 1
+        return True
+
+    async def _worker(self):
+        while True:
+            update = await self.queue.get()
+            try:
+                await self.dp.feed_update(self.bot, update)
+            except Exception as e:
+                print(f"[WEBHOOK] Ошибка обработки апдейта {update.update_id}: {e}")
+            finally:
+                self.queue.task_done()
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, timeout: float = WEBHOOK_DRAIN_TIMEOUT):
+        """Дождаться уже принятых апдейтов и остановить обработчики"""
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            print(f"[WEBHOOK] Не обработано при остановке: {self.queue.qsize()}")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+def create_webhook_app(updates: UpdateQueue, secret: str = '', path: str = WEBHOOK_PATH) -> web.Application:
+    """Создаёт aiohttp-приложение, принимающее апдейты Telegram"""
+
+    async def handle_update(request: web.Request) -> web.Response:
+        if secret and not hmac.compare_digest(request.headers.get(SECRET_HEADER, ''), secret):
+            return web.Response(status=403)
+
+        try:
+            update = Update.model_validate(await request.json(), context={'bot': updates.bot})
+        except (ValueError, ValidationError):
+            # Не апдейт Telegram: повтор запроса ничего не изменит
+            return web.Response(status=400)
+
+        if not updates.offer(update):
+            return web.Response(status=503, headers={'Retry-After': str(WEBHOOK_RETRY_AFTER)})
+        return web.Response(status=200)
+
+    async def on_startup(app: web.Application):
+        updates.start()
+
+    async def on_shutdown(app: web.Application):
+        await updates.stop()
+
+    app = web.Application()
+    app.router.add_post(path, handle_update)
+    app.on_startup.append(on_startup)
+    app.on_shutdown.append(on_shutdown)
+    return app
+
+
+async def start_webhook_server(
+    dp: Dispatcher,
+    bot: Bot,
+    host: str,
+    port: int,
+    secret: str = '',
+    url: Optional[str] = None,
+    queue_size: int = WEBHOOK_QUEUE_SIZE,
+    workers: int = WEBHOOK_WORKERS,
+    reuse_port: bool = False,
+) -> web.AppRunner:
+    """
+    Запускает HTTP-сервер для апдейтов Telegram
+
+    Args:
+        dp: Диспетчер с зарегистрированными роутерами
+        bot: Экземпляр бота
+        host: Адрес для прослушивания
+        port: Порт
+        secret: secret_token, который Telegram присылает в заголовке
+        url: Публичный адрес сервера; если задан, webhook регистрируется в Telegram
+        queue_size: Максимум апдейтов, ожидающих обработки
+        workers: Сколько апдейтов обрабатывается одновременно
+        reuse_port: Разрешить нескольким процессам слушать один порт (SO_REUSEPORT)
+
+    Returns:
+        AppRunner, который нужно закрыть при остановке бота
+    """
+    updates = UpdateQueue(dp, bot, maxsize=queue_size, workers=workers)
+    runner = web.AppRunner(create_webhook_app(updates, secret))
+    await runner.setup()
+    site = web.TCPSite(runner, host, port, reuse_port=reuse_port or None)
+    await site.start()
+
+    if url:
+        await bot.set_webhook(
+            url.rstrip('/') + WEBHOOK_PATH,
+            secret_token=secret or None,
+            allowed_updates=dp.resolve_used_update_types(),
+        )
+    print(f"[WEBHOOK] Ожидаю апдейты на http://{host}:{port}{WEBHOOK_PATH}")
+    return runner